@@ -0,0 +1,517 @@
+import asyncio
+import time
+from contextlib import aclosing
+
+import aiohttp
+
+import lazy
+from client import Client, layouts
+from flight import AsyncSingleFlight
+from metrics import null_probe
+from recording import Archive, ReplayTransport
+from transport import Transport, check_notice, notice_max_size
+from transport import retry_statuses, ThrottleError
+
+compute = lazy.module("compute")
+history = lazy.module("history")
+outputs = lazy.module("outputs")
+parsers = lazy.module("parsers")
+
+
+async def _whole(content: bytes):
+    # a cached body streamed as one chunk
+    yield content
+
+
+async def _connect_start(session, context, params):
+    context.trace_request_ctx["opened"] = time.perf_counter()
+
+
+async def _connect_end(session, context, params):
+    timing = context.trace_request_ctx
+    timing["connect"] += time.perf_counter() - timing.pop("opened")
+
+
+class AsyncTransport(Transport):
+    """Pooled aiohttp transport with retries for the Alpha Vantage API
+
+    The session and the concurrency semaphore are created on first use so
+    they bind to the running event loop.
+    """
+
+    def __init__(self,
+                 max_attempts: int=3,
+                 pool_size: int=100,
+                 timeout: tuple=(3.05, 30),
+                 backoff: float=1.0,
+                 max_backoff: float=60.0,
+                 limiter=None,
+                 max_concurrency: int=None):
+        """Initializes the transport
+
+        Args:
+            max_attempts: Integer, maximum number of requests made to API in
+                in case of failure.
+            pool_size: Integer, maximum number of keep-alive connections
+                kept open to the API.
+            timeout: Tuple, connect and read timeouts in seconds.
+            backoff: Float, base delay in seconds between attempts, doubled
+                after every failure.
+            max_backoff: Float, upper bound on the delay between attempts.
+            limiter: TokenBucket, rate limiter every attempt passes through,
+                or None to send requests unthrottled.
+            max_concurrency: Integer, maximum number of requests in flight,
+                defaults to pool_size.
+        """
+        self.max_concurrency = max_concurrency or pool_size
+        self.semaphore = None
+        super(AsyncTransport, self).__init__(max_attempts=max_attempts,
+                                             pool_size=pool_size,
+                                             timeout=timeout,
+                                             backoff=backoff,
+                                             max_backoff=max_backoff,
+                                             limiter=limiter)
+
+    def open_session(self):
+        return None
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.timeout[0],
+                                            sock_read=self.timeout[1])
+            tracing = aiohttp.TraceConfig()
+            tracing.on_connection_create_start.append(_connect_start)
+            tracing.on_connection_create_end.append(_connect_end)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=timeout,
+                                                 trace_configs=[tracing])
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.session
+
+    async def send(self, url: str, params: dict, probe=null_probe) -> bytes:
+        """Makes a single request without retrying
+
+        Args:
+            url: String, endpoint of the API
+            params: Dictionary, query parameters
+            probe: metrics.Probe, records the connect, ttfb and download
+                stages and the bytes received
+        """
+        session = self._ensure_session()
+        params = {k: str(v) for k, v in params.items()}
+        timing = {"connect": 0.0}
+        async with self.semaphore:
+            start = time.perf_counter()
+            async with session.get(url,
+                                   params=params,
+                                   trace_request_ctx=timing) as r:
+                headers = time.perf_counter()
+                r.raise_for_status()
+                content = await r.read()
+        if timing["connect"] > 0:
+            probe.observe("connect", timing["connect"])
+        probe.observe("ttfb", headers - start - timing["connect"])
+        probe.observe("download", time.perf_counter() - headers)
+        probe.count("bytes", len(content))
+        check_notice(content)
+        return content
+
+    async def get(self, url: str, params: dict, probe=null_probe) -> bytes:
+        """Makes a request, retrying transient failures
+
+        Args:
+            url: String, endpoint of the API
+            params: Dictionary, query parameters
+            probe: metrics.Probe, records the stages of every attempt, the
+                time waited on the rate limiter and the retries
+        """
+        return await self._attempts(self.send, url, params, probe)
+
+    async def _attempts(self, request, url: str, params: dict, probe, *args):
+        attempt = 1
+        probe.count("requests")
+        while True:
+            if hasattr(self.limiter, "acquire_async"):
+                probe.observe("throttle", await self.limiter.acquire_async())
+            elif self.limiter is not None:
+                delay = self.limiter.reserve()
+                probe.observe("throttle", delay)
+                await asyncio.sleep(delay)
+            probe.count("attempts")
+            try:
+                result = await request(url, params, probe, *args)
+                self.feedback(False)
+                return result
+            except ThrottleError:
+                self.feedback(True)
+                if attempt >= self.max_attempts:
+                    raise
+            except (aiohttp.ClientConnectionError,
+                    aiohttp.ClientPayloadError,
+                    asyncio.TimeoutError):
+                if attempt >= self.max_attempts:
+                    raise
+            except aiohttp.ClientResponseError as e:
+                if (e.status not in retry_statuses
+                        or attempt >= self.max_attempts):
+                    raise
+            probe.count("retries")
+            await asyncio.sleep(self.delay(attempt))
+            attempt += 1
+
+    async def _open(self, url: str, params: dict, probe, chunk_size: int):
+        # holds a slot of the semaphore until the body has been read
+        session = self._ensure_session()
+        params = {k: str(v) for k, v in params.items()}
+        timing = {"connect": 0.0}
+        await self.semaphore.acquire()
+        try:
+            start = time.perf_counter()
+            r = await session.get(url, params=params,
+                                  trace_request_ctx=timing)
+            try:
+                if timing["connect"] > 0:
+                    probe.observe("connect", timing["connect"])
+                probe.observe("ttfb",
+                              time.perf_counter() - start - timing["connect"])
+                r.raise_for_status()
+                first = []
+                received = 0
+                while received < notice_max_size:
+                    chunk = await r.content.read(chunk_size)
+                    if not chunk:
+                        break
+                    first.append(chunk)
+                    received += len(chunk)
+                first = b"".join(first)
+                check_notice(first)
+            except BaseException:
+                r.release()
+                raise
+        except BaseException:
+            self.semaphore.release()
+            raise
+        return r, first
+
+    async def chunks(self,
+                     url: str,
+                     params: dict,
+                     probe=null_probe,
+                     chunk_size: int=1 << 16):
+        """Makes a request and yields its body in chunks as they arrive
+
+        The first chunk gathers at least notice_max_size bytes, as in
+        Transport.chunks(). Failures are retried as by get() until the
+        first chunk has arrived.
+
+        Args:
+            url: String, endpoint of the API
+            params: Dictionary, query parameters
+            probe: metrics.Probe, records the stages of every attempt and
+                the bytes received
+            chunk_size: Integer, most bytes read from the connection at a
+                time
+        """
+        r, first = await self._attempts(self._open, url, params, probe,
+                                        chunk_size)
+        received = len(first)
+        downloading = 0.0
+        try:
+            if first:
+                yield first
+            while True:
+                start = time.perf_counter()
+                chunk = await r.content.read(chunk_size)
+                downloading += time.perf_counter() - start
+                if not chunk:
+                    break
+                received += len(chunk)
+                yield chunk
+        finally:
+            r.release()
+            self.semaphore.release()
+            probe.observe("download", downloading)
+            probe.count("bytes", received)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+class AsyncRecordingTransport(AsyncTransport):
+    """AsyncTransport recording every body it receives into an archive
+    """
+
+    def __init__(self, archive: Archive, **kwargs):
+        self.archive = archive
+        super(AsyncRecordingTransport, self).__init__(**kwargs)
+
+    async def get(self, url: str, params: dict, probe=null_probe) -> bytes:
+        content = await super(AsyncRecordingTransport, self).get(url,
+                                                                 params,
+                                                                 probe)
+        self.archive.put(params, content)
+        return content
+
+    async def chunks(self, url: str, params: dict, probe=null_probe,
+                     chunk_size: int=1 << 16):
+        received = []
+        async for chunk in super(AsyncRecordingTransport, self).chunks(
+                url, params, probe, chunk_size):
+            received.append(chunk)
+            yield chunk
+        self.archive.put(params, b"".join(received))
+
+
+class AsyncReplayTransport(ReplayTransport):
+    """ReplayTransport for AsyncClient
+    """
+
+    async def get(self, url: str, params: dict, probe=null_probe) -> bytes:
+        return super(AsyncReplayTransport, self).get(url, params, probe)
+
+    async def chunks(self, url: str, params: dict, probe=null_probe,
+                     chunk_size: int=1 << 16):
+        content = super(AsyncReplayTransport, self).get(url, params, probe)
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    async def close(self):
+        pass
+
+
+class AsyncClient(Client):
+    """asyncio client for Alpha Vantage API
+
+    Exposes the same endpoint methods as Client, each returning a coroutine:
+
+        async with AsyncClient(token) as client:
+            frames = await asyncio.gather(*(client.sma(s) for s in symbols))
+    """
+
+    transport_class = AsyncTransport
+    flight_class = AsyncSingleFlight
+
+    def __init__(self,
+                 token,
+                 max_attempts: int=3,
+                 pool_size: int=100,
+                 timeout: tuple=(3.05, 30),
+                 calls_per_minute: float=5,
+                 rate_limiter=None,
+                 cache=None,
+                 history=None,
+                 compute: str="server",
+                 coalesce: bool=True,
+                 store=None,
+                 dtype_policy=None,
+                 metrics=None,
+                 transport=None,
+                 max_concurrency: int=None,
+                 resample: bool=False,
+                 output: str="pandas",
+                 screen=None):
+        """Initializes the client
+
+        Args:
+            max_attempts: Integer, maximum number of requests made to API in
+                in case of failure.
+            pool_size: Integer, maximum number of keep-alive connections
+                kept open to the API.
+            timeout: Tuple, connect and read timeouts in seconds.
+            calls_per_minute: Float, request quota of the API key, or None
+                to disable client-side rate limiting.
+            rate_limiter: TokenBucket, limiter to draw from instead of a
+                private one, may be shared with Client instances.
+            cache: Cache of response bodies consulted before the API, or
+                None.
+            history: HistoryStore, local full histories kept up to date by
+                ts_daily(output_size="incremental"), or None.
+            compute: String, "server" to request indicators from the API or
+                "local" to compute them from downloaded prices.
+            coalesce: bool, whether concurrent identical calls share one
+                request and its parsed frame.
+            store: ColumnStore, store every fetched frame is merged into,
+                or None.
+            dtype_policy: "compact", a footprint.DtypePolicy, or None to
+                keep the parsed dtypes.
+            metrics: Metrics, sink timing every stage of every request, or
+                None.
+            transport: AsyncTransport to send requests through, e.g. an
+                AsyncReplayTransport, or None for a new one. It keeps its
+                own max_attempts, pool_size and timeout and sends through
+                the client's rate limiter unless it has a limiter of its own.
+            max_concurrency: Integer, maximum number of requests in flight,
+                defaults to pool_size, or for a given transport its own.
+            resample: bool, whether local computes derive coarser intervals
+                from one download of the finest.
+            output: String, "pandas", "arrow", "polars" or "numpy", format
+                of the returned frames.
+            screen: ScreenIndex, cross-sectional index given the latest bar
+                of every fetched series it covers, or None.
+        """
+        super(AsyncClient, self).__init__(token,
+                                          max_attempts=max_attempts,
+                                          pool_size=pool_size,
+                                          timeout=timeout,
+                                          calls_per_minute=calls_per_minute,
+                                          rate_limiter=rate_limiter,
+                                          cache=cache,
+                                          history=history,
+                                          compute=compute,
+                                          coalesce=coalesce,
+                                          store=store,
+                                          dtype_policy=dtype_policy,
+                                          metrics=metrics,
+                                          transport=transport,
+                                          resample=resample,
+                                          output=output,
+                                          screen=screen)
+        if transport is None or max_concurrency is not None:
+            self.transport.max_concurrency = max_concurrency or pool_size
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """Closes pooled connections to the API
+        """
+        await self.transport.close()
+
+    async def _fetch(self, params: dict) -> bytes:
+        return await self._coalesced("body", self._download, params)
+
+    async def _download(self, params: dict) -> bytes:
+        probe = self._probe(params)
+        content = self._cached(params)
+        if content is None:
+            content = await self.transport.get(self.base_url, params, probe)
+            self._store(params, content)
+        else:
+            probe.count("cache_hits")
+        return content
+
+    async def _request(self, params: dict, data_format: str):
+        return await self._coalesced("frame", self._load, params, data_format)
+
+    async def _stream(self, params: dict, data_format: str, batch_size: int):
+        assert(data_format == "csv")
+        assert(not self._computes_locally(params))
+        probe = self._probe(params)
+        reader = parsers.CsvBatches(batch_size, self.output)
+        content = self._cached(params)
+        if content is not None:
+            probe.count("cache_hits")
+            chunks = _whole(content)
+        else:
+            chunks = self.transport.chunks(self.base_url, params, probe)
+        parsing = 0.0
+        try:
+            async with aclosing(chunks):
+                async for chunk in chunks:
+                    start = time.perf_counter()
+                    batches = reader.feed(chunk)
+                    parsing += time.perf_counter() - start
+                    for batch in batches:
+                        yield self._batch(batch)
+            start = time.perf_counter()
+            batches = reader.close()
+            parsing += time.perf_counter() - start
+            for batch in batches:
+                yield self._batch(batch)
+        finally:
+            probe.observe("parse", parsing)
+
+    async def _load(self, params: dict, data_format: str):
+        probe = self._probe(params)
+        with probe.time("request"):
+            if self._computes_locally(params):
+                source, interval = self._price_request(params)
+                content = await self._fetch(source)
+                prices = self._parse(content, "csv", probe, "pandas")
+                with probe.time("compute"):
+                    data = compute.evaluate(params, prices, interval)
+                    data = outputs.from_frame(data, self.output)
+            else:
+                content = await self._fetch(params)
+                data = self._parse(content, data_format, probe)
+            if self.store is not None:
+                self.store.save(params, outputs.to_frame(data))
+            if self.screen is not None:
+                self.screen.observe(params, data)
+            if self.dtype_policy is not None:
+                data = self.dtype_policy.apply(data)
+        return data
+
+    async def iter_many(self, symbols, requests_spec, max_workers: int=8):
+        """Client.iter_many() for asyncio, an async generator
+
+        Args:
+            symbols: Iterable, symbols specifying equities
+            requests_spec: Dictionary mapping a result name to a method name
+                or a (method name, keyword arguments) pair, or an iterable of
+                method names used as their own result names
+            max_workers: Integer, maximum number of requests run at once
+
+        Yields:
+            Tuples (symbol, name, result) as they land
+        """
+        plan = self._plan(list(symbols), requests_spec)
+        limit = asyncio.Semaphore(max_workers)
+
+        async def fetch(key):
+            method, symbol, kwargs, _ = plan[key]
+            async with limit:
+                try:
+                    return key, await getattr(self, method)(symbol, **kwargs)
+                except Exception as e:
+                    return key, e
+
+        tasks = [asyncio.ensure_future(fetch(key)) for key in plan]
+        try:
+            for done in asyncio.as_completed(tasks):
+                key, result = await done
+                _, symbol, _, names = plan[key]
+                for name in names:
+                    yield symbol, name, result
+        finally:
+            # an abandoned iteration sends nothing more
+            for task in tasks:
+                task.cancel()
+
+    async def fetch_many(self,
+                         symbols,
+                         requests_spec,
+                         max_workers: int=8,
+                         layout: str="wide"):
+        """Client.fetch_many() for asyncio
+
+        Returns:
+            Tuple (panel, errors) as Client.fetch_many()
+        """
+        assert(layout in layouts)
+        assert(self.output == "pandas")
+        results = [result async for result in
+                   self.iter_many(symbols, requests_spec, max_workers)]
+        return self._panel(results, layout)
+
+    async def _sync_daily(self, symbol: str, adjusted: bool, data_format: str):
+        assert(self.history is not None)
+        func = "TIME_SERIES_DAILY"
+        if adjusted:
+            func = func + "_ADJUSTED"
+        stored = self.history.load(func, symbol)
+        if stored is not None:
+            recent = await self.ts_daily(symbol, adjusted, "compact",
+                                         data_format)
+            merged = history.merge_history(stored, recent)
+            if merged is not None:
+                self.history.save(func, symbol, merged)
+                return merged
+        data = await self.ts_daily(symbol, adjusted, "full", data_format)
+        self.history.save(func, symbol, data)
+        return data
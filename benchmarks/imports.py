@@ -0,0 +1,147 @@
+"""Import-time benchmark of the client's modules
+
+Imports each module in a fresh interpreter, times it with -X importtime,
+and checks which heavy dependencies came along. The exit status is 1 when
+a lightweight module imports numpy or pandas, when an import takes longer
+than its budget, or, against a baseline file, when it got slower by more
+than the tolerance. Results are written to benchmarks/results by default,
+which git ignores:
+
+    python benchmarks/imports.py --output imports.json
+    python benchmarks/imports.py --baseline imports.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+results_dir = os.path.join(root, "benchmarks", "results")
+
+# Modules on the path from a request to its raw body, which must import
+# without any of the heavy dependencies
+lightweight = ["lazy", "endpoints", "metrics", "ratelimit", "scheduler",
+               "cache", "transport", "flight", "recording", "client"]
+heavy = ["numpy", "pandas", "pyarrow"]
+
+# Seconds each lightweight import may take at most, generous enough for a
+# slow machine while still catching an eager pandas import, which costs
+# several times more. Modules pulling in requests get the larger budget.
+budgets = {"transport": 0.35, "recording": 0.35, "client": 0.35}
+default_budget = 0.15
+
+script = ("import sys\n"
+          "import %s\n"
+          "print(','.join(m for m in %r if m in sys.modules))")
+
+
+def measure(name: str) -> tuple:
+    """Import time of a module and the heavy modules it loaded
+
+    Returns:
+        Tuple (seconds, list of heavy module names)
+    """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                          script % (name, heavy)],
+                         cwd=root, capture_output=True, text=True,
+                         check=True)
+    micros = None
+    for line in out.stderr.splitlines():
+        fields = line.split("|")
+        # the module itself is the last line naming it without indentation
+        if len(fields) == 3 and fields[2].strip() == name \
+                and not fields[2][1:].startswith(" "):
+            micros = int(fields[1])
+    assert(micros is not None)
+    loaded = [m for m in out.stdout.strip().split(",") if m]
+    return micros / 1e6, loaded
+
+
+def bench_imports(modules: list, repeat: int) -> list:
+    results = []
+    for name in modules:
+        # a first import writes the bytecode caches
+        measure(name)
+        seconds = []
+        for _ in range(repeat):
+            elapsed, loaded = measure(name)
+            seconds.append(elapsed)
+        results.append({"module": name,
+                        "median": statistics.median(seconds),
+                        "min": min(seconds),
+                        "heavy": loaded})
+    return results
+
+
+def check(results: list, baseline: dict=None, tolerance: float=0.5) -> list:
+    """Problems found in the results
+
+    Returns:
+        List of strings, empty if every import is light and fast enough
+    """
+    problems = []
+    old = {}
+    if baseline is not None:
+        old = {row["module"]: row["median"] for row in baseline["imports"]}
+    for row in results:
+        name = row["module"]
+        if name in lightweight:
+            if row["heavy"]:
+                problems.append("%s imports %s"
+                                % (name, ", ".join(row["heavy"])))
+            budget = budgets.get(name, default_budget)
+            if row["median"] > budget:
+                problems.append("%s takes %.1f ms, over its budget of "
+                                "%.1f ms" % (name, row["median"] * 1000,
+                                             budget * 1000))
+        if name in old and row["median"] > old[name] * (1 + tolerance):
+            problems.append("%s regressed: %.1f ms -> %.1f ms"
+                            % (name, old[name] * 1000,
+                               row["median"] * 1000))
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output",
+                        default=os.path.join(results_dir,
+                                             "import-results.json"),
+                        help="file the results are written to")
+    parser.add_argument("--baseline",
+                        help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="slowdown over the baseline reported as a "
+                             "regression")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="fresh interpreters timed per module")
+    parser.add_argument("--modules",
+                        help="comma separated modules, defaults to the "
+                             "lightweight ones")
+    args = parser.parse_args(argv)
+
+    modules = args.modules.split(",") if args.modules else lightweight
+    results = {"python": sys.version.split()[0],
+               "imports": bench_imports(modules, args.repeat)}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    for row in results["imports"]:
+        print("import %-12s %8.1f ms  %s"
+              % (row["module"], row["median"] * 1000,
+                 ",".join(row["heavy"]) or "-"))
+    print("wrote %s" % args.output)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    problems = check(results["imports"], baseline, args.tolerance)
+    for problem in problems:
+        print("regression %s" % problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""Offline benchmarks of the client against a local stub of the API
+
+Measures, without network access or an API key:
+
+    parse      process_csv and process_json on compact, full and intraday
+               full bodies, into each output format
+    endpoints  latency and throughput of every Client endpoint method, for
+               both data formats, at each concurrency level
+    throttle   recovery of the retrying transport from throttle notes
+
+and writes the results as JSON, by default to benchmarks/results, which git
+ignores. Against a baseline file, every timing that got slower by more than
+the tolerance is reported and the exit status is 1:
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --baseline results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client import Client  # noqa: E402
+from endpoints import registry, required  # noqa: E402
+from outputs import to_frame  # noqa: E402
+from stub import StubServer  # noqa: E402
+
+
+# Directory results are written to unless another file is given
+results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "results")
+
+
+# Arguments of endpoint methods without defaults
+placeholders = {"symbol": "IBM", "from_symbol": "EUR", "to_symbol": "USD"}
+
+parse_cases = {
+    "compact": {"function": "TIME_SERIES_DAILY_ADJUSTED",
+                "outputsize": "compact"},
+    "full": {"function": "TIME_SERIES_DAILY_ADJUSTED",
+             "outputsize": "full"},
+    "intraday_full": {"function": "TIME_SERIES_INTRADAY",
+                      "interval": "1min",
+                      "outputsize": "full"}
+}
+
+
+def _timings(seconds: list) -> dict:
+    ordered = sorted(seconds)
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "median": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "min": ordered[0]
+    }
+
+
+def _client(server: StubServer, **kwargs) -> Client:
+    client = Client("benchmark", calls_per_minute=None, **kwargs)
+    client.base_url = server.url
+    return client
+
+
+def bench_parse(server: StubServer, repeat: int,
+                outputs: list=("pandas",)) -> list:
+    """Timings of the parsers on bodies of each size
+    """
+    results = []
+    for output in outputs:
+        client = _client(server, output=output)
+        for case, params in parse_cases.items():
+            for data_format in ("csv", "json"):
+                body = server.body(dict(params, symbol="IBM",
+                                        datatype=data_format))
+                parse = (client.process_csv if data_format == "csv"
+                         else client.process_json)
+                rows = len(to_frame(parse(body)))
+                seconds = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    parse(body)
+                    seconds.append(time.perf_counter() - start)
+                result = {"case": case, "format": data_format,
+                          "output": output, "bytes": len(body),
+                          "rows": rows}
+                result.update(_timings(seconds))
+                result["rows_per_second"] = rows / result["median"]
+                results.append(result)
+    return results
+
+
+def _arguments(endpoint, index: int) -> dict:
+    kwargs = {}
+    for param in endpoint.params:
+        if param.default is required:
+            kwargs[param.name] = placeholders[param.name]
+    # distinct symbols keep concurrent calls from being coalesced
+    if "symbol" in kwargs:
+        kwargs["symbol"] = "S%d" % index
+    return kwargs
+
+
+def bench_endpoints(server: StubServer, concurrency: list, calls: int,
+                    methods: list=None) -> list:
+    """Latency and throughput of every endpoint method
+    """
+    results = []
+    for endpoint in registry:
+        if methods and endpoint.method not in methods:
+            continue
+        for data_format in ("csv", "json"):
+            for workers in concurrency:
+                client = _client(server, pool_size=workers)
+                method = getattr(client, endpoint.method)
+
+                def timed(index):
+                    kwargs = _arguments(endpoint, index)
+                    kwargs["data_format"] = data_format
+                    start = time.perf_counter()
+                    method(**kwargs)
+                    return time.perf_counter() - start
+
+                timed(calls)
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    seconds = list(pool.map(timed, range(calls)))
+                elapsed = time.perf_counter() - start
+                client.close()
+                result = {"method": endpoint.method, "format": data_format,
+                          "concurrency": workers}
+                result.update(_timings(seconds))
+                result["calls_per_second"] = calls / elapsed
+                results.append(result)
+    return results
+
+
+def bench_throttle(calls: int, throttle_every: int) -> dict:
+    """Throughput while the stub answers every n-th call with a throttle note
+    """
+    with StubServer(throttle_every=throttle_every) as server:
+        client = Client("benchmark", calls_per_minute=None, max_attempts=5)
+        client.base_url = server.url
+        client.transport.backoff = 0.001
+        start = time.perf_counter()
+        for i in range(calls):
+            client.ts_daily("S%d" % i, output_size="compact")
+        elapsed = time.perf_counter() - start
+        client.close()
+        return {"calls": calls, "throttle_every": throttle_every,
+                "throttled": server.throttled,
+                "calls_per_second": calls / elapsed}
+
+
+def environment() -> dict:
+    versions = {}
+    for name in ("numpy", "pandas", "pyarrow", "orjson", "requests"):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    return {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "versions": versions,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def _keyed(results: dict) -> dict:
+    timings = {}
+    for row in results.get("parse", []):
+        key = ("parse", row["case"], row["format"],
+               row.get("output", "pandas"))
+        timings[key] = row["median"]
+    for row in results.get("endpoints", []):
+        key = ("endpoint", row["method"], row["format"], row["concurrency"])
+        timings[key] = row["median"]
+    return timings
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Timings slower than the baseline by more than the tolerance
+
+    Returns:
+        List of (key, baseline seconds, seconds) tuples
+    """
+    old = _keyed(baseline)
+    new = _keyed(results)
+    return [(key, old[key], new[key]) for key in sorted(new, key=str)
+            if key in old and new[key] > old[key] * (1 + tolerance)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output",
+                        default=os.path.join(results_dir,
+                                             "benchmark-results.json"),
+                        help="file the results are written to")
+    parser.add_argument("--baseline",
+                        help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="slowdown over the baseline reported as a "
+                             "regression")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the stub delays every answer")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="upper bound of a random extra delay")
+    parser.add_argument("--concurrency", default="1,4,16",
+                        help="comma separated numbers of threads")
+    parser.add_argument("--calls", type=int, default=32,
+                        help="calls per method, format and concurrency")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="repetitions of every parse")
+    parser.add_argument("--methods",
+                        help="comma separated endpoint methods, "
+                             "defaults to all")
+    parser.add_argument("--outputs", default="pandas",
+                        help="comma separated output formats the parsers "
+                             "are timed for")
+    args = parser.parse_args(argv)
+
+    concurrency = [int(n) for n in args.concurrency.split(",")]
+    methods = args.methods.split(",") if args.methods else None
+    with StubServer(latency=args.latency, jitter=args.jitter) as server:
+        results = {
+            "environment": environment(),
+            "config": vars(args),
+            "parse": bench_parse(server, args.repeat,
+                                 args.outputs.split(",")),
+            "endpoints": bench_endpoints(server, concurrency, args.calls,
+                                         methods)
+        }
+    results["throttle"] = bench_throttle(args.calls, throttle_every=4)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    for row in results["parse"]:
+        print("parse %-14s %-4s %-6s %9d rows %9.2f ms"
+              % (row["case"], row["format"], row["output"], row["rows"],
+                 row["median"] * 1000))
+    print("wrote %s" % args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for key, old, new in regressions:
+            print("regression %s: %.2f ms -> %.2f ms"
+                  % ("/".join(map(str, key)), old * 1000, new * 1000))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+"""Local stand-in for the Alpha Vantage API
+
+Serves synthetic CSV and JSON bodies shaped like the real API's, sized
+like its compact, full and intraday full answers, with a configurable
+latency and quota:
+
+    server = StubServer(latency=0.05, quota_per_minute=75).start()
+    client.base_url = server.url
+    ...
+    server.stop()
+
+Bodies are generated once per distinct query and reused, so the stub
+costs little next to the client under test.
+"""
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+
+# Rows of each answer size. A full daily series covers about 20 years; a
+# full intraday one the last 30 trading days of 16 hours of extended
+# session.
+sizes = {"compact": 100, "full": 5000}
+intraday_full_rows = {
+    "1min": 30 * 960,
+    "5min": 30 * 192,
+    "15min": 30 * 64,
+    "30min": 30 * 32,
+    "60min": 30 * 16
+}
+
+price_columns = ["open", "high", "low", "close", "volume"]
+adjusted_columns = ["open", "high", "low", "close", "adjusted_close",
+                    "volume", "dividend_amount", "split_coefficient"]
+
+# Output columns of the indicators answering with more than one column or
+# with a column named other than the function
+indicator_columns = {
+    "MACD": ["MACD", "MACD_Signal", "MACD_Hist"],
+    "STOCH": ["SlowK", "SlowD"],
+    "AD": ["Chaikin A/D"],
+    "AROON": ["Aroon Down", "Aroon Up"],
+    "BBANDS": ["Real Upper Band", "Real Middle Band", "Real Lower Band"],
+    "HT_SINE": ["SINE", "LEAD SINE"],
+    "HT_PHASOR": ["PHASE", "QUADRATURE"]
+}
+
+throttle_note = json.dumps({
+    "Note": "Thank you for using Alpha Vantage! Our standard API call "
+            "frequency is 5 calls per minute and 500 calls per day."
+}).encode("utf-8")
+
+
+def _prices(function: str) -> bool:
+    return function.startswith(("TIME_SERIES", "FX_", "DIGITAL_", "CRYPTO_"))
+
+
+def _period(params: dict) -> str:
+    # "intraday", "daily", "weekly" or "monthly" bars of an answer
+    function = params.get("function", "")
+    if _prices(function):
+        for period in ("INTRADAY", "WEEKLY", "MONTHLY"):
+            if period in function:
+                return period.lower()
+        return "daily"
+    interval = params.get("interval", "daily")
+    return "intraday" if interval in intraday_full_rows else interval
+
+
+def _rows(params: dict) -> int:
+    if params.get("outputsize") == "compact":
+        return sizes["compact"]
+    period = _period(params)
+    if period == "intraday":
+        return intraday_full_rows[params.get("interval", "5min")]
+    if period == "weekly":
+        return sizes["full"] // 5
+    if period == "monthly":
+        return sizes["full"] // 21
+    return sizes["full"]
+
+
+def _times(params: dict, rows: int) -> pd.DatetimeIndex:
+    period = _period(params)
+    if period == "intraday":
+        return pd.date_range(end="2024-06-28 19:59",
+                             periods=rows,
+                             freq=params.get("interval", "5min"))
+    if period == "weekly":
+        return pd.date_range(end="2024-06-28", periods=rows, freq="W-FRI")
+    if period == "monthly":
+        return pd.date_range(end="2024-06-28", periods=rows, freq="BME")
+    return pd.bdate_range(end="2024-06-28", periods=rows)
+
+
+def _columns(function: str) -> list:
+    if function.startswith("TIME_SERIES"):
+        if function.endswith("ADJUSTED"):
+            return adjusted_columns
+        return price_columns
+    if function.startswith("FX_"):
+        return price_columns[:4]
+    if _prices(function):
+        return price_columns
+    return indicator_columns.get(function, [function])
+
+
+def synthetic(params: dict, seed: int=0) -> pd.DataFrame:
+    """Synthetic answer of a request, newest bar first
+
+    Prices follow a random walk; indicator columns are noise around 50.
+
+    Args:
+        params: Dictionary, query parameters of the request
+        seed: Integer, seed of the random generator
+    """
+    if params.get("outputsize") == "compact":
+        # the newest bars of the full answer, as the API's compact answers
+        # are, so that incremental syncs find their overlap
+        full = synthetic(dict(params, outputsize="full"), seed)
+        return full.iloc[:sizes["compact"]]
+    function = params.get("function", "")
+    rows = _rows(params)
+    index = _times(params, rows)
+    rng = np.random.default_rng(seed)
+    columns = _columns(function)
+    data = {}
+    if "close" in columns:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+        spread = close * rng.uniform(0.001, 0.02, rows)
+        data["open"] = close + rng.uniform(-0.5, 0.5, rows) * spread
+        data["high"] = np.maximum(data["open"], close) + spread / 2
+        data["low"] = np.minimum(data["open"], close) - spread / 2
+        data["close"] = close
+        if "adjusted_close" in columns:
+            data["adjusted_close"] = close * 0.98
+        if "volume" in columns:
+            if function.startswith(("DIGITAL_", "CRYPTO_")):
+                data["volume"] = rng.uniform(0, 5000, rows).round(8)
+            else:
+                data["volume"] = rng.integers(10 ** 5, 10 ** 7, rows)
+        if "dividend_amount" in columns:
+            data["dividend_amount"] = np.zeros(rows)
+            data["split_coefficient"] = np.ones(rows)
+    else:
+        for name in columns:
+            data[name] = 50 + rng.normal(0, 10, rows)
+    frame = pd.DataFrame({name: data[name] for name in columns},
+                         index=index)
+    return frame.iloc[::-1]
+
+
+def _stamp(index: pd.DatetimeIndex) -> list:
+    if (index == index.normalize()).all():
+        return index.strftime("%Y-%m-%d").tolist()
+    return index.strftime("%Y-%m-%d %H:%M:%S").tolist()
+
+
+def render_csv(frame: pd.DataFrame, params: dict) -> bytes:
+    """CSV body of a synthetic answer
+    """
+    out = frame.copy()
+    out.index = pd.Index(_stamp(frame.index), name="timestamp")
+    return out.to_csv(float_format="%.4f").encode("utf-8")
+
+
+def render_json(frame: pd.DataFrame, params: dict) -> bytes:
+    """JSON body of a synthetic answer
+    """
+    function = params.get("function", "")
+    if _prices(function):
+        keys = ["%d. %s" % (i + 1, name.replace("_", " "))
+                for i, name in enumerate(frame.columns)]
+        title = "Time Series (%s)" % params.get("interval", "Daily")
+    else:
+        keys = list(frame.columns)
+        title = "Technical Analysis: %s" % function
+    values = [["%.4f" % v for v in frame[name].to_numpy()]
+              for name in frame.columns]
+    series = {
+        stamp: dict(zip(keys, row))
+        for stamp, row in zip(_stamp(frame.index), zip(*values))
+    }
+    meta = {"1: Symbol": params.get("symbol", ""),
+            "2: Indicator": function}
+    return json.dumps({"Meta Data": meta, title: series}).encode("utf-8")
+
+
+class StubServer(object):
+    """Threaded HTTP server answering like the Alpha Vantage API
+    """
+
+    def __init__(self,
+                 latency: float=0.0,
+                 jitter: float=0.0,
+                 quota_per_minute: float=None,
+                 throttle_every: int=None,
+                 fail_every: int=None,
+                 fail_status: int=503,
+                 host: str="127.0.0.1",
+                 port: int=0):
+        """Initializes the server
+
+        Args:
+            latency: Float, seconds every answer is delayed by
+            jitter: Float, upper bound of a uniform random delay added to
+                latency
+            quota_per_minute: Float, requests accepted in any 60 second
+                window before answering with a throttle note, or None
+            throttle_every: Integer, answers every n-th request with a
+                throttle note, or None
+            fail_every: Integer, answers every n-th request with an HTTP
+                error, or None
+            fail_status: Integer, status of the failed answers
+            host: String, address to listen on
+            port: Integer, port to listen on, or 0 for any free port
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_per_minute = quota_per_minute
+        self.throttle_every = throttle_every
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.lock = threading.Lock()
+        self.bodies = {}
+        self.accepted = deque()
+        self.requests = 0
+        self.throttled = 0
+        self.failed = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return "http://%s:%d/query?" % (host, port)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                params = dict(parse_qsl(urlparse(self.path).query))
+                status, body = stub.answer(params)
+                self.send_response(status)
+                if body[:1] == b"{":
+                    content_type = "application/json"
+                else:
+                    content_type = "application/x-download"
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _fails(self) -> bool:
+        # counts the request; a failed one is neither throttled nor accepted
+        with self.lock:
+            self.requests += 1
+            every = self.fail_every
+            if every and self.requests % every == 0:
+                self.failed += 1
+                return True
+            return False
+
+    def _throttles(self) -> bool:
+        with self.lock:
+            every = self.throttle_every
+            if every and self.requests % every == 0:
+                self.throttled += 1
+                return True
+            if self.quota_per_minute is not None:
+                now = time.monotonic()
+                while self.accepted and self.accepted[0] <= now - 60:
+                    self.accepted.popleft()
+                if len(self.accepted) >= self.quota_per_minute:
+                    self.throttled += 1
+                    return True
+                self.accepted.append(now)
+            return False
+
+    def body(self, params: dict) -> bytes:
+        """Body answering a request, generated on first use
+
+        Args:
+            params: Dictionary, query parameters of the request
+        """
+        # every symbol gets the same series
+        key = tuple(sorted((k, v) for k, v in params.items()
+                           if k not in ("apikey", "symbol", "from_symbol",
+                                        "to_symbol")))
+        body = self.bodies.get(key)
+        if body is None:
+            frame = synthetic(params)
+            if params.get("datatype") == "json":
+                body = render_json(frame, params)
+            else:
+                body = render_csv(frame, params)
+            self.bodies[key] = body
+        return body
+
+    def answer(self, params: dict) -> tuple:
+        """Status and body answering a request
+        """
+        delay = self.latency
+        if self.jitter:
+            delay += np.random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if self._fails():
+            return self.fail_status, b"HTTP error %d" % self.fail_status
+        if self._throttles():
+            return 200, throttle_note
+        return 200, self.body(params)
+
+    def start(self):
+        """Serves requests from a daemon thread
+
+        Returns:
+            The server, for chaining
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
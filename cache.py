@@ -0,0 +1,208 @@
+"""Caches of response bodies, fresh until their interval's next bar
+
+Entries expire by a TTL derived from the request instead of being
+revalidated: Alpha Vantage answers without ETag or Last-Modified headers
+and ignores conditional requests, so an expired body is fetched again.
+"""
+import datetime
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from zoneinfo import ZoneInfo
+    market_tz = ZoneInfo("America/New_York")
+except Exception:
+    market_tz = datetime.timezone(datetime.timedelta(hours=-5))
+
+# US equity sessions close at 16:00 New York time; Alpha Vantage publishes
+# the end-of-day bar a little later.
+market_close = datetime.time(16, 0)
+publish_delay = datetime.timedelta(minutes=30)
+intraday_ttls = {
+    "1min": 60,
+    "5min": 300,
+    "15min": 900,
+    "30min": 1800,
+    "60min": 3600
+}
+
+
+def cache_key(params: dict) -> str:
+    """Key identifying a request independently of the API key
+
+    Args:
+        params: Dictionary, query parameters of the request
+    """
+    return "&".join("%s=%s" % (k, params[k])
+                    for k in sorted(params) if k != "apikey")
+
+
+def next_publish(now: datetime.datetime=None) -> datetime.datetime:
+    """Time the next end-of-day bar is published
+
+    Only weekends are treated as market holidays.
+
+    Args:
+        now: datetime, aware current time, defaults to the system clock
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    now = now.astimezone(market_tz)
+    day = now.date()
+    while True:
+        if day.weekday() < 5:
+            publish = datetime.datetime.combine(day, market_close, market_tz)
+            publish = publish + publish_delay
+            if publish > now:
+                return publish
+        day += datetime.timedelta(days=1)
+
+
+def ttl_for(params: dict, now: datetime.datetime=None) -> float:
+    """Seconds a response stays fresh, derived from its interval
+
+    Intraday responses live for one bar. Daily, weekly and monthly responses
+    only change when a new end-of-day bar is published.
+
+    Args:
+        params: Dictionary, query parameters of the request
+        now: datetime, aware current time, defaults to the system clock
+    """
+    interval = params.get("interval")
+    if interval in intraday_ttls:
+        return intraday_ttls[interval]
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return (next_publish(now) - now).total_seconds()
+
+
+class MemoryCache(object):
+    """Thread-safe in-memory LRU cache of response bodies
+    """
+
+    def __init__(self, max_entries: int=128):
+        """Initializes the cache
+
+        Args:
+            max_entries: Integer, number of responses kept before the least
+                recently used one is evicted
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def entry(self, key: str):
+        """Fresh (content, expires) pair stored under key, or None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def get(self, key: str):
+        entry = self.entry(key)
+        return None if entry is None else entry[0]
+
+    def set(self, key: str, content: bytes, ttl: float):
+        with self.lock:
+            self.entries[key] = (content, time.time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DiskCache(object):
+    """Response bodies persisted in a SQLite database
+    """
+
+    def __init__(self, path: str):
+        """Initializes the cache
+
+        Args:
+            path: String, database file, created if needed
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                            "key TEXT PRIMARY KEY, "
+                            "content BLOB NOT NULL, "
+                            "expires REAL NOT NULL)")
+
+    def entry(self, key: str):
+        """Fresh (content, expires) pair stored under key, or None
+        """
+        with self.lock:
+            row = self.db.execute("SELECT content, expires FROM responses "
+                                  "WHERE key = ? AND expires > ?",
+                                  (key, time.time())).fetchone()
+        return None if row is None else (bytes(row[0]), row[1])
+
+    def get(self, key: str):
+        entry = self.entry(key)
+        return None if entry is None else entry[0]
+
+    def set(self, key: str, content: bytes, ttl: float):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, content, time.time() + ttl))
+
+    def purge(self):
+        """Deletes expired responses
+        """
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM responses WHERE expires <= ?",
+                            (time.time(),))
+
+    def clear(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM responses")
+
+    def close(self):
+        self.db.close()
+
+
+class TieredCache(object):
+    """In-memory LRU cache in front of a persistent cache
+    """
+
+    def __init__(self, disk, memory: MemoryCache=None):
+        """Initializes the cache
+
+        Args:
+            disk: DiskCache, persistent cache
+            memory: MemoryCache, cache consulted first, defaults to a new
+                MemoryCache
+        """
+        self.disk = disk
+        self.memory = memory or MemoryCache()
+
+    def get(self, key: str):
+        content = self.memory.get(key)
+        if content is None:
+            entry = self.disk.entry(key)
+            if entry is None:
+                return None
+            content, expires = entry
+            self.memory.set(key, content, expires - time.time())
+        return content
+
+    def set(self, key: str, content: bytes, ttl: float):
+        self.memory.set(key, content, ttl)
+        self.disk.set(key, content, ttl)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
@@ -1,647 +1,536 @@
-import sys
-
-import csv
-import json
-import requests
-from io import StringIO
-
+import contextvars
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 
-import numpy as np
-import pandas as pd
+import lazy
+from cache import MemoryCache, cache_key, ttl_for
+from endpoints import data_formats, default_batch_size, endpoints, intervals
+from endpoints import output_sizes, registry, series_types
+from flight import SingleFlight
+from metrics import Metrics, null_probe
+from ratelimit import TokenBucket
+from transport import Transport
 
+# Only needed once a body is turned into a frame, so that fetching raw
+# bodies starts without importing numpy and pandas
+pd = lazy.module("pandas")
+compute = lazy.module("compute")
+footprint = lazy.module("footprint")
+history = lazy.module("history")
+outputs = lazy.module("outputs")
+parsers = lazy.module("parsers")
 
-intervals = {
-    "1min",
-    "5min",
-    "15min",
-    "30min",
-    "60min",
-    "daily",
-    "weekly",
-    "monthly"
-}
-series_types = {"close", "open", "high", "low"}
-data_formats = {"json", "csv"}
-output_sizes = {"full", "compact"}
+
+computes = {"server", "local"}
+layouts = {"wide", "long"}
 
 
 class Client(object):
     """Python client for Alpha Vantage API
     """
 
-    def __init__(self, token, max_attempts: int=3):
+    transport_class = Transport
+    flight_class = SingleFlight
+
+    def __init__(self,
+                 token,
+                 max_attempts: int=3,
+                 pool_size: int=10,
+                 timeout: tuple=(3.05, 30),
+                 calls_per_minute: float=5,
+                 rate_limiter: TokenBucket=None,
+                 cache=None,
+                 history=None,
+                 compute: str="server",
+                 coalesce: bool=True,
+                 store=None,
+                 dtype_policy=None,
+                 metrics: Metrics=None,
+                 transport: Transport=None,
+                 resample: bool=False,
+                 output: str="pandas",
+                 screen=None):
         """Initializes the client
 
         Args:
             max_attempts: Integer, maximum number of requests made to API in
                 in case of failure.
+            pool_size: Integer, maximum number of keep-alive connections
+                kept open to the API.
+            timeout: Tuple, connect and read timeouts in seconds.
+            calls_per_minute: Float, request quota of the API key, or None
+                to disable client-side rate limiting.
+            rate_limiter: TokenBucket, limiter to draw from instead of a
+                private one, e.g. ratelimit.shared_bucket to split one
+                quota between processes.
+            cache: Cache of response bodies consulted before the API, e.g.
+                cache.TieredCache(cache.DiskCache(path)), or None.
+            history: HistoryStore, local full histories kept up to date by
+                ts_daily(output_size="incremental"), or None.
+            compute: String, "server" to request indicators from the API or
+                "local" to compute them from one price download per symbol
+                and interval, cached in memory unless a cache is given.
+            coalesce: bool, whether concurrent identical calls share one
+                request and its parsed frame, each caller but the first
+                receiving a copy.
+            store: ColumnStore, store every fetched frame is merged into,
+                read back with stored(), or None.
+            dtype_policy: "compact" to return float32 prices and uint32
+                volumes, a footprint.DtypePolicy, or None to keep the
+                parsed dtypes. The policy's report() tells the memory
+                saved; stored series keep full precision.
+            metrics: Metrics, sink timing every stage of every request and
+                counting retries, cache hits and bytes, or None.
+            transport: Transport to send requests through instead of a new
+                instance of transport_class, e.g. a
+                recording.ReplayTransport for offline runs. It keeps its own
+                max_attempts, pool_size and timeout, which the arguments of
+                the client do not change, and sends through the client's
+                rate limiter unless it was given a limiter of its own.
+            resample: bool, whether local computes derive their prices from
+                one download per symbol, 1min bars for intraday intervals
+                and daily bars for the others, instead of downloading every
+                interval.
+            output: String, "pandas" for DataFrames, "arrow" for pyarrow
+                Tables, "polars" for polars DataFrames or "numpy" for
+                dictionaries of arrays, built straight from the body. The
+                others lead with a "time" column instead of an index, and
+                dtype policies and history stores need "pandas".
+            screen: ScreenIndex, cross-sectional index given the latest bar
+                of every fetched series it covers, or None.
         """
+        assert(compute in computes)
+        if output != "pandas":
+            outputs.check(output)
+            assert(dtype_policy is None and history is None)
+        if compute == "local" and cache is None:
+            cache = MemoryCache()
 
         self.apikey = token
         self.base_url = "https://www.alphavantage.co/query?"
         self.max_attempts = max_attempts
-
-    def process_csv(self, r: requests.Response) -> pd.DataFrame:
-        decoded = r.content.decode("utf-8")
-        data = pd.read_csv(StringIO(decoded))
-        columns = data.columns.values
-        if columns[0] != "time":
-            columns[0] = "time"
-        data.columns = columns
-        data = data.set_index("time")
-        return data
-
-    def process_json(self, r: requests.Response) -> pd.DataFrame:
-        decoded = r.json()
-        data = pd.read_json(decoded)
-        return data
-
-    def ts_daily(self,
-                 symbol: str,
-                 adjusted: bool=True,
-                 output_size: str="full",
-                 data_format: str="csv"):
-        """Time series data for a particular equity
-
-        Args:
-            symbol: String, symbol specifying equity
-            adjusted: bool,  whether to use adjusted prices
-            output_size: String, size of time series data
-            data_format: String, format of response
-        """
-        assert(output_size in output_sizes)
-        assert(data_format in data_formats)
-        func = "TIME_SERIES_DAILY"
-        if adjusted:
-            func = func + "_ADJUSTED"
-        params = {
-            "function": func,
-            "symbol": symbol.upper(),
-            "outputsize": output_size,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
-
-    def sma(self,
-            symbol: str,
-            interval: str="daily",
-            time_period: int=15,
-            series_type: str="close",
-            data_format: str="csv"):
-        """Simple moving average
-
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period: Integer, number of data points to collect
-            series_type: String, desired price type (open, high, low, close)
-            data_format: String, format of response
-        """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "SMA",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "time_period": time_period,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
+        if rate_limiter is None and calls_per_minute is not None:
+            rate_limiter = TokenBucket(calls_per_minute / 60.0)
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.history = history
+        self.compute = compute
+        self.resample = resample
+        self.output = output
+        self.flights = self.flight_class() if coalesce else None
+        self.store = store
+        self.screen = screen
+        self.dtype_policy = None
+        if dtype_policy is not None:
+            self.dtype_policy = footprint.resolve_policy(dtype_policy)
+        self.metrics = metrics
+        if transport is None:
+            transport = self.transport_class(max_attempts=max_attempts,
+                                             pool_size=pool_size,
+                                             timeout=timeout,
+                                             limiter=rate_limiter)
         else:
-            return self.process_json(r)
-
-    def ema(self,
-            symbol: str,
-            interval: str="daily",
-            time_period: int=15,
-            series_type: str="close",
-            data_format: str="csv"):
-        """Exponential moving average
+            if getattr(transport, "limiter", None) is None:
+                transport.limiter = rate_limiter
+            self.max_attempts = getattr(transport, "max_attempts",
+                                        max_attempts)
+        self.transport = transport
 
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period: Integer, number of data points to collect
-            series_type: String, desired price type (open, high, low, close)
-            data_format: String, format of response
-        """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "EMA",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "time_period": time_period,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
+    def __enter__(self):
+        return self
 
-    def wma(self,
-            symbol: str,
-            interval: str="daily",
-            time_period: int=15,
-            series_type: str="close",
-            data_format: str="csv"):
-        """Weighted moving average
+    def __exit__(self, *exc):
+        self.close()
 
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period: Integer, number of data points to collect
-            series_type: String, desired price type (open, high, low, close)
-            data_format: String, format of response
+    def close(self):
+        """Closes pooled connections to the API
         """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "WMA",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "time_period": time_period,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
+        self.transport.close()
+
+    def _cached(self, params: dict):
+        if self.cache is None:
+            return None
+        return self.cache.get(cache_key(params))
+
+    def _store(self, params: dict, content: bytes):
+        if self.cache is not None:
+            self.cache.set(cache_key(params), content, ttl_for(params))
+
+    def _coalesced(self, kind: str, function, params: dict, *args):
+        if self.flights is None:
+            return function(params, *args)
+        key = (kind, cache_key(params))
+        return self.flights.do(key, function, params, *args)
+
+    def _fetch(self, params: dict) -> bytes:
+        return self._coalesced("body", self._download, params)
+
+    def _probe(self, params: dict):
+        if self.metrics is None:
+            return null_probe
+        return self.metrics.probe(params["function"])
+
+    def _download(self, params: dict) -> bytes:
+        probe = self._probe(params)
+        content = self._cached(params)
+        if content is None:
+            content = self.transport.get(self.base_url, params, probe)
+            self._store(params, content)
         else:
-            return self.process_json(r)
-
-    def macd(self,
-             symbol: str,
-             interval: str="daily",
-             series_type: str="close",
-             data_format: str="csv",
-             fast: int=12,
-             slow: int=26,
-             signal: int=9):
-        """MACD (Moving Average Convergence Divergence)
+            probe.count("cache_hits")
+        return content
+
+    def _computes_locally(self, params: dict) -> bool:
+        return (self.compute == "local"
+                and params["function"] in compute.local_functions)
+
+    def _price_request(self, params: dict) -> tuple:
+        # prices a local compute starts from, and their interval
+        interval = params["interval"]
+        if self.resample:
+            interval = compute.base_intervals[interval]
+        return compute.price_params(params, self.resample), interval
+
+    def call(self,
+             method: str,
+             *args,
+             stream: bool=False,
+             batch_size: int=default_batch_size,
+             **kwargs):
+        """Requests an endpoint of the registry
+
+        Every endpoint method is a call to this one, so fetching, caching
+        and parsing share one path.
 
         Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            series_type: String, desired price type (open, high, low, close)
-            data_format: String, format of response
-            fast: Integer, fast period
-            slow: Integer, slow period
-            signal: Integer, signal period
+            method: String, name of the endpoint method, e.g. "sma"
+            args: Positional arguments of the endpoint method
+            stream: bool, whether to return an iterator of frames of
+                batch_size bars, newest first, each parsed as soon as its
+                lines of the CSV body have arrived. Streamed calls are not
+                coalesced, their bodies not cached and their frames not
+                stored.
+            batch_size: Integer, bars in every streamed frame but the last
+            kwargs: Keyword arguments of the endpoint method
         """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "MACD",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "fastperiod": fast,
-            "slowperiod": slow,
-            "signalperiod": signal,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
-
-    def stoch(self,
-              symbol: str,
-              interval: str="daily",
-              data_format: str="csv",
-              fastk: int=5,
-              slowk: int=3,
-              slowd: int=3):
-        """Stochastic Oscillator
-
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            data_format: String, format of response
-            fastk: Integer, fast k period
-            slowk: Integer, slow k period
-            slowd: Integer, slow d period
-        """
-        assert(interval in intervals)
-        assert(data_format in data_formats)
-        params = {
-            "function": "STOCH",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "fastkperiod": fastk,
-            "slowkperiod": slowk,
-            "slowdperiod": slowd,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
-
-    def rsi(self,
-            symbol: str,
-            interval: str="daily",
-            time_period: int=14,
-            series_type: str="close",
-            data_format: str="csv"):
-        """RSI (Relative Strength Index)
-
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period: Integer, number of data points used in calculations
-            series_type: String, desired price type (open, high, low, close)
-            data_format: String, format of response
-        """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "RSI",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "time_period": time_period,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
-
-    def momentum(self,
-                 symbol: str,
-                 interval: str="daily",
-                 time_period: int=14,
-                 series_type: str="close",
-                 data_format: str="csv"):
-        """Momentum
+        params, data_format = endpoints[method].build(self.apikey,
+                                                      *args,
+                                                      **kwargs)
+        if stream:
+            return self._stream(params, data_format, batch_size)
+        return self._request(params, data_format)
 
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period: Integer, number of data points used in calculations
-            series_type: String, desired price type (open, high, low, close)
-            data_format: String, format of response
-        """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "MOM",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "time_period": time_period,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
+    def raw(self, method: str, *args, **kwargs) -> bytes:
+        """Body of an endpoint call as the API answered it
 
-    def ppo(self,
-            symbol: str,
-            interval: str="daily",
-            series_type: str="close",
-            data_format: str="csv",
-            fast: int=12,
-            slow: int=26):
-        """PPO (Percentage Price Oscillator)
+        The body is cached and coalesced like any other, but never parsed,
+        so neither numpy nor pandas is imported on the way.
 
         Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            series_type: String, desired price type (open, high, low, close)
-            data_format: String, format of response
-            fast: Integer, fast period
-            slow: Integer, slow period
+            method: String, name of the endpoint method, e.g. "sma"
+            args: Positional arguments of the endpoint method
+            kwargs: Keyword arguments of the endpoint method
         """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "PPO",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "fastperiod": fast,
-            "slowperiod": slow,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
+        params, _ = endpoints[method].build(self.apikey, *args, **kwargs)
+        return self._fetch(params)
+
+    def _request(self, params: dict, data_format: str):
+        return self._coalesced("frame", self._load, params, data_format)
+
+    def _chunks(self, params: dict, probe):
+        content = self._cached(params)
+        if content is not None:
+            probe.count("cache_hits")
+            return _whole(content)
+        return self.transport.chunks(self.base_url, params, probe)
+
+    def _stream(self, params: dict, data_format: str, batch_size: int):
+        # a generator, so the request is only sent once iteration starts
+        assert(data_format == "csv")
+        assert(not self._computes_locally(params))
+        probe = self._probe(params)
+        reader = parsers.CsvBatches(batch_size, self.output)
+        parsing = 0.0
+        try:
+            # closed at once when the caller stops iterating early, which
+            # releases the connection
+            with closing(self._chunks(params, probe)) as chunks:
+                for chunk in chunks:
+                    start = time.perf_counter()
+                    batches = reader.feed(chunk)
+                    parsing += time.perf_counter() - start
+                    for batch in batches:
+                        yield self._batch(batch)
+            start = time.perf_counter()
+            batches = reader.close()
+            parsing += time.perf_counter() - start
+            for batch in batches:
+                yield self._batch(batch)
+        finally:
+            probe.observe("parse", parsing)
+
+    def _batch(self, data):
+        if self.dtype_policy is not None:
+            return self.dtype_policy.apply(data)
+        return data
 
-    def ad(self, symbol: str, interval: str="daily", data_format: str="csv"):
-        """Chaikin A/D (Accumulation/Distribution) line
+    def _load(self, params: dict, data_format: str):
+        probe = self._probe(params)
+        with probe.time("request"):
+            if self._computes_locally(params):
+                source, interval = self._price_request(params)
+                prices = self._parse(self._fetch(source), "csv", probe,
+                                     "pandas")
+                with probe.time("compute"):
+                    data = compute.evaluate(params, prices, interval)
+                    data = outputs.from_frame(data, self.output)
+            else:
+                data = self._parse(self._fetch(params), data_format, probe)
+            if self.store is not None:
+                self.store.save(params, outputs.to_frame(data))
+            if self.screen is not None:
+                self.screen.observe(params, data)
+            if self.dtype_policy is not None:
+                data = self.dtype_policy.apply(data)
+        return data
 
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            data_format: String, format of response
-        """
-        assert(interval in intervals)
-        assert(data_format in data_formats)
-        params = {
-            "function": "AD",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
+    def stored(self, method: str, *args, start=None, end=None, **kwargs):
+        """Series of an endpoint call read back from the client's store
 
-    def adx(self,
-            symbol: str,
-            interval: str="daily",
-            time_period: int=14,
-            data_format: str="csv"):
-        """ADX (Average Directional Index)
+        Nothing is requested from the API; the series holds every bar that
+        earlier calls fetched.
 
         Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period: Integer, number of data points used in calculations
-            data_format: String, format of response
+            method: String, name of the endpoint method, e.g. "sma"
+            args: Positional arguments of the endpoint method
+            start: Timestamp or string, first time included, or None
+            end: Timestamp or string, last time included, or None
+            kwargs: Keyword arguments of the endpoint method
+
+        Returns:
+            DataFrame, newest bar first, or None if nothing was stored
         """
-        assert(interval in intervals)
-        assert(data_format in data_formats)
-        params = {
-            "function": "ADX",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "time_period": str(time_period),
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
+        assert(self.store is not None)
+        params, _ = endpoints[method].build(self.apikey, *args, **kwargs)
+        return self.store.load(params, start, end)
+
+    def _parse(self,
+               content: bytes,
+               data_format: str,
+               probe=null_probe,
+               output: str=None):
+        with probe.time("parse"):
+            if data_format == "csv":
+                return self.process_csv(content, output)
+            else:
+                return self.process_json(content, probe, output)
+
+    def process_csv(self, content: bytes, output: str=None):
+        return parsers.read_csv(content, output or self.output)
+
+    def process_json(self,
+                     content: bytes,
+                     probe=null_probe,
+                     output: str=None):
+        with probe.time("decode"):
+            decoded = parsers.json_loads(content)
+        return parsers.json_frame(decoded, output or self.output)
+
+    def _plan_key(self, method: str, symbol: str, kwargs: dict):
+        # calls of one request share a key however their arguments are
+        # spelled; incremental syncs are not a single request
+        if method in endpoints and kwargs.get("output_size") != "incremental":
+            params, _ = endpoints[method].build("", symbol, **kwargs)
+            return cache_key(params)
+        return (method, symbol, tuple(sorted(kwargs.items())))
+
+    def _plan(self, symbols, requests_spec) -> dict:
+        if isinstance(requests_spec, dict):
+            specs = requests_spec.items()
         else:
-            return self.process_json(r)
-
-    def cci(self,
-            symbol: str,
-            interval: str="daily",
-            time_period: int=20,
-            data_format: str="csv"):
-        """CCI (Commodity Channel Index)
+            specs = ((method, method) for method in requests_spec)
+        plan = {}
+        for name, spec in specs:
+            if isinstance(spec, str):
+                method, kwargs = spec, {}
+            else:
+                method, kwargs = spec
+            assert(callable(getattr(self, method, None)))
+            for symbol in symbols:
+                symbol = symbol.upper()
+                key = self._plan_key(method, symbol, kwargs)
+                call = plan.setdefault(key, (method, symbol, kwargs, []))
+                if name not in call[3]:
+                    call[3].append(name)
+        return plan
+
+    def iter_many(self, symbols, requests_spec, max_workers: int=8):
+        """Fetches many symbols and endpoints, yielding results as they land
+
+        Identical requests are made once and fanned out to every name that
+        asked for them. Errors are yielded in place of the frame instead of
+        aborting the batch. Every request runs in a copy of the caller's
+        context, so a scheduler.priority() around the batch applies to it.
 
         Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period: Integer, number of data points used in calculations
-            data_format: String, format of response
+            symbols: Iterable, symbols specifying equities
+            requests_spec: Dictionary mapping a result name to a method name
+                or a (method name, keyword arguments) pair, or an iterable of
+                method names used as their own result names
+            max_workers: Integer, maximum number of requests run at once
+
+        Yields:
+            Tuples (symbol, name, result) where symbol is upper-cased and
+            result is the parsed frame or the exception raised while
+            fetching it
         """
-        assert(interval in intervals)
-        assert(data_format in data_formats)
-        params = {
-            "function": "CCI",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "time_period": str(time_period),
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
-
-    def aroon(self,
-              symbol: str,
-              interval: str="daily",
-              time_period: int=20,
-              data_format: str="csv"):
-        """Aroon
+        plan = self._plan(list(symbols), requests_spec)
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {}
+            for key, (method, symbol, kwargs, _) in plan.items():
+                context = contextvars.copy_context()
+                future = pool.submit(context.run,
+                                     getattr(self, method),
+                                     symbol,
+                                     **kwargs)
+                futures[future] = key
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                _, symbol, _, names = plan[futures[future]]
+                for name in names:
+                    yield symbol, name, result
+        finally:
+            # an abandoned iteration sends nothing more; the requests
+            # already running finish
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def fetch_many(self,
+                   symbols,
+                   requests_spec,
+                   max_workers: int=8,
+                   layout: str="wide"):
+        """Fetches many symbols and endpoints into one panel
 
         Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period: Integer, number of data points used in calculations
-            data_format: String, format of response
+            symbols: Iterable, symbols specifying equities
+            requests_spec: Dictionary mapping a result name to a method name
+                or a (method name, keyword arguments) pair, or an iterable of
+                method names used as their own result names
+            max_workers: Integer, maximum number of requests run at once
+            layout: String, "wide" for one column per symbol, name and
+                field, or "long" for rows stacked under symbol and
+                indicator columns, category encoded by a dtype policy
+
+        Returns:
+            Tuple (panel, errors) where panel is a DataFrame with columns
+            keyed by symbol, name and field, or the long panel, and errors
+            maps (symbol, name) to the exception raised while fetching it
         """
-        assert(interval in intervals)
-        assert(data_format in data_formats)
-        params = {
-            "function": "AROON",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "time_period": str(time_period),
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
-
-    def aroon_osc(self,
-                  symbol: str,
-                  interval: str="daily",
-                  time_period: int=20,
-                  data_format: str="csv"):
-        """Aroon Oscillator
+        assert(layout in layouts)
+        assert(self.output == "pandas")
+        return self._panel(self.iter_many(symbols,
+                                          requests_spec,
+                                          max_workers=max_workers),
+                           layout)
+
+    def _panel(self, results, layout: str) -> tuple:
+        frames = {}
+        errors = {}
+        for symbol, name, result in results:
+            if isinstance(result, Exception):
+                errors[(symbol, name)] = result
+            else:
+                frames[(symbol, name)] = result
+        if not frames:
+            return pd.DataFrame(), errors
+        keys = sorted(frames)
+        if layout == "long":
+            return self._long_panel(frames, keys), errors
+        panel = pd.concat([frames[key] for key in keys],
+                          axis=1,
+                          keys=keys,
+                          names=["symbol", "indicator", "field"])
+        return panel, errors
+
+    def _long_panel(self, frames: dict, keys: list) -> "pd.DataFrame":
+        parts = []
+        for symbol, name in keys:
+            frame = frames[(symbol, name)]
+            labels = pd.DataFrame({"symbol": symbol, "indicator": name},
+                                  index=frame.index)
+            parts.append(pd.concat([labels, frame], axis=1))
+        panel = pd.concat(parts)
+        if self.dtype_policy is not None and self.dtype_policy.categories:
+            panel["symbol"] = pd.Categorical(panel["symbol"])
+            panel["indicator"] = pd.Categorical(panel["indicator"])
+        return panel
 
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period: Integer, number of data points used in calculations
-            data_format: String, format of response
-        """
-        assert(interval in intervals)
-        assert(data_format in data_formats)
-        params = {
-            "function": "AROONOSC",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "time_period": str(time_period),
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
+    def ts_daily(self,
+                 symbol: str,
+                 adjusted: bool=True,
+                 output_size: str="full",
+                 data_format: str="csv",
+                 *,
+                 stream: bool=False,
+                 batch_size: int=default_batch_size):
+        """Time series data for a particular equity
 
-    def ultimate_osc(self,
-                     symbol: str,
-                     interval: str="daily",
-                     time_period1: int=7,
-                     time_period2: int=14,
-                     time_period3: int=28,
-                     data_format: str="csv"):
-        """Ultimate Oscillator
+        With output_size "incremental" the full history is fetched once into
+        the client's history store and later calls only fetch the compact
+        series and merge it in, refetching in full after a restatement.
 
         Args:
             symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            time_period1: Integer, first time period
-            time_period2: Integer, second time period
-            time_period3: Integer, third time period
+            adjusted: bool,  whether to use adjusted prices
+            output_size: String, size of time series data
             data_format: String, format of response
+            stream: bool, whether to return an iterator of frames parsed
+                while the CSV body downloads
+            batch_size: Integer, bars in every streamed frame but the last
         """
-        assert(interval in intervals)
-        assert(data_format in data_formats)
-        params = {
-            "function": "ULTOSC",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "timeperiod1": str(time_period1),
-            "timeperiod2": str(time_period2),
-            "timeperiod3": str(time_period3),
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
+        if output_size == "incremental":
+            assert(not stream)
+            return self._sync_daily(symbol, adjusted, data_format)
+        return self.call("ts_daily",
+                         symbol,
+                         adjusted,
+                         output_size,
+                         data_format,
+                         stream=stream,
+                         batch_size=batch_size)
+
+    def _sync_daily(self, symbol: str, adjusted: bool, data_format: str):
+        assert(self.history is not None)
+        func = "TIME_SERIES_DAILY"
+        if adjusted:
+            func = func + "_ADJUSTED"
+        stored = self.history.load(func, symbol)
+        if stored is not None:
+            recent = self.ts_daily(symbol, adjusted, "compact", data_format)
+            merged = history.merge_history(stored, recent)
+            if merged is not None:
+                self.history.save(func, symbol, merged)
+                return merged
+        data = self.ts_daily(symbol, adjusted, "full", data_format)
+        self.history.save(func, symbol, data)
+        return data
 
-    def hilbert_transform_sine(self,
-                               symbol: str,
-                               interval: str="daily",
-                               series_type: str="close",
-                               data_format: str="csv"):
-        """Hilbert Transform Sine Wave
 
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            series_type: String, desired price type in the time series
-            data_format: String, format of response
-        """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "HT_SINE",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
+def _whole(content: bytes):
+    # a cached body streamed as one chunk
+    yield content
 
-    def hilbert_transform_trendmode(self,
-                                    symbol: str,
-                                    interval: str="daily",
-                                    series_type: str="close",
-                                    data_format: str="csv"):
-        """Hilbert Transform Trend vs Cycle Mode
 
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            series_type: String, desired price type in the time series
-            data_format: String, format of response
-        """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "HT_TRENDMODE",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
+def _install(cls):
+    # generates the endpoint methods not written out on the class
+    for endpoint in registry:
+        if endpoint.method not in cls.__dict__:
+            setattr(cls, endpoint.method, endpoint.bind())
 
-    def hilbert_transform_dcperiod(self,
-                                   symbol: str,
-                                   interval: str="daily",
-                                   series_type: str="close",
-                                   data_format: str="csv"):
-        """Hilbert Transform Dominant Cycle Period
 
-        Args:
-            symbol: String, symbol specifying equity
-            interval: String, interval between consequitive data points
-            series_type: String, desired price type in the time series
-            data_format: String, format of response
-        """
-        assert(interval in intervals)
-        assert(series_type in series_types)
-        assert(data_format in data_formats)
-        params = {
-            "function": "HT_DCPERIOD",
-            "symbol": symbol.upper(),
-            "interval": interval,
-            "series_type": series_type,
-            "datatype": data_format,
-            "apikey": self.apikey
-        }
-        r = requests.get(self.base_url, params, stream=True)
-        r.raise_for_status()
-        if data_format == "csv":
-            return self.process_csv(r)
-        else:
-            return self.process_json(r)
+_install(Client)
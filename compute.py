@@ -0,0 +1,129 @@
+"""Local evaluation of indicator requests from one price series"""
+import numpy as np
+import pandas as pd
+
+import indicators
+import resampling
+
+
+price_functions = {
+    "daily": "TIME_SERIES_DAILY",
+    "weekly": "TIME_SERIES_WEEKLY",
+    "monthly": "TIME_SERIES_MONTHLY"
+}
+
+# Interval of the prices every interval is derived from when resampling, so
+# that one download serves all intraday intervals of a symbol and another
+# its daily, weekly and monthly ones
+base_intervals = {
+    "1min": "1min",
+    "5min": "1min",
+    "15min": "1min",
+    "30min": "1min",
+    "60min": "1min",
+    "daily": "daily",
+    "weekly": "daily",
+    "monthly": "daily"
+}
+
+
+# API function -> (output columns, kernel, price inputs, period params).
+# "series" stands for the price column named by the series_type param.
+local_functions = {
+    "SMA": (["SMA"], indicators.sma, ["series"], ["time_period"]),
+    "EMA": (["EMA"], indicators.ema, ["series"], ["time_period"]),
+    "WMA": (["WMA"], indicators.wma, ["series"], ["time_period"]),
+    "RSI": (["RSI"], indicators.rsi, ["series"], ["time_period"]),
+    "MOM": (["MOM"], indicators.mom, ["series"], ["time_period"]),
+    "MACD": (["MACD", "MACD_Signal", "MACD_Hist"],
+             indicators.macd,
+             ["series"],
+             ["fastperiod", "slowperiod", "signalperiod"]),
+    "STOCH": (["SlowK", "SlowD"],
+              indicators.stoch,
+              ["high", "low", "close"],
+              ["fastkperiod", "slowkperiod", "slowdperiod"]),
+    "PPO": (["PPO"], indicators.ppo, ["series"], ["fastperiod", "slowperiod"]),
+    "AD": (["Chaikin A/D"],
+           indicators.ad,
+           ["high", "low", "close", "volume"],
+           []),
+    "ADX": (["ADX"], indicators.adx, ["high", "low", "close"],
+            ["time_period"]),
+    "CCI": (["CCI"], indicators.cci, ["high", "low", "close"],
+            ["time_period"]),
+    "AROON": (["Aroon Down", "Aroon Up"],
+              indicators.aroon,
+              ["high", "low"],
+              ["time_period"]),
+    "AROONOSC": (["AROONOSC"],
+                 indicators.aroonosc,
+                 ["high", "low"],
+                 ["time_period"]),
+    "ULTOSC": (["ULTOSC"],
+               indicators.ultosc,
+               ["high", "low", "close"],
+               ["timeperiod1", "timeperiod2", "timeperiod3"]),
+    "HT_SINE": (["SINE", "LEAD SINE"], indicators.ht_sine, ["series"], []),
+    "HT_TRENDMODE": (["TRENDMODE"], indicators.ht_trendmode, ["series"], []),
+    "HT_DCPERIOD": (["DCPERIOD"], indicators.ht_dcperiod, ["series"], [])
+}
+
+
+def price_params(params: dict, resample: bool=False) -> dict:
+    """Request for the prices an indicator request is computed from
+
+    Args:
+        params: Dictionary, query parameters of the indicator request
+        resample: bool, whether to request the base interval the request's
+            interval is derived from instead of the interval itself
+    """
+    interval = params["interval"]
+    if resample:
+        interval = base_intervals[interval]
+    prices = {
+        "function": price_functions.get(interval, "TIME_SERIES_INTRADAY"),
+        "symbol": params["symbol"],
+        "outputsize": "full",
+        "datatype": "csv",
+        "apikey": params["apikey"]
+    }
+    if interval not in price_functions:
+        prices["interval"] = interval
+    return prices
+
+
+def evaluate(params: dict,
+             prices: pd.DataFrame,
+             interval: str=None) -> pd.DataFrame:
+    """Evaluates an indicator request locally
+
+    Args:
+        params: Dictionary, query parameters of the indicator request
+        prices: DataFrame, prices of the symbol, newest bar first
+        interval: String, interval of prices when it is finer than the
+            request's and bars are to be derived from them, or None
+
+    Returns:
+        DataFrame shaped like the API's answer, newest bar first and without
+        the warm-up bars
+    """
+    columns, kernel, inputs, periods = local_functions[params["function"]]
+    if interval is not None and interval != params["interval"]:
+        assert(resampling.derivable(interval, params["interval"]))
+        prices = resampling.resample(prices, params["interval"])
+    prices = prices.sort_index()
+    args = [
+        prices[params["series_type"] if name == "series" else name]
+        .to_numpy(dtype=np.float64)
+        for name in inputs
+    ]
+    args += [int(params[name]) for name in periods]
+    outputs = kernel(*args)
+    if len(columns) == 1:
+        outputs = [outputs]
+    data = pd.DataFrame(dict(zip(columns, outputs)), index=prices.index)
+    data = data.dropna(how="all")
+    if params["function"] == "HT_TRENDMODE":
+        data = data.astype(np.int64)
+    return data.iloc[::-1]
@@ -0,0 +1,340 @@
+"""Declarative registry of Alpha Vantage endpoints
+
+Every Client endpoint method is described here by the API function it
+calls and its ordered parameters. Client generates one method per entry,
+and all of them share a single request path.
+"""
+import inspect
+
+
+intraday_intervals = {"1min", "5min", "15min", "30min", "60min"}
+intervals = intraday_intervals | {"daily", "weekly", "monthly"}
+series_types = {"close", "open", "high", "low"}
+data_formats = {"json", "csv"}
+output_sizes = {"full", "compact"}
+ma_types = set(range(9))
+
+required = inspect.Parameter.empty
+
+
+def _upper(value: str) -> str:
+    return value.upper()
+
+
+def _flag(value: bool) -> str:
+    return "true" if value else "false"
+
+
+class Param(object):
+    """Argument of an endpoint method
+    """
+
+    def __init__(self,
+                 name: str,
+                 api_name: str=None,
+                 default=required,
+                 choices: set=None,
+                 doc: str="",
+                 transform=None):
+        """Initializes the parameter
+
+        Args:
+            name: String, name of the method argument
+            api_name: String, name of the query parameter, or None if the
+                argument is not sent as is
+            default: Default value, or required
+            choices: Set, allowed values, or None for no restriction
+            doc: String, description shown in the method docstring
+            transform: Function, converts the value into its query form
+        """
+        self.name = name
+        self.api_name = api_name
+        self.default = default
+        self.choices = choices
+        self.doc = doc
+        self.transform = transform
+
+
+class Endpoint(object):
+    """Endpoint method generated on Client
+    """
+
+    def __init__(self, method: str, function, params: list, doc: str):
+        """Initializes the endpoint
+
+        Args:
+            method: String, name of the generated method
+            function: String, API function, or a function of the argument
+                values returning it
+            params: List, Param of every method argument in order
+            doc: String, summary line of the method docstring
+        """
+        self.method = method
+        self.function = function
+        self.params = params
+        self.doc = doc
+        self.signature = inspect.Signature([
+            inspect.Parameter(p.name,
+                              inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                              default=p.default)
+            for p in params
+        ])
+
+    def build(self, apikey: str, *args, **kwargs) -> tuple:
+        """Query parameters of a call
+
+        Args:
+            apikey: String, API key sent with the request
+            args: Positional arguments of the method call
+            kwargs: Keyword arguments of the method call
+
+        Returns:
+            Tuple (params, data_format)
+        """
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        values = bound.arguments
+        function = self.function
+        if callable(function):
+            function = function(values)
+        params = {"function": function}
+        for p in self.params:
+            value = values[p.name]
+            if p.choices is not None:
+                assert(value in p.choices)
+            if p.api_name is not None:
+                if p.transform is not None:
+                    value = p.transform(value)
+                params[p.api_name] = value
+        params["apikey"] = apikey
+        return params, values.get("data_format", "csv")
+
+    def docstring(self) -> str:
+        lines = [self.doc, "", "        Args:"]
+        lines += ["            %s: %s" % (p.name, p.doc)
+                  for p in self.params + options]
+        return "\n".join(lines) + "\n        "
+
+    def bind(self):
+        """Client method requesting this endpoint
+        """
+        name = self.method
+
+        def method(client, *args, **kwargs):
+            return client.call(name, *args, **kwargs)
+
+        method.__name__ = method.__qualname__ = name
+        method.__doc__ = self.docstring()
+        method.__signature__ = self.signature.replace(parameters=[
+            inspect.Parameter("self", inspect.Parameter.POSITIONAL_OR_KEYWORD)
+        ] + list(self.signature.parameters.values()) + [
+            inspect.Parameter(p.name,
+                              inspect.Parameter.KEYWORD_ONLY,
+                              default=p.default)
+            for p in options
+        ])
+        return method
+
+
+symbol = Param("symbol", "symbol",
+               doc="String, symbol specifying equity",
+               transform=_upper)
+interval = Param("interval", "interval", "daily", intervals,
+                 "String, interval between consequitive data points")
+intraday = Param("interval", "interval", "5min", intraday_intervals,
+                 "String, interval between consequitive data points")
+series_type = Param("series_type", "series_type", "close", series_types,
+                    "String, desired price type (open, high, low, close)")
+data_format = Param("data_format", "datatype", "csv", data_formats,
+                    "String, format of response")
+output_size = Param("output_size", "outputsize", "full", output_sizes,
+                    "String, size of time series data")
+adjusted = Param("adjusted", None, True,
+                 doc="bool, whether to use adjusted prices")
+from_symbol = Param("from_symbol", "from_symbol",
+                    doc="String, currency converted from",
+                    transform=_upper)
+to_symbol = Param("to_symbol", "to_symbol",
+                  doc="String, currency converted to",
+                  transform=_upper)
+market = Param("market", "market", "USD",
+               doc="String, market the digital currency is quoted in",
+               transform=_upper)
+
+# Keyword-only arguments of every endpoint method, taken by Client.call
+# rather than sent to the API
+default_batch_size = 1000
+options = [
+    Param("stream", None, False,
+          doc="bool, whether to return an iterator of frames parsed as "
+              "the body downloads"),
+    Param("batch_size", None, default_batch_size,
+          doc="Integer, bars in every streamed frame but the last")
+]
+
+
+def time_period(default: int, name: str="time_period",
+                api_name: str="time_period") -> Param:
+    return Param(name, api_name, default,
+                 doc="Integer, number of data points used in calculations")
+
+
+def period(name: str, api_name: str, default: int, doc: str) -> Param:
+    return Param(name, api_name, default, doc=doc)
+
+
+def _adjusted(function: str):
+    def name(values: dict) -> str:
+        return function + "_ADJUSTED" if values["adjusted"] else function
+    return name
+
+
+def _series(method: str, function: str, default: int, doc: str) -> Endpoint:
+    # indicators of one price series over one time period
+    return Endpoint(method, function,
+                    [symbol, interval, time_period(default), series_type,
+                     data_format],
+                    doc)
+
+
+def _bars(method: str, function: str, default: int, doc: str) -> Endpoint:
+    # indicators of high, low and close over one time period
+    return Endpoint(method, function,
+                    [symbol, interval, time_period(default), data_format],
+                    doc)
+
+
+def _cycle(method: str, function: str, doc: str) -> Endpoint:
+    return Endpoint(method, function,
+                    [symbol, interval, series_type, data_format],
+                    doc)
+
+
+registry = [
+    Endpoint("ts_daily", _adjusted("TIME_SERIES_DAILY"),
+             [symbol, adjusted, output_size, data_format],
+             "Time series data for a particular equity"),
+    Endpoint("ts_intraday", "TIME_SERIES_INTRADAY",
+             [symbol, intraday,
+              Param("adjusted", "adjusted", True,
+                    doc="bool, whether to use adjusted prices",
+                    transform=_flag),
+              output_size, data_format],
+             "Intraday time series data for a particular equity"),
+    Endpoint("ts_weekly", _adjusted("TIME_SERIES_WEEKLY"),
+             [symbol, adjusted, data_format],
+             "Weekly time series data for a particular equity"),
+    Endpoint("ts_monthly", _adjusted("TIME_SERIES_MONTHLY"),
+             [symbol, adjusted, data_format],
+             "Monthly time series data for a particular equity"),
+
+    _series("sma", "SMA", 15, "Simple moving average"),
+    _series("ema", "EMA", 15, "Exponential moving average"),
+    _series("wma", "WMA", 15, "Weighted moving average"),
+    _series("dema", "DEMA", 15, "Double exponential moving average"),
+    _series("tema", "TEMA", 15, "Triple exponential moving average"),
+    _series("trima", "TRIMA", 15, "Triangular moving average"),
+    _series("kama", "KAMA", 15, "Kaufman adaptive moving average"),
+    Endpoint("macd", "MACD",
+             [symbol, interval, series_type, data_format,
+              period("fast", "fastperiod", 12, "Integer, fast period"),
+              period("slow", "slowperiod", 26, "Integer, slow period"),
+              period("signal", "signalperiod", 9, "Integer, signal period")],
+             "MACD (Moving Average Convergence Divergence)"),
+    Endpoint("stoch", "STOCH",
+             [symbol, interval, data_format,
+              period("fastk", "fastkperiod", 5, "Integer, fast k period"),
+              period("slowk", "slowkperiod", 3, "Integer, slow k period"),
+              period("slowd", "slowdperiod", 3, "Integer, slow d period")],
+             "Stochastic Oscillator"),
+    _series("rsi", "RSI", 14, "RSI (Relative Strength Index)"),
+    _series("momentum", "MOM", 14, "Momentum"),
+    _series("roc", "ROC", 10, "Rate of change"),
+    _series("cmo", "CMO", 14, "Chande Momentum Oscillator"),
+    _series("trix", "TRIX", 30,
+            "1-day rate of change of a triple smooth exponential moving "
+            "average"),
+    Endpoint("ppo", "PPO",
+             [symbol, interval, series_type, data_format,
+              period("fast", "fastperiod", 12, "Integer, fast period"),
+              period("slow", "slowperiod", 26, "Integer, slow period")],
+             "PPO (Percentage Price Oscillator)"),
+    Endpoint("bbands", "BBANDS",
+             [symbol, interval, time_period(20), series_type, data_format,
+              period("nbdevup", "nbdevup", 2,
+                     "Integer, standard deviations of the upper band"),
+              period("nbdevdn", "nbdevdn", 2,
+                     "Integer, standard deviations of the lower band"),
+              Param("matype", "matype", 0, ma_types,
+                    "Integer, moving average type of the middle band")],
+             "Bollinger bands"),
+    Endpoint("ad", "AD",
+             [symbol, interval, data_format],
+             "Chaikin A/D (Accumulation/Distribution) line"),
+    Endpoint("obv", "OBV",
+             [symbol, interval, data_format],
+             "On balance volume"),
+    Endpoint("vwap", "VWAP",
+             [symbol, intraday, data_format],
+             "Volume weighted average price"),
+    Endpoint("bop", "BOP",
+             [symbol, interval, data_format],
+             "Balance of power"),
+    Endpoint("trange", "TRANGE",
+             [symbol, interval, data_format],
+             "True range"),
+    _bars("adx", "ADX", 14, "ADX (Average Directional Index)"),
+    _bars("cci", "CCI", 20, "CCI (Commodity Channel Index)"),
+    _bars("aroon", "AROON", 20, "Aroon"),
+    _bars("aroon_osc", "AROONOSC", 20, "Aroon Oscillator"),
+    _bars("atr", "ATR", 14, "Average true range"),
+    _bars("natr", "NATR", 14, "Normalized average true range"),
+    _bars("willr", "WILLR", 14, "Williams' %R"),
+    _bars("mfi", "MFI", 14, "Money flow index"),
+    Endpoint("ultimate_osc", "ULTOSC",
+             [symbol, interval,
+              time_period(7, "time_period1", "timeperiod1"),
+              time_period(14, "time_period2", "timeperiod2"),
+              time_period(28, "time_period3", "timeperiod3"),
+              data_format],
+             "Ultimate Oscillator"),
+    _cycle("hilbert_transform_trendline", "HT_TRENDLINE",
+           "Hilbert Transform Instantaneous Trendline"),
+    _cycle("hilbert_transform_sine", "HT_SINE",
+           "Hilbert Transform Sine Wave"),
+    _cycle("hilbert_transform_trendmode", "HT_TRENDMODE",
+           "Hilbert Transform Trend vs Cycle Mode"),
+    _cycle("hilbert_transform_dcperiod", "HT_DCPERIOD",
+           "Hilbert Transform Dominant Cycle Period"),
+    _cycle("hilbert_transform_dcphase", "HT_DCPHASE",
+           "Hilbert Transform Dominant Cycle Phase"),
+    _cycle("hilbert_transform_phasor", "HT_PHASOR",
+           "Hilbert Transform Phasor Components"),
+
+    Endpoint("fx_intraday", "FX_INTRADAY",
+             [from_symbol, to_symbol, intraday, output_size, data_format],
+             "Intraday exchange rates of a currency pair"),
+    Endpoint("fx_daily", "FX_DAILY",
+             [from_symbol, to_symbol, output_size, data_format],
+             "Daily exchange rates of a currency pair"),
+    Endpoint("fx_weekly", "FX_WEEKLY",
+             [from_symbol, to_symbol, data_format],
+             "Weekly exchange rates of a currency pair"),
+    Endpoint("fx_monthly", "FX_MONTHLY",
+             [from_symbol, to_symbol, data_format],
+             "Monthly exchange rates of a currency pair"),
+
+    Endpoint("crypto_intraday", "CRYPTO_INTRADAY",
+             [symbol, market, intraday, output_size, data_format],
+             "Intraday prices of a digital currency"),
+    Endpoint("crypto_daily", "DIGITAL_CURRENCY_DAILY",
+             [symbol, market, data_format],
+             "Daily prices of a digital currency"),
+    Endpoint("crypto_weekly", "DIGITAL_CURRENCY_WEEKLY",
+             [symbol, market, data_format],
+             "Weekly prices of a digital currency"),
+    Endpoint("crypto_monthly", "DIGITAL_CURRENCY_MONTHLY",
+             [symbol, market, data_format],
+             "Monthly prices of a digital currency"),
+]
+endpoints = {endpoint.method: endpoint for endpoint in registry}
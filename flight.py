@@ -0,0 +1,179 @@
+"""Single-flight coalescing of concurrent identical requests
+
+While a request is in flight, identical requests wait for it and share its
+result instead of spending quota on their own. Only requests that overlap
+in time are coalesced; finished results are the cache's business.
+"""
+import asyncio
+import sys
+import threading
+
+
+def _copy_on_write(pd) -> bool:
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    try:
+        return pd.get_option("mode.copy_on_write") is True
+    except KeyError:
+        return False
+
+
+def share(result):
+    """Copy of a coalesced result handed to a follower
+
+    Frames are copied so that no caller sees another's in-place edits, which
+    costs nothing until a write under copy-on-write, where shallow copies
+    are independent frames; without it a follower's copy must own its data.
+    Polars frames are cloned and dictionaries of arrays shallow copied.
+    Anything else, e.g. the bytes of a response body or an Arrow table, is
+    immutable and shared as is.
+
+    Args:
+        result: Value returned by the request leading the flight
+    """
+    # a result can only be a frame once pandas was imported
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(result, (pd.DataFrame, pd.Series)):
+        return result.copy(deep=not _copy_on_write(pd))
+    pl = sys.modules.get("polars")
+    if pl is not None and isinstance(result, pl.DataFrame):
+        return result.clone()
+    if isinstance(result, dict):
+        # arrays of the numpy output are read-only
+        return dict(result)
+    return result
+
+
+class Flight(object):
+    """Request in flight and the callers waiting on it
+    """
+
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight(object):
+    """Coalesces identical calls made from several threads
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def do(self, key, function, *args):
+        """Calls function(*args), or waits for the identical call in flight
+
+        Args:
+            key: Hashable, identity of the call
+            function: Function making the call
+            args: Arguments of function
+
+        Returns:
+            The call's result, shared with every caller waiting on it. Each
+            follower and a leader that had followers get a copy of their
+            own, taken before anyone can edit it.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+            else:
+                flight.followers += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return share(flight.result)
+        try:
+            flight.result = function(*args)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+                followers = flight.followers
+            flight.done.set()
+        # followers copy the result as they wake, so the leader edits a
+        # copy of its own
+        return share(flight.result) if followers else flight.result
+
+    def in_flight(self) -> int:
+        """Number of distinct calls in flight
+        """
+        with self.lock:
+            return len(self.flights)
+
+
+class AsyncFlight(object):
+    """Task making a call and the number of coroutines awaiting it
+    """
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight(object):
+    """Coalesces identical calls made from coroutines of one event loop
+
+    The call runs in a task of its own that every caller awaits shielded,
+    so cancelling any one of them, the first included, leaves the others
+    waiting. The task is cancelled once nobody awaits it anymore.
+    """
+
+    def __init__(self):
+        self.flights = {}
+
+    def _landed(self, key, flight: AsyncFlight, task: asyncio.Task):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        if not task.cancelled():
+            # marks the exception retrieved when nobody awaited it
+            task.exception()
+
+    async def do(self, key, function, *args):
+        """Awaits function(*args), or the identical call in flight
+
+        Args:
+            key: Hashable, identity of the call
+            function: Coroutine function making the call
+            args: Arguments of function
+
+        Returns:
+            The call's result, shared with every caller waiting on it. Each
+            follower and a leader that had followers get a copy of their
+            own, taken before anyone can edit it.
+        """
+        flight = self.flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = AsyncFlight(asyncio.ensure_future(function(*args)))
+            self.flights[key] = flight
+            flight.task.add_done_callback(
+                lambda task: self._landed(key, flight, task))
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+        # callers still to wake copy the result then, so a leader resuming
+        # before them edits a copy of its own
+        if leader and flight.waiters == 0:
+            return result
+        return share(result)
+
+    def in_flight(self) -> int:
+        """Number of distinct calls in flight
+        """
+        return len(self.flights)
@@ -0,0 +1,132 @@
+"""Compact dtypes for frames held in memory by the thousand
+
+A DtypePolicy narrows the columns of every frame a Client returns and
+keeps count of the memory it saved.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+def footprint(data) -> int:
+    """Bytes held by a frame, its index and any string columns
+
+    Args:
+        data: DataFrame or Series
+    """
+    usage = data.memory_usage(index=True, deep=True)
+    return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+
+
+# Columns holding quoted prices, the only float columns narrowed. Digital
+# currency bodies suffix them with the market, e.g. "open (USD)".
+price_columns = {"open", "high", "low", "close", "adjusted_close"}
+
+
+def is_price(name) -> bool:
+    """Whether a column holds quoted prices
+
+    Args:
+        name: Column name
+    """
+    return str(name).split(" (")[0] in price_columns
+
+
+class DtypePolicy(object):
+    """Dtypes the columns of returned frames are cast to
+    """
+
+    def __init__(self,
+                 floats=np.float32,
+                 integers=np.uint32,
+                 categories: bool=True):
+        """Initializes the policy
+
+        Other float columns, e.g. indicator values such as OBV that run
+        into the millions, keep their parsed dtype.
+
+        Args:
+            floats: Dtype of price columns, or None to keep float64.
+                float32 holds 7 significant digits, so prices from 100,000
+                up, e.g. BRK-A's, lose their cents.
+            integers: Dtype of integer columns such as volume, the same for
+                every frame so batches and symbols concatenate unchanged,
+                or None to keep int64
+            categories: bool, whether string columns, e.g. the symbol column
+                of a long panel, are category encoded
+        """
+        self.floats = None if floats is None else np.dtype(floats)
+        self.integers = None if integers is None else np.dtype(integers)
+        self.categories = categories
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.before = 0
+        self.after = 0
+
+    def column(self, name, values):
+        if values.dtype.kind == "f" and self.floats is not None:
+            if is_price(name):
+                return values.astype(self.floats, copy=False)
+        elif values.dtype.kind in "iu" and self.integers is not None:
+            bounds = np.iinfo(self.integers)
+            if len(values) and (values.min() < bounds.min
+                                or values.max() > bounds.max):
+                raise OverflowError("%s values do not fit in %s"
+                                    % (name, self.integers))
+            return values.astype(self.integers, copy=False)
+        elif values.dtype.kind in "OUT" and self.categories:
+            return pd.Categorical(values)
+        return values
+
+    def apply(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Frame with its columns cast and a datetime64 index
+
+        Args:
+            data: DataFrame, frame as parsed from the API
+        """
+        before = footprint(data)
+        index = data.index
+        if not isinstance(index, pd.DatetimeIndex):
+            index = pd.DatetimeIndex(pd.to_datetime(index), name=index.name)
+        data = pd.DataFrame({name: self.column(name, data[name].to_numpy())
+                             for name in data.columns},
+                            index=index)
+        after = footprint(data)
+        with self.lock:
+            self.frames += 1
+            self.before += before
+            self.after += after
+        return data
+
+    def report(self) -> dict:
+        """Memory saved on the frames cast so far
+
+        Returns:
+            Dictionary with the number of frames, their bytes before and
+            after casting, the bytes saved and the ratio of after to before
+        """
+        with self.lock:
+            return {
+                "frames": self.frames,
+                "bytes_before": self.before,
+                "bytes_after": self.after,
+                "bytes_saved": self.before - self.after,
+                "ratio": self.after / self.before if self.before else 1.0
+            }
+
+
+def resolve_policy(policy):
+    """Policy named by a Client option
+
+    Args:
+        policy: None or "default" to keep parsed dtypes, "compact" for a
+            DtypePolicy with float32 prices and uint32 volumes, or a
+            DtypePolicy
+    """
+    if policy is None or policy == "default":
+        return None
+    if policy == "compact":
+        return DtypePolicy()
+    assert(isinstance(policy, DtypePolicy))
+    return policy
@@ -0,0 +1,102 @@
+import os
+import tempfile
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+
+# Columns of adjusted daily series that signal a corporate action. Any non
+# trivial value in a newly fetched bar rescales every earlier adjusted price.
+dividend_column = "dividend_amount"
+split_column = "split_coefficient"
+
+
+class HistoryStore(object):
+    """Full price histories persisted as pickled frames in a directory
+    """
+
+    def __init__(self, directory: str):
+        """Initializes the store
+
+        Args:
+            directory: String, directory holding the histories, created if
+                needed
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, function: str, symbol: str) -> str:
+        name = "%s-%s.pkl" % (function, quote(symbol.upper(), safe=""))
+        return os.path.join(self.directory, name)
+
+    def load(self, function: str, symbol: str):
+        """Stored history of a symbol, or None
+
+        Args:
+            function: String, API function that produced the history
+            symbol: String, symbol specifying equity
+        """
+        path = self.path(function, symbol)
+        if not os.path.exists(path):
+            return None
+        return pd.read_pickle(path)
+
+    def save(self, function: str, symbol: str, data: pd.DataFrame):
+        """Replaces the stored history of a symbol
+
+        Args:
+            function: String, API function that produced the history
+            symbol: String, symbol specifying equity
+            data: DataFrame, full history
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            data.to_pickle(tmp)
+            os.replace(tmp, self.path(function, symbol))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def merge_history(history: pd.DataFrame, recent: pd.DataFrame):
+    """Merges a compact fetch into a stored full history
+
+    Rows of recent replace or extend the history. The merge is refused when
+    no bar before the latest stored one overlaps, when such bars disagree,
+    or when a new bar carries a dividend or split, since a full refetch is
+    needed in each case.
+
+    Args:
+        history: DataFrame, stored full history, newest bar first
+        recent: DataFrame, compact fetch, newest bar first
+
+    Returns:
+        DataFrame, merged history newest bar first, or None if the history
+        must be fetched in full
+    """
+    if len(history) == 0 or len(recent) == 0:
+        return None
+    overlap = recent.index.intersection(history.index)
+
+    # the latest stored bar may have been revised since it was fetched
+    settled = overlap[overlap != history.index.max()]
+    if len(settled) == 0:
+        return None
+    columns = recent.columns.intersection(history.columns)
+    old = history.loc[settled, columns].to_numpy(dtype=np.float64)
+    new = recent.loc[settled, columns].to_numpy(dtype=np.float64)
+    if not np.allclose(old, new, rtol=1e-9, atol=0, equal_nan=True):
+        return None
+
+    fresh = recent.loc[recent.index > history.index.max()]
+    if dividend_column in fresh.columns \
+            and (fresh[dividend_column] != 0).any():
+        return None
+    if split_column in fresh.columns and (fresh[split_column] != 1).any():
+        return None
+
+    kept = history.loc[~history.index.isin(recent.index)]
+    merged = pd.concat([recent, kept])
+    return merged.sort_index(ascending=False)
@@ -0,0 +1,581 @@
+"""Technical indicators computed locally from price series
+
+The functions reproduce the TA-Lib algorithms Alpha Vantage serves,
+including their seeding and warm-up rules. Inputs are float arrays ordered
+oldest bar first; outputs have the same length with NaN over the warm-up
+bars the API omits.
+"""
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _is_zero(x: float) -> bool:
+    return -1e-8 < x < 1e-8
+
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    # TA-Lib yields 0 rather than dividing by a denominator close to zero
+    zero = np.abs(den) < 1e-8
+    return np.where(zero, 0.0, num / np.where(zero, 1.0, den))
+
+
+def _empty(n: int) -> np.ndarray:
+    return np.full(n, np.nan)
+
+
+def sma(x: np.ndarray, period: int) -> np.ndarray:
+    """Simple moving average
+
+    Args:
+        x: Array, prices
+        period: Integer, number of bars averaged
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _empty(len(x))
+    if len(x) >= period:
+        out[period - 1:] = sliding_window_view(x, period).mean(axis=1)
+    return out
+
+
+def _ema_from(x: np.ndarray, period: int, start: int, out: np.ndarray):
+    # TA-Lib seeds the average with the mean of the period ending at start
+    k = 2.0 / (period + 1)
+    prev = float(np.mean(x[start - period + 1:start + 1]))
+    out[start] = prev
+    for i in range(start + 1, len(x)):
+        prev = (x[i] - prev) * k + prev
+        out[i] = prev
+
+
+def ema(x: np.ndarray, period: int) -> np.ndarray:
+    """Exponential moving average
+
+    Args:
+        x: Array, prices
+        period: Integer, number of bars in the smoothing period
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _empty(len(x))
+    if len(x) >= period:
+        _ema_from(x, period, period - 1, out)
+    return out
+
+
+def wma(x: np.ndarray, period: int) -> np.ndarray:
+    """Weighted moving average
+
+    Args:
+        x: Array, prices
+        period: Integer, number of bars averaged
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _empty(len(x))
+    if len(x) >= period:
+        weights = np.arange(period, 0, -1, dtype=np.float64)
+        out[period - 1:] = np.convolve(x, weights, "valid") / weights.sum()
+    return out
+
+
+def rsi(x: np.ndarray, period: int) -> np.ndarray:
+    """Relative Strength Index with Wilder smoothing
+
+    Args:
+        x: Array, prices
+        period: Integer, number of bars in the smoothing period
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _empty(len(x))
+    if len(x) <= period:
+        return out
+    diff = np.diff(x)
+    gain = float(diff[:period].clip(min=0).sum()) / period
+    loss = float(-diff[:period].clip(max=0).sum()) / period
+    for i in range(period, len(x)):
+        if i > period:
+            change = diff[i - 1]
+            gain *= period - 1
+            loss *= period - 1
+            if change < 0:
+                loss -= change
+            else:
+                gain += change
+            gain /= period
+            loss /= period
+        total = gain + loss
+        out[i] = 0.0 if _is_zero(total) else 100.0 * gain / total
+    return out
+
+
+def macd(x: np.ndarray, fast: int=12, slow: int=26, signal: int=9):
+    """Moving Average Convergence Divergence
+
+    Args:
+        x: Array, prices
+        fast: Integer, fast period
+        slow: Integer, slow period
+        signal: Integer, signal period
+
+    Returns:
+        Tuple of arrays (macd, signal, histogram)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if slow < fast:
+        fast, slow = slow, fast
+    line = _empty(len(x))
+    trigger = _empty(len(x))
+    start = slow - 1
+    if len(x) >= start + signal:
+        # both averages start at the first bar the slow one covers
+        fast_avg = _empty(len(x))
+        slow_avg = _empty(len(x))
+        _ema_from(x, fast, start, fast_avg)
+        _ema_from(x, slow, start, slow_avg)
+        line[start:] = fast_avg[start:] - slow_avg[start:]
+        trigger[start:] = ema(line[start:], signal)
+        line[:start + signal - 1] = np.nan
+    return line, trigger, line - trigger
+
+
+def stoch(high: np.ndarray,
+          low: np.ndarray,
+          close: np.ndarray,
+          fastk: int=5,
+          slowk: int=3,
+          slowd: int=3):
+    """Stochastic Oscillator with simple moving average smoothing
+
+    Args:
+        high: Array, high prices
+        low: Array, low prices
+        close: Array, close prices
+        fastk: Integer, fast k period
+        slowk: Integer, slow k period
+        slowd: Integer, slow d period
+
+    Returns:
+        Tuple of arrays (slow k, slow d)
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    k = _empty(len(close))
+    d = _empty(len(close))
+    start = fastk - 1
+    if len(close) < start + slowk + slowd - 1:
+        return k, d
+    highest = sliding_window_view(high, fastk).max(axis=1)
+    lowest = sliding_window_view(low, fastk).min(axis=1)
+    span = (highest - lowest) / 100.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fast = np.where(span != 0, (close[start:] - lowest) / span, 0.0)
+    k[start:] = sma(fast, slowk)
+    d[start:] = sma(k[start:], slowd)
+    k[:start + slowk + slowd - 2] = np.nan
+    return k, d
+
+
+def ppo(x: np.ndarray, fast: int=12, slow: int=26) -> np.ndarray:
+    """Percentage Price Oscillator over simple moving averages
+
+    Args:
+        x: Array, prices
+        fast: Integer, fast period
+        slow: Integer, slow period
+    """
+    if slow < fast:
+        fast, slow = slow, fast
+    fast_avg = sma(x, fast)
+    slow_avg = sma(x, slow)
+    out = _ratio(fast_avg - slow_avg, slow_avg) * 100.0
+    out[np.isnan(slow_avg)] = np.nan
+    return out
+
+
+def mom(x: np.ndarray, period: int) -> np.ndarray:
+    """Momentum
+
+    Args:
+        x: Array, prices
+        period: Integer, number of bars between compared prices
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _empty(len(x))
+    out[period:] = x[period:] - x[:-period]
+    return out
+
+
+def _directional_moves(high: np.ndarray, low: np.ndarray, close: np.ndarray):
+    up = np.diff(high)
+    down = -np.diff(low)
+    minus = np.where((down > 0) & (up < down), down, 0.0)
+    plus = np.where((up > 0) & (up > down), up, 0.0)
+    true_range = np.maximum.reduce([high[1:] - low[1:],
+                                    np.abs(high[1:] - close[:-1]),
+                                    np.abs(close[:-1] - low[1:])])
+    return plus, minus, true_range
+
+
+def adx(high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        period: int) -> np.ndarray:
+    """Average Directional Index
+
+    Args:
+        high: Array, high prices
+        low: Array, low prices
+        close: Array, close prices
+        period: Integer, number of bars in the smoothing period
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    out = _empty(len(close))
+    start = 2 * period - 1
+    if len(close) <= start:
+        return out
+    plus, minus, true_range = _directional_moves(high, low, close)
+
+    plus_dm = float(plus[:period - 1].sum())
+    minus_dm = float(minus[:period - 1].sum())
+    tr = float(true_range[:period - 1].sum())
+    total_dx = 0.0
+    value = 0.0
+    for i in range(period - 1, len(true_range)):
+        plus_dm += plus[i] - plus_dm / period
+        minus_dm += minus[i] - minus_dm / period
+        tr += true_range[i] - tr / period
+        dx = None
+        if not _is_zero(tr):
+            plus_di = 100.0 * plus_dm / tr
+            minus_di = 100.0 * minus_dm / tr
+            total = plus_di + minus_di
+            if not _is_zero(total):
+                dx = 100.0 * abs(minus_di - plus_di) / total
+        bar = i + 1
+        if bar < start:
+            total_dx += dx or 0.0
+        elif bar == start:
+            value = (total_dx + (dx or 0.0)) / period
+            out[bar] = value
+        else:
+            if dx is not None:
+                value = (value * (period - 1) + dx) / period
+            out[bar] = value
+    return out
+
+
+def cci(high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        period: int) -> np.ndarray:
+    """Commodity Channel Index
+
+    Args:
+        high: Array, high prices
+        low: Array, low prices
+        close: Array, close prices
+        period: Integer, number of bars in the window
+    """
+    typical = (np.asarray(high, dtype=np.float64)
+               + np.asarray(low, dtype=np.float64)
+               + np.asarray(close, dtype=np.float64)) / 3.0
+    out = _empty(len(typical))
+    if len(typical) < period:
+        return out
+    windows = sliding_window_view(typical, period)
+    mean = windows.mean(axis=1)
+    deviation = np.abs(windows - mean[:, None]).sum(axis=1) / period
+    distance = typical[period - 1:] - mean
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[period - 1:] = np.where((distance != 0) & (deviation != 0),
+                                    distance / (0.015 * deviation),
+                                    0.0)
+    return out
+
+
+def _latest_extreme(windows: np.ndarray, reduce) -> np.ndarray:
+    # position of the most recent bar holding the window's extreme
+    flipped = windows[:, ::-1]
+    extreme = reduce(flipped, axis=1)
+    age = np.argmax(flipped == extreme[:, None], axis=1)
+    return age
+
+
+def aroon(high: np.ndarray, low: np.ndarray, period: int):
+    """Aroon
+
+    Args:
+        high: Array, high prices
+        low: Array, low prices
+        period: Integer, number of bars in the window
+
+    Returns:
+        Tuple of arrays (aroon down, aroon up)
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    down = _empty(len(high))
+    up = _empty(len(high))
+    if len(high) <= period:
+        return down, up
+    factor = 100.0 / period
+    high_age = _latest_extreme(sliding_window_view(high, period + 1), np.max)
+    low_age = _latest_extreme(sliding_window_view(low, period + 1), np.min)
+    up[period:] = factor * (period - high_age)
+    down[period:] = factor * (period - low_age)
+    return down, up
+
+
+def aroonosc(high: np.ndarray, low: np.ndarray, period: int) -> np.ndarray:
+    """Aroon Oscillator
+
+    Args:
+        high: Array, high prices
+        low: Array, low prices
+        period: Integer, number of bars in the window
+    """
+    down, up = aroon(high, low, period)
+    return up - down
+
+
+def ultosc(high: np.ndarray,
+           low: np.ndarray,
+           close: np.ndarray,
+           period1: int=7,
+           period2: int=14,
+           period3: int=28) -> np.ndarray:
+    """Ultimate Oscillator
+
+    Args:
+        high: Array, high prices
+        low: Array, low prices
+        close: Array, close prices
+        period1: Integer, first time period
+        period2: Integer, second time period
+        period3: Integer, third time period
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    out = _empty(len(close))
+    periods = sorted((period1, period2, period3))
+    longest = periods[-1]
+    if len(close) <= longest:
+        return out
+    true_low = np.minimum(low[1:], close[:-1])
+    buying = close[1:] - true_low
+    true_range = np.maximum(high[1:], close[:-1]) - true_low
+
+    total = np.zeros(len(close) - longest)
+    for weight, period in zip((4.0, 2.0, 1.0), periods):
+        skip = longest - period
+        bp = sliding_window_view(buying, period).sum(axis=1)[skip:]
+        tr = sliding_window_view(true_range, period).sum(axis=1)[skip:]
+        total += weight * _ratio(bp, tr)
+    out[longest:] = 100.0 * total / 7.0
+    return out
+
+
+def ad(high: np.ndarray,
+       low: np.ndarray,
+       close: np.ndarray,
+       volume: np.ndarray) -> np.ndarray:
+    """Chaikin Accumulation/Distribution line
+
+    Args:
+        high: Array, high prices
+        low: Array, low prices
+        close: Array, close prices
+        volume: Array, traded volumes
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    span = high - low
+    with np.errstate(divide="ignore", invalid="ignore"):
+        flow = np.where(span > 0,
+                        ((close - low) - (high - close)) / span * volume,
+                        0.0)
+    return np.cumsum(flow)
+
+
+# Hilbert transform lookbacks of TA-Lib, and the first bar fed to the
+# transform once the 4-bar weighted price smoother has warmed up
+dcperiod_lookback = 32
+dcperiod_first = 12
+sine_lookback = 63
+sine_first = 37
+
+
+def _hilbert(x: np.ndarray, first: int):
+    """Smoothed prices and dominant cycle periods of Ehlers' homodyne
+    discriminator, as computed bar by bar by TA-Lib
+    """
+    a = 0.0962
+    b = 0.5769
+    n = len(x)
+    padded = 6
+
+    def transform(series, t, adjust):
+        return (a * series[t] + b * series[t - 2] - b * series[t - 4]
+                - a * series[t - 6]) * adjust
+
+    # bars before first only warm up the price smoother and the transforms
+    # read zeros before the first bar they were fed
+    smoothed = np.zeros(n)
+    smoothed[3:] = (4 * x[3:] + 3 * x[2:-1] + 2 * x[1:-2] + x[:-3]) / 10
+    smoothed[:first] = 0.0
+    periods = np.zeros(n)
+    smooth = np.concatenate([np.zeros(padded), smoothed])
+    detrender = np.zeros(n + padded)
+    q1 = np.zeros(n + padded)
+    i1 = np.zeros(n + padded)
+    period = 0.0
+    smooth_period = 0.0
+    prev_i2 = prev_q2 = re = im = 0.0
+    for t in range(first, n):
+        p = t + padded
+        adjust = 0.075 * period + 0.54
+        detrender[p] = transform(smooth, p, adjust)
+        q1[p] = transform(detrender, p, adjust)
+        if t - 3 >= first:
+            i1[p] = detrender[p - 3]
+        ji = transform(i1, p, adjust)
+        jq = transform(q1, p, adjust)
+        q2 = 0.2 * (q1[p] + ji) + 0.8 * prev_q2
+        i2 = 0.2 * (i1[p] - jq) + 0.8 * prev_i2
+        re = 0.2 * (i2 * prev_i2 + q2 * prev_q2) + 0.8 * re
+        im = 0.2 * (i2 * prev_q2 - q2 * prev_i2) + 0.8 * im
+        prev_q2 = q2
+        prev_i2 = i2
+        last = period
+        if im != 0.0 and re != 0.0:
+            period = 360.0 / math.degrees(math.atan(im / re))
+        period = min(period, 1.5 * last)
+        period = max(period, 0.67 * last)
+        period = min(max(period, 6.0), 50.0)
+        period = 0.2 * period + 0.8 * last
+        smooth_period = 0.33 * period + 0.67 * smooth_period
+        periods[t] = smooth_period
+    return smoothed, periods
+
+
+def ht_dcperiod(x: np.ndarray) -> np.ndarray:
+    """Hilbert Transform Dominant Cycle Period
+
+    Args:
+        x: Array, prices
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _empty(len(x))
+    if len(x) > dcperiod_lookback:
+        _, periods = _hilbert(x, dcperiod_first)
+        out[dcperiod_lookback:] = periods[dcperiod_lookback:]
+    return out
+
+
+def _phases(smoothed: np.ndarray, periods: np.ndarray, first: int):
+    # dominant cycle phase from a DFT of the smoothed prices over one period
+    phases = np.zeros(len(smoothed))
+    phase = 0.0
+    for t in range(first, len(smoothed)):
+        smooth_period = periods[t]
+        length = int(smooth_period + 0.5)
+        real = imag = 0.0
+        for i in range(length):
+            angle = i * 2.0 * math.pi / length
+            value = smoothed[t - i] if t - i >= first else 0.0
+            real += math.sin(angle) * value
+            imag += math.cos(angle) * value
+        if abs(imag) > 0.0:
+            phase = math.degrees(math.atan(real / imag))
+        elif abs(imag) <= 0.01:
+            if real < 0.0:
+                phase -= 90.0
+            elif real > 0.0:
+                phase += 90.0
+        phase += 90.0
+        phase += 360.0 / smooth_period
+        if imag < 0.0:
+            phase += 180.0
+        if phase > 315.0:
+            phase -= 360.0
+        phases[t] = phase
+    return phases
+
+
+def ht_sine(x: np.ndarray):
+    """Hilbert Transform Sine Wave
+
+    Args:
+        x: Array, prices
+
+    Returns:
+        Tuple of arrays (sine, lead sine)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    sine = _empty(len(x))
+    lead = _empty(len(x))
+    if len(x) > sine_lookback:
+        smoothed, periods = _hilbert(x, sine_first)
+        phases = np.radians(_phases(smoothed, periods, sine_first))
+        sine[sine_lookback:] = np.sin(phases[sine_lookback:])
+        lead[sine_lookback:] = np.sin(phases[sine_lookback:] + np.pi / 4)
+    return sine, lead
+
+
+def ht_trendmode(x: np.ndarray) -> np.ndarray:
+    """Hilbert Transform Trend vs Cycle Mode, 1 when trending
+
+    Args:
+        x: Array, prices
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _empty(len(x))
+    if len(x) <= sine_lookback:
+        return out
+    first = sine_first
+    smoothed, periods = _hilbert(x, first)
+    phases = _phases(smoothed, periods, first)
+    trend1 = trend2 = trend3 = 0.0
+    sine = lead = 0.0
+    phase = 0.0
+    days = 0
+    for t in range(first, len(x)):
+        smooth_period = periods[t]
+        prev_phase = phase
+        phase = phases[t]
+        prev_sine = sine
+        prev_lead = lead
+        sine = math.sin(math.radians(phase))
+        lead = math.sin(math.radians(phase + 45.0))
+
+        length = int(smooth_period + 0.5)
+        average = x[max(0, t - length + 1):t + 1].sum()
+        if length > 0:
+            average /= length
+        trendline = (4.0 * average + 3.0 * trend1 + 2.0 * trend2 + trend3) / 10
+        trend3, trend2, trend1 = trend2, trend1, average
+
+        trend = 1
+        if ((sine > lead and prev_sine <= prev_lead)
+                or (sine < lead and prev_sine >= prev_lead)):
+            days = 0
+            trend = 0
+        days += 1
+        if days < 0.5 * smooth_period:
+            trend = 0
+        change = phase - prev_phase
+        if (smooth_period != 0.0
+                and 0.67 * 360.0 / smooth_period < change
+                < 1.5 * 360.0 / smooth_period):
+            trend = 0
+        if (trendline != 0.0
+                and abs((smoothed[t] - trendline) / trendline) >= 0.015):
+            trend = 1
+        out[t] = trend
+    out[:sine_lookback] = np.nan
+    return out
@@ -0,0 +1,44 @@
+"""Modules imported on first use
+
+Heavy dependencies such as pandas cost hundreds of milliseconds to import.
+Modules on the request path bind them as proxies instead, so that fetching
+raw bodies never pays for the DataFrame machinery:
+
+    pd = lazy.module("pandas")
+
+    def frame(rows):
+        return pd.DataFrame(rows)  # pandas is imported here, once
+"""
+import importlib
+import sys
+
+
+class LazyModule(object):
+    """Stand-in for a module that imports it on the first attribute access
+
+    Attributes are copied onto the proxy as they are looked up, so later
+    accesses cost the same as on the module itself.
+    """
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+
+    def __getattr__(self, attr: str):
+        value = getattr(importlib.import_module(self._name), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._name in sys.modules else "not loaded"
+        return "<lazy module %r (%s)>" % (self._name, state)
+
+
+def module(name: str):
+    """Module of a name, imported now if it already was, else on first use
+
+    Args:
+        name: String, absolute name of the module, e.g. "pandas"
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
@@ -0,0 +1,243 @@
+"""Timings and counts of the stages of every request
+
+A Metrics sink collects, per Alpha Vantage function:
+
+    throttle  seconds waited on the rate limiter
+    connect   seconds opening a connection (DNS, TCP and TLS), when a new
+              one was opened
+    ttfb      seconds from sending a request to its response headers
+    download  seconds reading the response body
+    decode    seconds decoding a JSON body, nested within parse
+    parse     seconds turning a body into a frame
+    compute   seconds evaluating an indicator locally
+    request   seconds an endpoint call took end to end
+
+and counts requests, attempts, retries, cache hits and bytes downloaded.
+Each observation is also passed to the sink's callbacks, and render()
+exposes everything in the Prometheus text format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+prefix = "alphavantage"
+stages = ("throttle", "connect", "ttfb", "download", "decode", "parse",
+          "compute", "request")
+counters = ("requests", "attempts", "retries", "cache_hits", "bytes")
+counter_help = {
+    "requests": "Endpoint requests made",
+    "attempts": "Requests sent to the API, retries included",
+    "retries": "Attempts repeated after a transient failure",
+    "cache_hits": "Requests answered from the cache",
+    "bytes": "Bytes of response bodies downloaded"
+}
+default_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def escape(value: str) -> str:
+    """Label value escaped for the Prometheus text format
+
+    Args:
+        value: String, raw label value
+    """
+    return (str(value).replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"))
+
+
+class Histogram(object):
+    """Cumulative bucket counts of observed seconds
+    """
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, buckets: tuple):
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, buckets: tuple, value: float):
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class Probe(object):
+    """Records the stages of one request into a sink under its function
+    """
+
+    __slots__ = ("metrics", "function")
+
+    def __init__(self, metrics, function: str):
+        self.metrics = metrics
+        self.function = function
+
+    def observe(self, stage: str, seconds: float):
+        self.metrics.observe(stage, self.function, seconds)
+
+    def count(self, name: str, value: float=1):
+        self.metrics.count(name, self.function, value)
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+
+class NullProbe(object):
+    """Probe of a client without a metrics sink
+    """
+
+    __slots__ = ()
+
+    def observe(self, stage: str, seconds: float):
+        pass
+
+    def count(self, name: str, value: float=1):
+        pass
+
+    @contextmanager
+    def time(self, stage: str):
+        yield
+
+
+null_probe = NullProbe()
+
+
+class Metrics(object):
+    """Thread-safe sink of request timings and counts
+    """
+
+    def __init__(self, buckets: tuple=default_buckets):
+        """Initializes the sink
+
+        Args:
+            buckets: Tuple, upper bounds in seconds of the histogram buckets
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counts = {}
+        self.callbacks = []
+
+    def probe(self, function: str) -> Probe:
+        """Probe recording one request of an API function
+        """
+        return Probe(self, function)
+
+    def subscribe(self, callback):
+        """Calls callback(kind, name, function, value) on every observation
+
+        Args:
+            callback: Function, where kind is "stage" for timings in
+                seconds and "count" for counter increments
+        """
+        self.callbacks.append(callback)
+
+    def observe(self, stage: str, function: str, seconds: float):
+        with self.lock:
+            histogram = self.histograms.get((stage, function))
+            if histogram is None:
+                histogram = Histogram(self.buckets)
+                self.histograms[(stage, function)] = histogram
+            histogram.observe(self.buckets, seconds)
+        for callback in self.callbacks:
+            callback("stage", stage, function, seconds)
+
+    def count(self, name: str, function: str, value: float=1):
+        with self.lock:
+            key = (name, function)
+            self.counts[key] = self.counts.get(key, 0) + value
+        for callback in self.callbacks:
+            callback("count", name, function, value)
+
+    def summary(self) -> dict:
+        """Totals per function
+
+        Returns:
+            Dictionary mapping each function to its counters and, for every
+            stage, its count and total and mean seconds
+        """
+        summary = {}
+        with self.lock:
+            for (stage, function), h in self.histograms.items():
+                summary.setdefault(function, {})[stage] = {
+                    "count": h.count,
+                    "seconds": h.total,
+                    "mean": h.total / h.count
+                }
+            for (name, function), value in self.counts.items():
+                summary.setdefault(function, {})[name] = value
+        return summary
+
+    def render(self) -> str:
+        """Everything collected, in the Prometheus text exposition format
+        """
+        lines = [
+            "# HELP %s_stage_seconds Seconds spent in each request stage"
+            % prefix,
+            "# TYPE %s_stage_seconds histogram" % prefix
+        ]
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counts = sorted(self.counts.items())
+            for (stage, function), h in histograms:
+                labels = 'stage="%s",function="%s"' % (escape(stage),
+                                                       escape(function))
+                for bound, count in zip(self.buckets, h.counts):
+                    lines.append('%s_stage_seconds_bucket{%s,le="%s"} %d'
+                                 % (prefix, labels, repr(bound), count))
+                lines.append('%s_stage_seconds_bucket{%s,le="+Inf"} %d'
+                             % (prefix, labels, h.count))
+                lines.append("%s_stage_seconds_sum{%s} %r"
+                             % (prefix, labels, h.total))
+                lines.append("%s_stage_seconds_count{%s} %d"
+                             % (prefix, labels, h.count))
+        for name in counters:
+            lines.append("# HELP %s_%s_total %s"
+                         % (prefix, name, counter_help[name]))
+            lines.append("# TYPE %s_%s_total counter" % (prefix, name))
+            for (counter, function), value in counts:
+                if counter == name:
+                    lines.append('%s_%s_total{function="%s"} %r'
+                                 % (prefix, name, escape(function), value))
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int=9464, host: str="127.0.0.1"):
+        """Exposes render() over HTTP from a daemon thread
+
+        Args:
+            port: Integer, port to listen on, or 0 for any free port
+            host: String, address to listen on
+
+        Returns:
+            ThreadingHTTPServer, whose shutdown() stops the exporter
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
@@ -0,0 +1,123 @@
+"""Formats of the frames a Client returns
+
+    pandas  DataFrame indexed by time, the default
+    arrow   pyarrow.Table with a leading "time" column
+    polars  polars.DataFrame with a leading "time" column
+    numpy   dictionary of read-only arrays, "time" first
+
+Parsers build every format straight from the columns they decode, without
+going through pandas. Arrow, polars and numpy results share the parsed
+buffers instead of copying them wherever the layout allows.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+formats = {"pandas", "arrow", "polars", "numpy"}
+time_column = "time"
+
+
+def check(output: str):
+    """Asserts that an output format is known and its library installed
+
+    Args:
+        output: String, one of formats
+    """
+    assert(output in formats)
+    if output in ("arrow", "polars"):
+        assert(pa is not None)
+    if output == "polars":
+        assert(pl is not None)
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    if array.flags.writeable:
+        array = array.view()
+        array.flags.writeable = False
+    return array
+
+
+def from_columns(times: np.ndarray, columns: dict, output: str):
+    """Result of a parser in an output format
+
+    Args:
+        times: Array, datetime64[ns] time of every bar
+        columns: Dictionary mapping column names to arrays of values
+        output: String, one of formats
+    """
+    if output == "pandas":
+        index = pd.DatetimeIndex(times, name=time_column)
+        return pd.DataFrame(columns, index=index)
+    if output == "numpy":
+        arrays = {time_column: _readonly(times)}
+        for name, values in columns.items():
+            arrays[name] = _readonly(values)
+        return arrays
+    arrays = [pa.array(times)] + [pa.array(v) for v in columns.values()]
+    table = pa.Table.from_arrays(arrays, [time_column] + list(columns))
+    return from_table(table, output)
+
+
+def from_table(table, output: str):
+    """Arrow table of bars, "time" column first, in an output format
+
+    Args:
+        table: pyarrow.Table
+        output: String, one of formats
+    """
+    if output == "arrow":
+        return table
+    if output == "polars":
+        return pl.from_arrow(table)
+    times = table.column(0).to_numpy()
+    columns = {name: table.column(name).to_numpy()
+               for name in table.column_names[1:]}
+    if output == "pandas":
+        return pd.DataFrame(columns,
+                            index=pd.DatetimeIndex(times, name=time_column))
+    return from_columns(times, columns, output)
+
+
+def from_frame(frame: pd.DataFrame, output: str):
+    """Frame indexed by time in an output format
+
+    Args:
+        frame: DataFrame, e.g. an indicator computed locally
+        output: String, one of formats
+    """
+    if output == "pandas":
+        return frame
+    columns = {name: frame[name].to_numpy() for name in frame.columns}
+    return from_columns(frame.index.to_numpy(dtype="datetime64[ns]"),
+                        columns, output)
+
+
+def to_frame(data) -> pd.DataFrame:
+    """Frame indexed by time of a result in any output format
+
+    Args:
+        data: DataFrame, pyarrow.Table, polars.DataFrame or dictionary of
+            arrays
+    """
+    if isinstance(data, pd.DataFrame):
+        return data
+    if pl is not None and isinstance(data, pl.DataFrame):
+        data = data.to_arrow()
+    if isinstance(data, dict):
+        columns = dict(data)
+    else:
+        columns = {name: data.column(name).to_numpy()
+                   for name in data.column_names}
+    times = columns.pop(time_column)
+    return pd.DataFrame(columns,
+                        index=pd.DatetimeIndex(times, name=time_column))
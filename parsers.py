@@ -0,0 +1,272 @@
+import json
+import re
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from outputs import from_columns, from_frame, from_table, time_column
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+
+
+# Columns holding counts rather than prices. They are read as float64 like
+# every other value column and narrowed to int64 when whole, as equities'
+# are; digital currencies trade fractional volumes.
+integer_columns = {"volume"}
+
+# Time series fields in JSON bodies are numbered, e.g. "5. adjusted close",
+# while the CSV header of the same endpoint reads "adjusted_close".
+json_field = re.compile(r"^\d+[a-z]?\. ")
+
+
+def csv_header(content: bytes) -> list:
+    """Column names of a CSV body, read without decoding the rest
+
+    Args:
+        content: Bytes, CSV body
+    """
+    end = content.find(b"\n")
+    line = content if end < 0 else content[:end]
+    return line.decode("utf-8").strip().split(",")
+
+
+def csv_dtypes(names: list) -> dict:
+    """Explicit dtypes of the value columns of a CSV body
+
+    Args:
+        names: List, column names, the first being the time column
+    """
+    return {name: np.float64 for name in names[1:]}
+
+
+def counts(column: np.ndarray) -> np.ndarray:
+    """Count column as int64, or unchanged if any value is fractional
+
+    Args:
+        column: Array, float64 values of an integer column
+    """
+    whole = np.isfinite(column).all() and (np.mod(column, 1) == 0).all()
+    return column.astype(np.int64) if whole else column
+
+
+def csv_table(content: bytes):
+    """Parses a CSV body into an Arrow table with pyarrow's reader
+
+    The first column is the time, parsed during the read and named "time".
+
+    Args:
+        content: Bytes, CSV body
+    """
+    assert(pa is not None)
+    names = csv_header(content)
+    column_types = {name: pa.from_numpy_dtype(dtype)
+                    for name, dtype in csv_dtypes(names).items()}
+    column_types[names[0]] = pa.timestamp("ns")
+    options = pa_csv.ConvertOptions(column_types=column_types)
+    table = pa_csv.read_csv(pa.BufferReader(content),
+                            convert_options=options)
+    table = table.rename_columns([time_column] + names[1:])
+    for name in integer_columns.intersection(names):
+        column = table.column(name).to_numpy()
+        narrowed = counts(column)
+        if narrowed is not column:
+            table = table.set_column(names.index(name), name,
+                                     pa.array(narrowed))
+    return table
+
+
+def read_csv(content: bytes, output: str="pandas"):
+    """Parses a CSV body into a frame indexed by time
+
+    The bytes are handed straight to pyarrow's multithreaded reader when it
+    is installed, or to pandas' C engine otherwise, with the time column
+    parsed into a DatetimeIndex during the read.
+
+    Args:
+        content: Bytes, CSV body
+        output: String, format of the result, one of outputs.formats
+    """
+    if pa is not None:
+        return from_table(csv_table(content), output)
+    names = csv_header(content)
+    data = pd.read_csv(BytesIO(content),
+                       engine="c",
+                       dtype=csv_dtypes(names),
+                       index_col=0,
+                       parse_dates=True)
+    # pandas infers the unit; the other readers give nanoseconds
+    data.index = pd.DatetimeIndex(data.index, name=time_column).as_unit("ns")
+    for name in integer_columns.intersection(data.columns):
+        data[name] = counts(data[name].to_numpy())
+    return from_frame(data, output)
+
+
+def json_column(key: str) -> str:
+    """CSV column name of a JSON field
+
+    Args:
+        key: String, field name in a JSON body
+    """
+    name, numbered = json_field.subn("", key)
+    return name.replace(" ", "_") if numbered else name
+
+
+def read_json(content: bytes, output: str="pandas"):
+    """Parses a JSON body into the same frame read_csv returns
+
+    The "Meta Data" block is skipped and the series, keyed by timestamp, is
+    flattened into one float64 array in a single pass.
+
+    Args:
+        content: Bytes, JSON body
+        output: String, format of the result, one of outputs.formats
+    """
+    return json_frame(json_loads(content), output)
+
+
+def json_columns(decoded: dict) -> tuple:
+    """Times and value columns of a decoded JSON body
+
+    Args:
+        decoded: Dictionary, JSON body as decoded by json_loads
+
+    Returns:
+        Tuple (times, columns) of a datetime64[ns] array and a dictionary
+        mapping column names to contiguous arrays
+
+    Raises:
+        ValueError: The body holds no series besides its "Meta Data"
+    """
+    series = next((v for k, v in decoded.items() if k != "Meta Data"), None)
+    if series is None:
+        raise ValueError("JSON body holds no series besides its Meta Data")
+    times = list(series)
+    rows = series.values()
+    keys = list(next(iter(rows))) if times else []
+    nan = float("nan")
+    values = np.fromiter((row.get(key, nan) for row in rows for key in keys),
+                         dtype=np.float64,
+                         count=len(times) * len(keys))
+    # one row per column, so that every column is contiguous
+    values = values.reshape(len(times), len(keys)).T.copy()
+
+    columns = {}
+    for i, key in enumerate(keys):
+        name = json_column(key)
+        column = values[i]
+        if name in integer_columns:
+            column = counts(column)
+        columns[name] = column
+    return np.array(times, dtype="datetime64[ns]"), columns
+
+
+def json_frame(decoded: dict, output: str="pandas"):
+    """Frame of a decoded JSON body
+
+    Args:
+        decoded: Dictionary, JSON body as decoded by json_loads
+        output: String, format of the result, one of outputs.formats
+    """
+    times, columns = json_columns(decoded)
+    return from_columns(times, columns, output)
+
+
+class CsvBatches(object):
+    """Incremental reader of a CSV body arriving in chunks
+
+    Complete lines are collected until batch_size of them are buffered and
+    then parsed by read_csv into one frame, so memory holds at most a batch
+    and a chunk of the body at any time:
+
+        reader = CsvBatches(1000)
+        for chunk in chunks:
+            for batch in reader.feed(chunk):
+                ...
+        last = reader.close()
+    """
+
+    def __init__(self, batch_size: int=1000, output: str="pandas"):
+        """Initializes the reader
+
+        Args:
+            batch_size: Integer, bars in every frame but the last
+            output: String, format of the frames, one of outputs.formats
+        """
+        assert(batch_size >= 1)
+        self.batch_size = batch_size
+        self.output = output
+        self.header = None
+        self.pending = []
+        self.lines = 0
+        self.tail = b""
+
+    def _batches(self, final: bool) -> list:
+        buffer = b"".join(self.pending)
+        ends = np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8) == 10)
+        batches = []
+        start = 0
+        for i in range(self.batch_size - 1, len(ends), self.batch_size):
+            stop = int(ends[i]) + 1
+            batches.append(read_csv(self.header + buffer[start:stop],
+                                    self.output))
+            start = stop
+        rest = buffer[start:]
+        if final and rest.strip():
+            batches.append(read_csv(self.header + rest, self.output))
+            rest = b""
+        self.pending = [rest] if rest else []
+        self.lines = rest.count(b"\n")
+        return batches
+
+    def feed(self, chunk: bytes) -> list:
+        """Frames completed by a chunk of the body
+
+        Args:
+            chunk: Bytes, next piece of the body
+
+        Returns:
+            List of frames of batch_size bars each, newest bar first
+        """
+        data = self.tail + chunk
+        end = data.rfind(b"\n") + 1
+        self.tail = data[end:]
+        data = data[:end]
+        if self.header is None:
+            cut = data.find(b"\n") + 1
+            if cut == 0:
+                self.tail = data + self.tail
+                return []
+            self.header = data[:cut]
+            data = data[cut:]
+        if data:
+            self.pending.append(data)
+            self.lines += data.count(b"\n")
+        if self.lines < self.batch_size:
+            return []
+        return self._batches(False)
+
+    def close(self) -> list:
+        """Frames of the bars left once the body has ended
+
+        Returns:
+            List of frames, the last one holding fewer than batch_size
+            bars
+        """
+        if self.header is None:
+            assert(not self.tail.strip())
+            return []
+        if self.tail:
+            self.pending.append(self.tail)
+            self.tail = b""
+        return self._batches(True)
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket limiting the rate of requests
+
+    Tokens are reserved in arrival order and the balance may go negative, so
+    every caller is told exactly how long to wait for its turn instead of
+    polling the bucket.
+    """
+
+    def __init__(self, rate: float, capacity: float=1.0):
+        """Initializes the bucket
+
+        Args:
+            rate: Float, tokens added to the bucket per second
+            capacity: Float, maximum number of tokens held, i.e. the largest
+                burst allowed after an idle period
+        """
+        assert(rate > 0)
+        assert(capacity >= 1)
+        self.rate = rate
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+        self.calls = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _take(self, tokens: float) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= tokens
+        return max(0.0, -self.tokens / self.rate)
+
+    def _record(self, delay: float):
+        self.calls += 1
+        if delay > 0:
+            self.waits += 1
+            self.total_wait += delay
+            self.max_wait = max(self.max_wait, delay)
+
+    def reserve(self, tokens: float=1.0) -> float:
+        """Takes tokens from the bucket without blocking
+
+        Args:
+            tokens: Float, number of tokens to take
+
+        Returns:
+            Float, seconds the caller must wait before using the tokens
+        """
+        with self.lock:
+            delay = self._take(tokens)
+            self._record(delay)
+        return delay
+
+    def acquire(self, tokens: float=1.0) -> float:
+        """Takes tokens from the bucket, sleeping until they are available
+
+        Args:
+            tokens: Float, number of tokens to take
+
+        Returns:
+            Float, seconds spent waiting
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def stats(self) -> dict:
+        """Wait-time metrics recorded by this bucket
+        """
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "waits": self.waits,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "mean_wait": (self.total_wait / self.calls
+                              if self.calls else 0.0)
+            }
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket whose balance is shared by processes through a file
+
+    The balance and its timestamp live in a small file guarded by an
+    exclusive flock, so every process opening the same path draws from one
+    budget. Metrics are recorded per process.
+    """
+
+    state = struct.Struct("dd")
+
+    def __init__(self, path: str, rate: float, capacity: float=1.0):
+        """Initializes the bucket
+
+        Args:
+            path: String, file holding the shared balance, created if needed
+            rate: Float, tokens added to the bucket per second
+            capacity: Float, maximum number of tokens held
+        """
+        super(FileTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _take(self, tokens: float) -> float:
+        import fcntl
+
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            raw = os.pread(self.fd, self.state.size, 0)
+            now = time.time()
+            if len(raw) == self.state.size:
+                balance, updated = self.state.unpack(raw)
+            else:
+                balance, updated = self.capacity, now
+            balance = min(self.capacity,
+                          balance + max(0.0, now - updated) * self.rate)
+            balance -= tokens
+            os.pwrite(self.fd, self.state.pack(balance, now), 0)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.tokens = balance
+        return max(0.0, -balance / self.rate)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def shared_bucket(apikey: str,
+                  rate: float,
+                  capacity: float=1.0,
+                  directory: str=None) -> FileTokenBucket:
+    """Token bucket shared by every process using the same API key
+
+    Args:
+        apikey: String, API key whose quota the bucket enforces
+        rate: Float, tokens added to the bucket per second
+        capacity: Float, maximum number of tokens held
+        directory: String, directory of the state file, defaults to the
+            system temporary directory
+    """
+    digest = hashlib.sha1(apikey.encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(directory or tempfile.gettempdir(),
+                        "alphavantage-%s.bucket" % digest)
+    return FileTokenBucket(path, rate, capacity)
@@ -0,0 +1,220 @@
+"""Record and replay of API responses for deterministic offline runs
+
+An Archive keeps every recorded response body once, compressed and named
+by its SHA-256 digest, next to a SQLite index mapping each request to the
+digest of its body. RecordingTransport fills an archive from the network;
+ReplayTransport answers from it alone:
+
+    archive = Archive("backtest-data")
+    client = Client(token, transport=RecordingTransport(archive))
+    ...
+    client = Client(token, transport=ReplayTransport(archive))
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+
+from cache import cache_key
+from metrics import null_probe
+from transport import Transport
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class ReplayMiss(KeyError):
+    """The archive holds no response to the request
+    """
+
+
+class Archive(object):
+    """Content-addressed store of compressed response bodies
+    """
+
+    def __init__(self, directory: str):
+        """Initializes the archive
+
+        Args:
+            directory: String, directory holding the bodies and the index,
+                created if needed
+        """
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite"),
+                                  check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                            "key TEXT PRIMARY KEY, "
+                            "digest TEXT NOT NULL, "
+                            "params TEXT NOT NULL, "
+                            "recorded REAL NOT NULL)")
+
+    def object_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2],
+                            digest + suffix)
+
+    def _write(self, digest: str, content: bytes):
+        # a body already stored, e.g. one refetched unchanged, is not
+        # compressed again, whichever compressor stored it
+        if any(os.path.exists(self.object_path(digest, suffix))
+               for suffix in (".zst", ".z")):
+            return
+        if zstandard is not None:
+            path = self.object_path(digest, ".zst")
+            data = zstandard.ZstdCompressor(level=10).compress(content)
+        else:
+            path = self.object_path(digest, ".z")
+            data = zlib.compress(content, 6)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def read(self, digest: str) -> bytes:
+        """Body stored under a digest
+
+        Args:
+            digest: String, hex SHA-256 digest of the body
+        """
+        path = self.object_path(digest, ".zst")
+        if os.path.exists(path):
+            assert(zstandard is not None)
+            with open(path, "rb") as f:
+                return zstandard.ZstdDecompressor().decompress(f.read())
+        with open(self.object_path(digest, ".z"), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def put(self, params: dict, content: bytes) -> str:
+        """Records the body answering a request
+
+        Args:
+            params: Dictionary, query parameters of the request
+            content: Bytes, raw body of the response
+
+        Returns:
+            String, digest of the body
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        self._write(digest, content)
+        recorded = {k: v for k, v in params.items() if k != "apikey"}
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO responses "
+                            "VALUES (?, ?, ?, ?)",
+                            (cache_key(params), digest,
+                             json.dumps(recorded, sort_keys=True),
+                             time.time()))
+        return digest
+
+    def index(self) -> dict:
+        """Digest of the body recorded for every request key
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT key, digest FROM responses")
+            return dict(rows.fetchall())
+
+    def requests(self) -> list:
+        """Query parameters of every recorded request, without the API key
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT params FROM responses "
+                                   "ORDER BY key").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM responses"
+                                   ).fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+class RecordingTransport(Transport):
+    """Transport recording every body it receives into an archive
+    """
+
+    def __init__(self, archive: Archive, **kwargs):
+        """Initializes the transport
+
+        Args:
+            archive: Archive, where responses are recorded
+            kwargs: Keyword arguments of Transport
+        """
+        self.archive = archive
+        super(RecordingTransport, self).__init__(**kwargs)
+
+    def get(self, url: str, params: dict, probe=null_probe) -> bytes:
+        content = super(RecordingTransport, self).get(url, params, probe)
+        self.archive.put(params, content)
+        return content
+
+    def chunks(self, url: str, params: dict, probe=null_probe,
+               chunk_size: int=1 << 16):
+        """Yields a body as Transport.chunks does and records it once whole
+        """
+        received = []
+        for chunk in super(RecordingTransport, self).chunks(url, params,
+                                                            probe,
+                                                            chunk_size):
+            received.append(chunk)
+            yield chunk
+        self.archive.put(params, b"".join(received))
+
+
+class ReplayTransport(object):
+    """Transport answering from an archive without any network access
+
+    The index is read into memory once, so every lookup is a dictionary
+    access followed by one file read. Bodies of repeated requests are
+    decompressed again each time; put a cache in front for hot loops.
+    """
+
+    def __init__(self, archive: Archive):
+        """Initializes the transport
+
+        Args:
+            archive: Archive, where responses were recorded
+        """
+        self.archive = archive
+        self.digests = archive.index()
+        self.limiter = None
+
+    def get(self, url: str, params: dict, probe=null_probe) -> bytes:
+        """Recorded body answering a request
+
+        Raises:
+            ReplayMiss: No response to the request was recorded
+        """
+        digest = self.digests.get(cache_key(params))
+        if digest is None:
+            raise ReplayMiss(cache_key(params))
+        probe.count("requests")
+        with probe.time("download"):
+            content = self.archive.read(digest)
+        probe.count("bytes", len(content))
+        return content
+
+    def chunks(self, url: str, params: dict, probe=null_probe,
+               chunk_size: int=1 << 16):
+        """Recorded body answering a request, in chunks of chunk_size bytes
+        """
+        content = self.get(url, params, probe)
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def close(self):
+        pass
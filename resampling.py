@@ -0,0 +1,169 @@
+"""Coarser bars derived locally from one fetch of fine ones
+
+A full 1min intraday series holds every 5min, 15min, 30min and 60min bar
+of the same days, and a full daily series every weekly and monthly bar,
+so one request can stand in for several:
+
+    minutes = client.ts_intraday("IBM", "1min")
+    hours = resample(minutes, "60min")
+
+Bars are grouped by integer bucket keys computed from the timestamps and
+reduced with ufunc.reduceat over the group boundaries, without any Python
+loop over bars or groups.
+"""
+import numpy as np
+import pandas as pd
+
+
+intraday_minutes = {"1min": 1, "5min": 5, "15min": 15, "30min": 30,
+                    "60min": 60}
+periods = ["daily", "weekly", "monthly"]
+
+# Reduction of every column over the bars of a bucket. Columns not listed
+# keep their last value.
+aggregations = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "adjusted_close": "last",
+    "volume": "sum",
+    "dividend_amount": "sum",
+    "split_coefficient": "prod"
+}
+
+# Regular US equity session, in the exchange time the API's timestamps use
+regular_session = ("09:30", "16:00")
+
+minute = np.int64(60 * 10 ** 9)
+day = 1440 * minute
+
+
+def derivable(source: str, target: str) -> bool:
+    """Whether bars of an interval can be derived from bars of another
+
+    Minute bars are derived from minute bars dividing them, and periods
+    from intraday or daily bars. Weeks straddle month ends, so monthly bars
+    are not derived from weekly ones.
+
+    Args:
+        source: String, interval of the fetched bars
+        target: String, interval of the derived bars
+    """
+    if target in intraday_minutes:
+        return (source in intraday_minutes
+                and intraday_minutes[target] % intraday_minutes[source] == 0)
+    return source in intraday_minutes or source in ("daily", target)
+
+
+def _nanoseconds(clock: str) -> np.int64:
+    hours, minutes = clock.split(":")
+    return (int(hours) * 60 + int(minutes)) * minute
+
+
+def bucket_keys(times: np.ndarray, interval: str,
+                anchor: str="00:00") -> np.ndarray:
+    """Integer key of the bucket of every timestamp
+
+    Keys never decrease along ascending times, and bars of one key make up
+    one derived bar. Intraday buckets never span two days, since every
+    intraday interval divides a day.
+
+    Args:
+        times: Array, datetime64[ns] timestamps in ascending order
+        interval: String, interval of the derived bars
+        anchor: String, "HH:MM" time of day intraday buckets are counted
+            from, e.g. "09:30" for hours starting at the open
+    """
+    ns = times.astype("datetime64[ns]").view(np.int64)
+    if interval in intraday_minutes:
+        offset = _nanoseconds(anchor)
+        return (ns - offset) // (intraday_minutes[interval] * minute)
+    days = ns // day
+    if interval == "daily":
+        return days
+    if interval == "weekly":
+        # 1970-01-01 was a Thursday; weeks run from Monday to Sunday
+        return (days + 3) // 7
+    assert(interval == "monthly")
+    return times.astype("datetime64[M]").view(np.int64)
+
+
+def _reduce(how: str, values: np.ndarray, starts: np.ndarray,
+            ends: np.ndarray) -> np.ndarray:
+    if how == "first":
+        return values[starts]
+    if how == "last":
+        return values[ends - 1]
+    if how == "max":
+        return np.fmax.reduceat(values, starts)
+    if how == "min":
+        return np.fmin.reduceat(values, starts)
+    if how == "sum":
+        return np.add.reduceat(values, starts)
+    assert(how == "prod")
+    return np.multiply.reduceat(values, starts)
+
+
+def resample(prices: pd.DataFrame,
+             interval: str,
+             anchor: str="00:00",
+             session: tuple=regular_session) -> pd.DataFrame:
+    """Bars of a coarser interval derived from a price series
+
+    Derived bars take the first open, highest high, lowest low and last
+    close of their bucket and the sum of its volumes. Intraday bars are
+    labelled by the start of their bucket like the API's, daily ones by
+    their date, and weekly and monthly ones by their last trading day.
+
+    Args:
+        prices: DataFrame, bars in any order, indexed by time, as returned
+            by an endpoint method
+        interval: String, interval of the derived bars, e.g. "60min" or
+            "weekly"
+        anchor: String, "HH:MM" time of day intraday buckets are counted
+            from
+        session: Tuple, "HH:MM" start and end of the session whose bars
+            make up daily and coarser bars derived from intraday ones, or
+            None to keep extended hours
+
+    Returns:
+        DataFrame, the derived bars newest first, with the columns of
+        prices
+    """
+    assert(interval in intraday_minutes or interval in periods)
+    prices = prices.sort_index()
+    times = prices.index.to_numpy(dtype="datetime64[ns]")
+    ns = times.view(np.int64)
+    if session is not None and interval in periods and len(ns) > 0 \
+            and (ns % day != 0).any():
+        clock = ns % day
+        keep = ((clock >= _nanoseconds(session[0]))
+                & (clock < _nanoseconds(session[1])))
+        prices = prices.iloc[keep]
+        times = times[keep]
+        ns = ns[keep]
+    if len(ns) == 0:
+        return prices.iloc[::-1]
+
+    keys = bucket_keys(times, interval, anchor)
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+    ends = np.append(starts[1:], len(keys))
+
+    if interval in intraday_minutes:
+        offset = _nanoseconds(anchor)
+        size = intraday_minutes[interval] * minute
+        labels = keys[starts] * size + offset
+    elif interval == "daily":
+        labels = keys[starts] * day
+    else:
+        labels = ns[ends - 1] // day * day
+    index = pd.DatetimeIndex(labels.view("datetime64[ns]"),
+                             name=prices.index.name)
+
+    columns = {}
+    for name in prices.columns:
+        values = prices[name].to_numpy()
+        how = aggregations.get(name, "last")
+        columns[name] = _reduce(how, values, starts, ends)
+    return pd.DataFrame(columns, index=index).iloc[::-1]
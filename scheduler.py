@@ -0,0 +1,306 @@
+"""Priority scheduling of requests sharing one API quota
+
+A Scheduler stands in for the TokenBucket of a client. Instead of serving
+callers in arrival order it grants each token to the waiting request of
+the highest priority, learns the effective quota from the throttle notes
+the API answers with, and sheds requests that cannot make their deadline:
+
+    scheduler = Scheduler(calls_per_minute=75)
+    client = Client(token, rate_limiter=scheduler)
+
+    with priority("interactive", timeout=2.0):
+        client.ts_daily("IBM")
+
+    with priority("backfill"):
+        client.fetch_many(universe, ["ts_daily"])
+
+The priority of a call is read from a context variable, so it follows the
+calling thread or asyncio task down to the transport.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+
+priorities = {"interactive": 0, "normal": 1, "backfill": 2}
+
+# (priority, absolute monotonic deadline or None) of the current context
+_context = contextvars.ContextVar("priority", default=(1, None))
+
+
+class Shed(Exception):
+    """The scheduler dropped the request instead of sending it
+    """
+
+
+class DeadlineExceeded(Shed):
+    """The request could not be sent before its deadline
+    """
+
+
+def _level(level) -> int:
+    if isinstance(level, str):
+        return priorities[level]
+    return int(level)
+
+
+@contextmanager
+def priority(level, timeout: float=None):
+    """Runs the enclosed requests at a priority and with a deadline
+
+    Args:
+        level: String or integer, name in priorities or a number, lower
+            numbers served first
+        timeout: Float, seconds from now by which each enclosed request
+            must have been sent, or None
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    token = _context.set((_level(level), deadline))
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class Waiter(object):
+    __slots__ = ("level", "deadline", "seq", "since", "done")
+
+    def __init__(self, level: int, deadline, seq: int):
+        self.level = level
+        self.deadline = deadline
+        self.seq = seq
+        self.since = time.monotonic()
+        self.done = False
+
+    def __lt__(self, other):
+        return (self.level, self.seq) < (other.level, other.seq)
+
+
+class Scheduler(object):
+    """Thread-safe, priority-ordered and quota-learning rate limiter
+    """
+
+    def __init__(self,
+                 calls_per_minute: float=5,
+                 capacity: float=1.0,
+                 min_calls_per_minute: float=1,
+                 decrease: float=0.5,
+                 recovery: float=0.02,
+                 max_depth: dict=None,
+                 poll_interval: float=0.05):
+        """Initializes the scheduler
+
+        Args:
+            calls_per_minute: Float, quota of the API key, the highest rate
+                the scheduler sends at
+            capacity: Float, largest burst of tokens after an idle period
+            min_calls_per_minute: Float, lowest rate a series of throttle
+                notes can push the scheduler down to
+            decrease: Float, factor the rate is multiplied by on a throttle
+                note
+            recovery: Float, share of the quota the rate grows back by
+                with every request served without a throttle note
+            max_depth: Dictionary mapping priority names or numbers to the
+                most requests allowed to wait at that priority; requests
+                beyond it are shed at once
+            poll_interval: Float, seconds between checks of asyncio waiters
+                that are not first in line
+        """
+        assert(calls_per_minute > 0)
+        assert(capacity >= 1)
+        self.max_rate = calls_per_minute / 60.0
+        self.min_rate = min(self.max_rate, min_calls_per_minute / 60.0)
+        self.rate = self.max_rate
+        self.capacity = capacity
+        self.decrease = decrease
+        self.recovery = recovery
+        self.max_depth = {_level(k): v for k, v in (max_depth or {}).items()}
+        self.poll_interval = poll_interval
+
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.queue = []
+        self.seq = itertools.count()
+
+        self.throttles = 0
+        self.served = {}
+        self.waited = {}
+        self.shed = {}
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _head(self):
+        while self.queue and self.queue[0].done:
+            heapq.heappop(self.queue)
+        return self.queue[0] if self.queue else None
+
+    def _enqueue(self) -> Waiter:
+        level, deadline = _context.get()
+        depth = self.max_depth.get(level)
+        if depth is not None and self._depths().get(level, 0) >= depth:
+            self.shed[level] = self.shed.get(level, 0) + 1
+            raise Shed("queue of priority %d is full" % level)
+        waiter = Waiter(level, deadline, next(self.seq))
+        heapq.heappush(self.queue, waiter)
+        return waiter
+
+    def _abandon(self, waiter: Waiter):
+        # the caller stopped waiting, e.g. its task was cancelled; waiters
+        # behind it must not keep counting it as ahead of them
+        if not waiter.done:
+            waiter.done = True
+            self._head()
+            self.cond.notify_all()
+
+    def _drop(self, waiter: Waiter, error: Exception):
+        waiter.done = True
+        self.shed[waiter.level] = self.shed.get(waiter.level, 0) + 1
+        self.cond.notify_all()
+        raise error
+
+    def _turn(self, waiter: Waiter):
+        """Grants a token to waiter if it is its turn
+
+        Called with the lock held. Returns 0 when granted, else the seconds
+        to wait before trying again, or None to wait for a notification.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        ahead = sum(1 for w in self.queue if not w.done and w < waiter)
+        shortfall = max(0.0, 1.0 - self.tokens)
+        if waiter.deadline is not None:
+            expected = now + (shortfall + ahead) / self.rate
+            if expected > waiter.deadline:
+                self._drop(waiter, DeadlineExceeded(
+                    "expected to wait %.3fs past the deadline"
+                    % (expected - waiter.deadline)))
+        if ahead > 0:
+            return None
+        if shortfall > 0:
+            return shortfall / self.rate
+        self.tokens -= 1.0
+        waiter.done = True
+        self._head()
+        waited = now - waiter.since
+        self.served[waiter.level] = self.served.get(waiter.level, 0) + 1
+        self.waited[waiter.level] = self.waited.get(waiter.level, 0) + waited
+        self.cond.notify_all()
+        return 0
+
+    def acquire(self) -> float:
+        """Blocks until the calling context's request may be sent
+
+        Returns:
+            Float, seconds spent waiting
+
+        Raises:
+            Shed: The queue of the request's priority is full
+            DeadlineExceeded: The request cannot be sent before its
+                deadline
+        """
+        start = time.monotonic()
+        with self.cond:
+            waiter = self._enqueue()
+            try:
+                while True:
+                    delay = self._turn(waiter)
+                    if delay == 0:
+                        return time.monotonic() - start
+                    if waiter.deadline is not None:
+                        remaining = waiter.deadline - time.monotonic()
+                        delay = remaining if delay is None \
+                            else min(delay, remaining)
+                    self.cond.wait(delay)
+            except BaseException:
+                self._abandon(waiter)
+                raise
+
+    async def acquire_async(self) -> float:
+        """acquire() for asyncio tasks, waiting without blocking the loop
+        """
+        start = time.monotonic()
+        with self.lock:
+            waiter = self._enqueue()
+        try:
+            while True:
+                with self.lock:
+                    delay = self._turn(waiter)
+                if delay == 0:
+                    return time.monotonic() - start
+                await asyncio.sleep(self.poll_interval if delay is None
+                                    else min(delay, self.poll_interval))
+        except BaseException:
+            with self.lock:
+                self._abandon(waiter)
+            raise
+
+    def feedback(self, throttled: bool):
+        """Adapts the rate to the outcome of a request
+
+        A throttle note cuts the rate and empties the bucket; every other
+        answer grows the rate back towards the quota.
+
+        Args:
+            throttled: bool, whether the API answered with a throttle note
+        """
+        with self.cond:
+            self._refill(time.monotonic())
+            if throttled:
+                self.throttles += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.tokens = min(self.tokens, 0.0)
+            else:
+                self.rate = min(self.max_rate,
+                                self.rate + self.max_rate * self.recovery)
+            self.cond.notify_all()
+
+    def _depths(self) -> dict:
+        depths = {}
+        for waiter in self.queue:
+            if not waiter.done:
+                depths[waiter.level] = depths.get(waiter.level, 0) + 1
+        return depths
+
+    def depths(self) -> dict:
+        """Number of requests waiting at each priority
+        """
+        with self.lock:
+            return self._depths()
+
+    def stats(self) -> dict:
+        """Learned rate, queue depths and counts of every priority
+
+        Returns:
+            Dictionary with the rate currently sent at and the quota in
+            calls per minute, the throttle notes seen, and per priority the
+            requests waiting, served and shed and their mean wait
+        """
+        names = {v: k for k, v in priorities.items()}
+        with self.lock:
+            depths = self._depths()
+            levels = set(depths) | set(self.served) | set(self.shed)
+            classes = {}
+            for level in sorted(levels):
+                served = self.served.get(level, 0)
+                classes[names.get(level, level)] = {
+                    "waiting": depths.get(level, 0),
+                    "served": served,
+                    "shed": self.shed.get(level, 0),
+                    "mean_wait": (self.waited.get(level, 0.0) / served
+                                  if served else 0.0)
+                }
+            return {
+                "calls_per_minute": self.rate * 60.0,
+                "quota_per_minute": self.max_rate * 60.0,
+                "throttles": self.throttles,
+                "priorities": classes
+            }
@@ -0,0 +1,266 @@
+"""Cross-sectional index of the latest indicator values of a universe
+
+Screens compare the latest bar of several indicators across every symbol.
+The index keeps those values as a symbols x fields matrix and, per field,
+the rows sorted by value, so a range or top-k query is a binary search
+instead of a loop over frames:
+
+    index = ScreenIndex({
+        "rsi": ("rsi", {"interval": "daily", "time_period": 14,
+                        "series_type": "close"}),
+        "adx": ("adx", {"interval": "daily", "time_period": 14}),
+        "hist": ("macd", {"interval": "daily", "series_type": "close"},
+                 "MACD_Hist")})
+    index.load(store, universe)
+    oversold = index.screen({"rsi": (None, 30), "adx": (25, None)})
+
+Given to a Client as screen=index, the index takes the latest bar of every
+fetched series it covers as the fetch lands. A NaN value, e.g. of an
+indicator still warming up, leaves its symbol out of that field's queries.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from endpoints import endpoints
+from outputs import to_frame
+from store import delivery_params
+
+
+# time of a value never observed, before any bar
+never = np.iinfo(np.int64).min
+
+
+def series_key(params: dict) -> tuple:
+    """Key shared by the requests of one series for every symbol
+
+    Args:
+        params: Dictionary, query parameters of a request
+    """
+    rest = sorted((k, str(v)) for k, v in params.items()
+                  if k not in delivery_params)
+    return (params["function"],) + tuple(rest)
+
+
+class ScreenIndex(object):
+    """Latest values of indicator fields across symbols
+    """
+
+    def __init__(self, fields: dict, capacity: int=1024):
+        """Initializes an empty index
+
+        Args:
+            fields: Dictionary mapping field names to (method, kwargs) or
+                (method, kwargs, column) tuples: the endpoint method and
+                its arguments besides the symbol, and the column of its
+                frames, which may be left out for single column series
+            capacity: Integer, symbols the index makes room for at first,
+                grown as needed
+        """
+        assert(len(fields) > 0 and capacity > 0)
+        self.fields = list(fields)
+        self.positions = {name: i for i, name in enumerate(self.fields)}
+        # series key -> (method, kwargs, [(position, column), ...])
+        self.series = {}
+        for i, (name, spec) in enumerate(fields.items()):
+            method, kwargs = spec[0], dict(spec[1])
+            column = spec[2] if len(spec) > 2 else None
+            params, _ = endpoints[method].build("", "", **kwargs)
+            key = series_key(params)
+            self.series.setdefault(key, (method, kwargs, []))[2].append(
+                (i, column))
+
+        self.symbols = np.empty(capacity, dtype=object)
+        self.rows = {}
+        self.values = np.full((capacity, len(fields)), np.nan)
+        self.times = np.full((capacity, len(fields)), never)
+        # per field, the rows with a value in ascending order of value
+        self.sorted = [np.empty(0) for _ in self.fields]
+        self.order = [np.empty(0, dtype=np.int64) for _ in self.fields]
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _row(self, symbol: str) -> int:
+        symbol = symbol.upper()
+        row = self.rows.get(symbol)
+        if row is not None:
+            return row
+        row = len(self.rows)
+        if row == len(self.symbols):
+            grown = len(self.symbols)
+            self.symbols = np.concatenate(
+                [self.symbols, np.empty(grown, dtype=object)])
+            self.values = np.concatenate(
+                [self.values, np.full_like(self.values, np.nan)])
+            self.times = np.concatenate(
+                [self.times, np.full_like(self.times, never)])
+        self.symbols[row] = symbol
+        self.rows[symbol] = row
+        return row
+
+    def _latest(self, row: int, position: int, time: int,
+                value: float) -> bool:
+        # a series fetched for an older range never replaces a newer bar
+        if time < self.times[row, position]:
+            return False
+        self.times[row, position] = time
+        old = self.values[row, position]
+        self.values[row, position] = value
+        return not (old == value or (np.isnan(old) and np.isnan(value)))
+
+    def _move(self, row: int, position: int, old: float, value: float):
+        values, order = self.sorted[position], self.order[position]
+        if not np.isnan(old):
+            lo = np.searchsorted(values, old, "left")
+            hi = np.searchsorted(values, old, "right")
+            at = lo + np.flatnonzero(order[lo:hi] == row)[0]
+            values, order = np.delete(values, at), np.delete(order, at)
+        if not np.isnan(value):
+            at = np.searchsorted(values, value, "right")
+            values = np.insert(values, at, value)
+            order = np.insert(order, at, row)
+        self.sorted[position], self.order[position] = values, order
+
+    def _sort(self, position: int):
+        values = self.values[:len(self.rows), position]
+        rows = np.flatnonzero(~np.isnan(values))
+        order = rows[np.argsort(values[rows], kind="stable")]
+        self.sorted[position], self.order[position] = values[order], order
+
+    def covers(self, params: dict) -> bool:
+        """Whether a request fetches a series of one of the fields
+        """
+        return series_key(params) in self.series
+
+    def observe(self, params: dict, data):
+        """Takes the latest bar of a fetched series into the index
+
+        Only the rows whose values changed move in the sorted fields, so a
+        fetch costs O(log n) searches and one shift of each sorted array.
+
+        Args:
+            params: Dictionary, query parameters of the request
+            data: Frame the request returned, in any output format
+        """
+        targets = self.series.get(series_key(params))
+        if targets is None:
+            return
+        frame = to_frame(data)
+        if len(frame) == 0:
+            return
+        times = frame.index.as_unit("ns").asi8
+        at = int(np.argmax(times))
+        with self.lock:
+            row = self._row(params["symbol"])
+            for position, column in targets[2]:
+                if column is None:
+                    assert(len(frame.columns) == 1)
+                    column = frame.columns[0]
+                old = self.values[row, position]
+                value = float(frame[column].iloc[at])
+                if self._latest(row, position, times[at], value):
+                    self._move(row, position, old, value)
+
+    def load(self, store, symbols):
+        """Fills the index from the series of a ColumnStore
+
+        Reads only the last row of every memory-mapped series and sorts
+        each field once, e.g. after workers.run_workers filled the store.
+
+        Args:
+            store: ColumnStore, holding the fetched series
+            symbols: Iterable, symbols specifying equities
+        """
+        with self.lock:
+            for symbol in symbols:
+                row = self._row(symbol)
+                for method, kwargs, targets in self.series.values():
+                    params, _ = endpoints[method].build("", symbol, **kwargs)
+                    stored = store.columns(params)
+                    if stored is None or len(stored[0]) == 0:
+                        continue
+                    times, columns = stored
+                    for position, column in targets:
+                        if column is None:
+                            assert(len(columns) == 1)
+                            column = next(iter(columns))
+                        self._latest(row, position, times[-1],
+                                     float(columns[column][-1]))
+            for position in range(len(self.fields)):
+                self._sort(position)
+
+    def _span(self, position: int, low, high) -> tuple:
+        values = self.sorted[position]
+        lo = 0 if low is None else np.searchsorted(values, low, "left")
+        hi = len(values)
+        if high is not None:
+            hi = np.searchsorted(values, high, "left")
+        return lo, hi
+
+    def between(self, field: str, low: float=None,
+                high: float=None) -> list:
+        """Symbols whose latest value lies in [low, high), by ascending value
+
+        Args:
+            field: String, name of the field
+            low: Float, smallest value included, or None
+            high: Float, bound of the values included, or None
+        """
+        position = self.positions[field]
+        with self.lock:
+            lo, hi = self._span(position, low, high)
+            return self.symbols[self.order[position][lo:hi]].tolist()
+
+    def top(self, field: str, k: int=10, largest: bool=True) -> list:
+        """Symbols with the largest or smallest latest values of a field
+
+        Args:
+            field: String, name of the field
+            k: Integer, number of symbols
+            largest: bool, whether to rank the largest values first
+        """
+        position = self.positions[field]
+        with self.lock:
+            order = self.order[position]
+            rows = order[::-1][:k] if largest else order[:k]
+            return self.symbols[rows].tolist()
+
+    def screen(self, conditions: dict, since=None) -> list:
+        """Symbols meeting every condition on their latest values
+
+        Args:
+            conditions: Dictionary mapping field names to (low, high)
+                bounds, low included and high excluded, either may be None
+            since: Timestamp or string, earliest time of a bar counted, or
+                None to count the latest bar however old
+
+        Returns:
+            List of symbols, in the order they entered the index
+        """
+        with self.lock:
+            n = len(self.rows)
+            selected = np.ones(n, dtype=bool)
+            for field, (low, high) in conditions.items():
+                position = self.positions[field]
+                lo, hi = self._span(position, low, high)
+                within = np.zeros(n, dtype=bool)
+                within[self.order[position][lo:hi]] = True
+                selected &= within
+                if since is not None:
+                    recent = self.times[:n, position] >= \
+                        pd.Timestamp(since).as_unit("ns").value
+                    selected &= recent
+            return self.symbols[np.flatnonzero(selected)].tolist()
+
+    def frame(self) -> pd.DataFrame:
+        """Latest values as a frame of symbols by fields
+        """
+        with self.lock:
+            n = len(self.rows)
+            return pd.DataFrame(self.values[:n].copy(),
+                                index=pd.Index(self.symbols[:n],
+                                               name="symbol"),
+                                columns=self.fields)
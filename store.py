@@ -0,0 +1,225 @@
+"""Columnar store of fetched series with memory-mapped reads
+
+Each series, identified by its API function, symbol and remaining query
+parameters, is a directory of NumPy .npy files: one of int64 nanosecond
+timestamps sorted oldest first and one per column. Reads memory-map the
+files and locate a date range by binary search on the timestamps, so a
+month of a 20-year series touches only that month's pages. Writers of a
+series take turns through a file lock, so processes may share a store.
+"""
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+
+# Query parameters that change how a series is delivered, not what it holds
+delivery_params = {"function", "symbol", "apikey", "datatype", "outputsize"}
+
+
+def series_name(params: dict) -> tuple:
+    """Directory names of the series a request fetches
+
+    Args:
+        params: Dictionary, query parameters of the request
+
+    Returns:
+        Tuple (function, series) of path components
+    """
+    rest = ",".join("%s=%s" % (k, params[k]) for k in sorted(params)
+                    if k not in delivery_params)
+    name = params.get("symbol") or "%s-%s" % (params.get("from_symbol"),
+                                              params.get("to_symbol"))
+    if rest:
+        name = "%s,%s" % (name, rest)
+    return params["function"], quote(str(name).upper(), safe="=,")
+
+
+class ColumnStore(object):
+    """Fetched series kept as memory-mapped columns in a directory
+    """
+
+    def __init__(self, directory: str):
+        """Initializes the store
+
+        Args:
+            directory: String, directory holding the series, created if
+                needed
+        """
+        self.directory = directory
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, params: dict) -> str:
+        return os.path.join(self.directory, *series_name(params))
+
+    def _meta(self, path: str):
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _open(self, path: str, meta: dict, name: str) -> np.ndarray:
+        name = "%s-%s.npy" % (meta["version"], name)
+        return np.load(os.path.join(path, name), mmap_mode="r")
+
+    def columns(self, params: dict):
+        """Memory-mapped timestamps and columns of a series, or None
+
+        Args:
+            params: Dictionary, query parameters of the request that
+                fetched the series
+
+        Returns:
+            Tuple (times, columns) where times holds int64 nanoseconds
+            oldest first and columns maps column names to arrays
+        """
+        path = self.path(params)
+        meta = self._meta(path)
+        while meta is not None:
+            try:
+                times = self._open(path, meta, "time")
+                columns = {name: self._open(path, meta, str(i))
+                           for i, name in enumerate(meta["columns"])}
+                return times, columns
+            except FileNotFoundError:
+                # writes removed the version read meanwhile; read the
+                # current one unless nothing changed
+                current = self._meta(path)
+                if current is not None \
+                        and current["version"] == meta["version"]:
+                    raise
+                meta = current
+        return None
+
+    def load(self, params: dict, start=None, end=None):
+        """Stored series between two dates, or None
+
+        Args:
+            params: Dictionary, query parameters of the request that
+                fetched the series
+            start: Timestamp or string, first time included, or None
+            end: Timestamp or string, last time included, or None
+
+        Returns:
+            DataFrame indexed by time, newest bar first like the API's
+            answers
+        """
+        stored = self.columns(params)
+        if stored is None:
+            return None
+        times, columns = stored
+        lo, hi = 0, len(times)
+        if start is not None:
+            lo = np.searchsorted(times, pd.Timestamp(start).value, "left")
+        if end is not None:
+            hi = np.searchsorted(times, pd.Timestamp(end).value, "right")
+        index = pd.DatetimeIndex(times[lo:hi][::-1].astype("datetime64[ns]"),
+                                 name="time")
+        return pd.DataFrame({name: np.array(column[lo:hi][::-1])
+                             for name, column in columns.items()},
+                            index=index)
+
+    def save(self, params: dict, data: pd.DataFrame):
+        """Merges a fetched frame into its stored series
+
+        Rows of data replace stored rows at the same time and extend the
+        series otherwise. A frame with other columns than the stored series
+        replaces it. Nothing is written when the frame adds nothing.
+
+        Args:
+            params: Dictionary, query parameters of the request that
+                fetched data
+            data: DataFrame indexed by time, in any order
+        """
+        with self.lock, self._locked(params):
+            self._save(params, data.sort_index())
+
+    @contextmanager
+    def _locked(self, params: dict):
+        # writers of a series in every process take turns; the lock file
+        # lives next to the series so that deleting it keeps the lock
+        import fcntl
+
+        function, series = series_name(params)
+        os.makedirs(os.path.join(self.directory, function), exist_ok=True)
+        fd = os.open(os.path.join(self.directory, function,
+                                  "%s.lock" % series),
+                     os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _save(self, params: dict, data: pd.DataFrame):
+        times = data.index.as_unit("ns").asi8
+        names = [str(name) for name in data.columns]
+        columns = [data[name].to_numpy() for name in data.columns]
+
+        path = self.path(params)
+        meta = self._meta(path)
+        stored = self.columns(params) if meta is not None else None
+        if stored is not None and meta["columns"] == names:
+            old_times, old_columns = stored
+            at = np.searchsorted(old_times, times)
+            found = at < len(old_times)
+            found[found] = old_times[at[found]] == times[found]
+            if found.all() and all(
+                    np.array_equal(old_columns[name][at], column,
+                                   equal_nan=column.dtype.kind == "f")
+                    for name, column in zip(names, columns)):
+                return
+            # stored rows not refetched, then the fetched ones
+            kept = np.ones(len(old_times), dtype=bool)
+            kept[at[found]] = False
+            order = np.argsort(np.concatenate([old_times[kept], times]),
+                               kind="stable")
+            times = np.concatenate([old_times[kept], times])[order]
+            columns = [
+                np.concatenate([old_columns[name][kept], column])[order]
+                for name, column in zip(names, columns)
+            ]
+        self._write(path, meta, names, times, columns)
+
+    def _write(self, path: str, meta, names: list, times: np.ndarray,
+               columns: list):
+        # new files under a fresh version, then an atomic swap of meta.json;
+        # the replaced version stays until the next write, so a reader that
+        # read its meta.json can still open its files, and readers mapping
+        # older versions keep their pages
+        os.makedirs(path, exist_ok=True)
+        version = uuid.uuid4().hex
+        np.save(os.path.join(path, "%s-time.npy" % version), times)
+        for i, column in enumerate(columns):
+            np.save(os.path.join(path, "%s-%d.npy" % (version, i)), column)
+        tmp = os.path.join(path, "meta.json.%s" % version)
+        with open(tmp, "w") as f:
+            json.dump({"version": version, "columns": names}, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+        kept = [version + "-"]
+        if meta is not None:
+            kept.append(meta["version"] + "-")
+        for name in os.listdir(path):
+            if name != "meta.json" and not name.startswith(tuple(kept)):
+                os.unlink(os.path.join(path, name))
+
+    def delete(self, params: dict):
+        """Removes a stored series
+
+        Args:
+            params: Dictionary, query parameters of the request that
+                fetched the series
+        """
+        path = self.path(params)
+        with self.lock, self._locked(params):
+            if os.path.isdir(path):
+                for name in os.listdir(path):
+                    os.unlink(os.path.join(path, name))
+                os.rmdir(path)
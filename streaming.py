@@ -0,0 +1,292 @@
+"""Indicators updated one bar at a time for live intraday feeds
+
+Each indicator is seeded from a historical fetch, then takes one new bar per
+update in O(1) and returns its latest value, NaN while warming up. Values
+match the indicators module on the same series. State lives in __slots__
+and round-trips through checkpoint()/restore() as plain Python data.
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+
+nan = float("nan")
+
+
+class Streaming(object):
+    """Base class of streaming indicators
+
+    Subclasses define inputs, the price columns update() takes, and update().
+    """
+
+    __slots__ = ()
+    inputs = ("close",)
+
+    def _slots(self):
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                yield name
+
+    def seed(self, prices):
+        """Feeds a history of bars, oldest first after sorting by time
+
+        Args:
+            prices: DataFrame, prices as returned by Client.ts_daily or an
+                intraday fetch, in any order
+
+        Returns:
+            The indicator, for chaining
+        """
+        prices = prices.sort_index()
+        columns = [prices[name].to_numpy(dtype=np.float64).tolist()
+                   for name in self.inputs]
+        for values in zip(*columns):
+            self.update(*values)
+        return self
+
+    def add(self, bar):
+        """Updates the indicator from a bar holding its input columns
+
+        Args:
+            bar: Mapping or Series, one bar of prices
+        """
+        return self.update(*(float(bar[name]) for name in self.inputs))
+
+    def checkpoint(self) -> dict:
+        """State of the indicator as plain Python data
+        """
+        state = {}
+        for name in self._slots():
+            value = getattr(self, name)
+            if isinstance(value, Streaming):
+                value = {"class": type(value).__name__,
+                         "state": value.checkpoint()}
+            elif isinstance(value, deque):
+                value = list(value)
+            state[name] = value
+        return state
+
+    @classmethod
+    def restore(cls, state: dict):
+        """Rebuilds an indicator from a checkpoint
+
+        Args:
+            state: Dictionary, value returned by checkpoint()
+        """
+        self = cls.__new__(cls)
+        for name in self._slots():
+            value = state[name]
+            if isinstance(value, dict) and "class" in value:
+                value = globals()[value["class"]].restore(value["state"])
+            elif isinstance(value, list):
+                value = deque(value)
+            setattr(self, name, value)
+        return self
+
+    def __getstate__(self):
+        return self.checkpoint()
+
+    def __setstate__(self, state):
+        restored = self.restore(state)
+        for name in self._slots():
+            setattr(self, name, getattr(restored, name))
+
+
+class Window(Streaming):
+    """Running sum of the last period values
+    """
+
+    __slots__ = ("period", "values", "total")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque()
+        self.total = 0.0
+
+    def update(self, x: float) -> float:
+        self.values.append(x)
+        self.total += x
+        if len(self.values) > self.period:
+            self.total -= self.values.popleft()
+        if len(self.values) < self.period:
+            return nan
+        return self.total / self.period
+
+
+class SMA(Window):
+    """Simple moving average
+    """
+
+    __slots__ = ()
+
+
+class EMA(Streaming):
+    """Exponential moving average seeded with the mean of the first period
+    """
+
+    __slots__ = ("period", "k", "count", "value")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.count = 0
+        self.value = 0.0
+
+    def update(self, x: float) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self.value += x
+            return nan
+        if self.count == self.period:
+            self.value = (self.value + x) / self.period
+        else:
+            self.value += (x - self.value) * self.k
+        return self.value
+
+
+class RSI(Streaming):
+    """Relative Strength Index with Wilder smoothing
+    """
+
+    __slots__ = ("period", "count", "prev", "gain", "loss")
+
+    def __init__(self, period: int=14):
+        self.period = period
+        self.count = 0
+        self.prev = nan
+        self.gain = 0.0
+        self.loss = 0.0
+
+    def update(self, x: float) -> float:
+        self.count += 1
+        prev, self.prev = self.prev, x
+        if self.count == 1:
+            return nan
+        change = x - prev
+        if self.count <= self.period + 1:
+            if change < 0:
+                self.loss -= change
+            else:
+                self.gain += change
+            if self.count <= self.period:
+                return nan
+            self.gain /= self.period
+            self.loss /= self.period
+        else:
+            self.gain *= self.period - 1
+            self.loss *= self.period - 1
+            if change < 0:
+                self.loss -= change
+            else:
+                self.gain += change
+            self.gain /= self.period
+            self.loss /= self.period
+        total = self.gain + self.loss
+        if -1e-8 < total < 1e-8:
+            return 0.0
+        return 100.0 * self.gain / total
+
+
+class MACD(Streaming):
+    """Moving Average Convergence Divergence
+
+    update() returns a (macd, signal, histogram) tuple.
+    """
+
+    __slots__ = ("fast", "slow", "count",
+                 "fast_ema", "slow_ema", "signal_ema")
+
+    def __init__(self, fast: int=12, slow: int=26, signal: int=9):
+        if slow < fast:
+            fast, slow = slow, fast
+        self.fast = fast
+        self.slow = slow
+        self.count = 0
+        self.fast_ema = EMA(fast)
+        self.slow_ema = EMA(slow)
+        self.signal_ema = EMA(signal)
+
+    def update(self, x: float) -> tuple:
+        self.count += 1
+        slow = self.slow_ema.update(x)
+        # TA-Lib starts the fast average on the window ending where the slow
+        # one is first defined
+        if self.count > self.slow - self.fast:
+            fast = self.fast_ema.update(x)
+        else:
+            fast = nan
+        if math.isnan(slow):
+            return nan, nan, nan
+        line = fast - slow
+        signal = self.signal_ema.update(line)
+        if math.isnan(signal):
+            return nan, nan, nan
+        return line, signal, line - signal
+
+
+class Extreme(Streaming):
+    """Highest or lowest of the last period values, amortized O(1) through
+    a monotonic deque of (index, value) pairs
+    """
+
+    __slots__ = ("period", "lowest", "count", "queue")
+
+    def __init__(self, period: int, lowest: bool=False):
+        self.period = period
+        self.lowest = lowest
+        self.count = 0
+        self.queue = deque()
+
+    def update(self, x: float) -> float:
+        queue = self.queue
+        if self.lowest:
+            while queue and queue[-1][1] >= x:
+                queue.pop()
+        else:
+            while queue and queue[-1][1] <= x:
+                queue.pop()
+        queue.append((self.count, x))
+        if queue[0][0] <= self.count - self.period:
+            queue.popleft()
+        self.count += 1
+        if self.count < self.period:
+            return nan
+        return queue[0][1]
+
+    @classmethod
+    def restore(cls, state: dict):
+        self = super(Extreme, cls).restore(state)
+        self.queue = deque(tuple(pair) for pair in self.queue)
+        return self
+
+
+class STOCH(Streaming):
+    """Stochastic Oscillator with simple moving average smoothing
+
+    update(high, low, close) returns a (slow k, slow d) tuple.
+    """
+
+    __slots__ = ("highest", "lowest", "slow_k", "slow_d")
+    inputs = ("high", "low", "close")
+
+    def __init__(self, fastk: int=5, slowk: int=3, slowd: int=3):
+        self.highest = Extreme(fastk)
+        self.lowest = Extreme(fastk, lowest=True)
+        self.slow_k = SMA(slowk)
+        self.slow_d = SMA(slowd)
+
+    def update(self, high: float, low: float, close: float) -> tuple:
+        highest = self.highest.update(high)
+        lowest = self.lowest.update(low)
+        if math.isnan(highest):
+            return nan, nan
+        span = (highest - lowest) / 100.0
+        fast = (close - lowest) / span if span != 0 else 0.0
+        k = self.slow_k.update(fast)
+        if math.isnan(k):
+            return nan, nan
+        d = self.slow_d.update(k)
+        if math.isnan(d):
+            return nan, nan
+        return k, d
@@ -0,0 +1,249 @@
+"""Indicator kernels evaluated for many symbols and periods in one pass
+
+Kernels take a 2-D float array of prices shaped (symbols, time), oldest bar
+first, and a sequence of periods, and return a 3-D array shaped
+(symbols, periods, time) holding the same values as the matching function
+of the indicators module, NaN over each period's warm-up bars. Rows may
+start with NaN, e.g. symbols listed later than others in a panel, and then
+match the indicators module applied from their first price. Every kernel
+costs O(symbols * time) per period whatever the window length.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def _prepare(x: np.ndarray, periods) -> tuple:
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    periods = np.asarray(periods, dtype=np.int64).ravel()
+    assert((periods >= 1).all())
+    out = np.full((x.shape[0], len(periods), x.shape[1]), np.nan)
+    return x, periods, out
+
+
+def _prefix(x: np.ndarray) -> np.ndarray:
+    # running sums with a leading zero column, so a window [a, b) sums to
+    # prefix[:, b] - prefix[:, a]
+    prefix = np.zeros((x.shape[0], x.shape[1] + 1))
+    np.cumsum(x, axis=1, out=prefix[:, 1:])
+    return prefix
+
+
+def _centred(x: np.ndarray) -> tuple:
+    """Rows less their mean, NaN bars zeroed, and running counts of NaN
+
+    Centring keeps the running sums small. Zeroing the NaN bars keeps one
+    of them from spoiling every later window of its row; the counts tell
+    the windows holding one, which are NaN like in the indicators module.
+    """
+    missing = np.isnan(x)
+    present = (~missing).sum(axis=1, keepdims=True)
+    mean = np.where(missing, 0.0, x).sum(axis=1, keepdims=True)
+    mean /= np.maximum(present, 1)
+    return np.where(missing, 0.0, x - mean), mean, _prefix(missing)
+
+
+def sma(x: np.ndarray, periods) -> np.ndarray:
+    """Simple moving averages from prefix sums
+
+    Args:
+        x: Array, prices shaped (symbols, time)
+        periods: Sequence, numbers of bars averaged
+    """
+    x, periods, out = _prepare(x, periods)
+    centred, mean, missing = _centred(x)
+    prefix = _prefix(centred)
+    for i, period in enumerate(periods):
+        if period <= x.shape[1]:
+            window = prefix[:, period:] - prefix[:, :-period]
+            holes = missing[:, period:] > missing[:, :-period]
+            out[:, i, period - 1:] = np.where(holes, np.nan,
+                                              window / period + mean)
+    return out
+
+
+def wma(x: np.ndarray, periods) -> np.ndarray:
+    """Weighted moving averages from two prefix sums
+
+    The weighted sum of a window is the window's sum of j * x[j] less its
+    first index times its plain sum.
+
+    Args:
+        x: Array, prices shaped (symbols, time)
+        periods: Sequence, numbers of bars averaged
+    """
+    x, periods, out = _prepare(x, periods)
+    centred, mean, missing = _centred(x)
+    plain = _prefix(centred)
+    ramp = _prefix(centred * np.arange(1, x.shape[1] + 1))
+    for i, period in enumerate(periods):
+        if period <= x.shape[1]:
+            first = np.arange(0, x.shape[1] - period + 1)
+            total = (ramp[:, period:] - ramp[:, :-period]
+                     - first * (plain[:, period:] - plain[:, :-period]))
+            holes = missing[:, period:] > missing[:, :-period]
+            out[:, i, period - 1:] = np.where(
+                holes, np.nan, total / (period * (period + 1) / 2) + mean)
+    return out
+
+
+def mom(x: np.ndarray, periods) -> np.ndarray:
+    """Momentum
+
+    Args:
+        x: Array, prices shaped (symbols, time)
+        periods: Sequence, numbers of bars between compared prices
+    """
+    x, periods, out = _prepare(x, periods)
+    for i, period in enumerate(periods):
+        if period < x.shape[1]:
+            out[:, i, period:] = x[:, period:] - x[:, :-period]
+    return out
+
+
+def ema(x: np.ndarray, periods) -> np.ndarray:
+    """Exponential moving averages, seeded like TA-Lib
+
+    The recursion runs once over time for every symbol and period at once.
+    Each row is seeded by its first full window, so a row padded with NaN
+    before its first price matches the indicators module from there on.
+
+    Args:
+        x: Array, prices shaped (symbols, time)
+        periods: Sequence, numbers of bars in the smoothing periods
+    """
+    x, periods, out = _prepare(x, periods)
+    seeds = sma(x, periods)
+    k = (2.0 / (periods + 1))[None, :]
+    state = np.full(out.shape[:2], np.nan)
+    started = np.zeros(out.shape[:2], dtype=bool)
+    for t in range(x.shape[1]):
+        state += (x[:, t, None] - state) * k
+        seeded = ~started & ~np.isnan(seeds[:, :, t])
+        state[seeded] = seeds[:, :, t][seeded]
+        started |= seeded
+        out[:, :, t] = state
+    return out
+
+
+def rsi(x: np.ndarray, periods) -> np.ndarray:
+    """Relative Strength Indexes with Wilder smoothing
+
+    Each row is seeded by its first full window of changes, so a row padded
+    with NaN before its first price matches the indicators module from
+    there on.
+
+    Args:
+        x: Array, prices shaped (symbols, time)
+        periods: Sequence, numbers of bars in the smoothing periods
+    """
+    x, periods, out = _prepare(x, periods)
+    if x.shape[1] < 2:
+        return out
+    diff = np.diff(x, axis=1)
+    missing = _prefix(np.isnan(diff))
+    gains = _prefix(np.nan_to_num(diff.clip(min=0)))
+    losses = _prefix(np.nan_to_num(-diff.clip(max=0)))
+    p = periods[None, :].astype(np.float64)
+    gain = np.full(out.shape[:2], np.nan)
+    loss = np.full(out.shape[:2], np.nan)
+    started = np.zeros(out.shape[:2], dtype=bool)
+    for t in range(1, x.shape[1]):
+        change = diff[:, t - 1, None]
+        gain = (gain * (p - 1) + change.clip(min=0)) / p
+        loss = (loss * (p - 1) - change.clip(max=0)) / p
+        # rows whose last period changes, ending at t, are all known
+        full = periods <= t
+        first = np.where(full, t - periods, 0)
+        seeded = ~started & full[None, :] & (missing[:, t, None]
+                                             == missing[:, first])
+        gain = np.where(seeded, (gains[:, t, None] - gains[:, first]) / p,
+                        gain)
+        loss = np.where(seeded, (losses[:, t, None] - losses[:, first]) / p,
+                        loss)
+        started |= seeded
+        total = gain + loss
+        zero = np.abs(total) < 1e-8
+        ratio = gain / np.where(zero, 1.0, total)
+        out[:, :, t] = np.where(zero, 0.0, 100.0 * ratio)
+    return out
+
+
+def _rolling(x: np.ndarray, period: int, reduce) -> np.ndarray:
+    """Van Herk/Gil-Werman sliding extreme along time: every window is the
+    union of a block suffix and the next block's prefix
+    """
+    symbols, length = x.shape
+    blocks = -(-length // period)
+    padded = np.full((symbols, blocks * period), np.nan)
+    padded[:, :length] = x
+    shaped = padded.reshape(symbols, blocks, period)
+    prefix = reduce.accumulate(shaped, axis=2).reshape(symbols, -1)
+    suffix = reduce.accumulate(shaped[:, :, ::-1], axis=2)[:, :, ::-1]
+    suffix = suffix.reshape(symbols, -1)
+    out = np.full((symbols, length), np.nan)
+    # fmax and fmin skip NaN, so windows holding one are masked afterwards
+    missing = _prefix(np.isnan(x))
+    holes = missing[:, period:] > missing[:, :-period]
+    out[:, period - 1:] = np.where(holes, np.nan,
+                                   reduce(suffix[:, :length - period + 1],
+                                          prefix[:, period - 1:length]))
+    return out
+
+
+def rolling_max(x: np.ndarray, periods) -> np.ndarray:
+    """Highest value of each window
+
+    Args:
+        x: Array, values shaped (symbols, time)
+        periods: Sequence, window lengths
+    """
+    x, periods, out = _prepare(x, periods)
+    for i, period in enumerate(periods):
+        if period <= x.shape[1]:
+            out[:, i] = _rolling(x, period, np.fmax)
+    return out
+
+
+def rolling_min(x: np.ndarray, periods) -> np.ndarray:
+    """Lowest value of each window
+
+    Args:
+        x: Array, values shaped (symbols, time)
+        periods: Sequence, window lengths
+    """
+    x, periods, out = _prepare(x, periods)
+    for i, period in enumerate(periods):
+        if period <= x.shape[1]:
+            out[:, i] = _rolling(x, period, np.fmin)
+    return out
+
+
+def _run(args):
+    kernel, chunk, periods = args
+    return kernel(chunk, periods)
+
+
+def parallel(kernel, x: np.ndarray, periods, processes: int=None,
+             chunk_size: int=None) -> np.ndarray:
+    """Evaluates a kernel over chunks of symbols in a process pool
+
+    Args:
+        kernel: Function, one of this module's kernels
+        x: Array, prices shaped (symbols, time)
+        periods: Sequence, periods passed to the kernel
+        processes: Integer, number of worker processes, defaults to the
+            number of CPUs
+        chunk_size: Integer, symbols per task, defaults to an even split
+            across the workers
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    processes = processes or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, -(-x.shape[0] // processes))
+    chunks = [x[i:i + chunk_size] for i in range(0, x.shape[0], chunk_size)]
+    if len(chunks) <= 1:
+        return kernel(x, periods)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = pool.map(_run, [(kernel, c, periods) for c in chunks])
+        return np.concatenate(list(results), axis=0)
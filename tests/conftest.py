@@ -0,0 +1,15 @@
+import os
+import sys
+
+# the client's modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from benchmarks.stub import StubServer
+
+
+@pytest.fixture
+def server():
+    with StubServer() as stub:
+        yield stub
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+
+import aiohttp
+import pandas as pd
+import pytest
+
+from async_client import AsyncClient
+from benchmarks.stub import StubServer
+from client import Client
+from metrics import Metrics
+from ratelimit import TokenBucket
+
+
+symbols = ["IBM", "MSFT", "AAPL", "GOOG", "AMZN", "META"]
+
+
+def client(server, cls=AsyncClient, **kwargs) -> Client:
+    kwargs.setdefault("calls_per_minute", None)
+    instance = cls("key", coalesce=False, **kwargs)
+    instance.base_url = server.url
+    return instance
+
+
+def count_in_flight(server) -> dict:
+    # wraps the stub's answer to record the most requests answered at once
+    answer = server.answer
+    lock = threading.Lock()
+    flight = {"now": 0, "peak": 0}
+
+    def counted(params):
+        with lock:
+            flight["now"] += 1
+            flight["peak"] = max(flight["peak"], flight["now"])
+        try:
+            return answer(params)
+        finally:
+            with lock:
+                flight["now"] -= 1
+
+    server.answer = counted
+    return flight
+
+
+@pytest.mark.parametrize("options, bound", [
+    ({"max_concurrency": 2}, 2),
+    ({"pool_size": 3}, 3)])
+def test_requests_in_flight_are_bounded(options, bound):
+    async def main(server):
+        async with client(server, **options) as async_client:
+            await asyncio.gather(*(async_client.sma(s) for s in symbols))
+            transport = async_client.transport
+            return transport.max_concurrency, transport.session.connector.limit
+
+    with StubServer(latency=0.05) as server:
+        flight = count_in_flight(server)
+        concurrency, pool_size = asyncio.run(main(server))
+        assert flight["peak"] == bound
+        assert server.requests == len(symbols)
+    assert concurrency == bound
+    assert pool_size == options.get("pool_size", 100)
+
+
+def test_limiter_is_shared_with_client(server):
+    limiter = TokenBucket(20.0)
+    sync_client = client(server, Client, rate_limiter=limiter)
+
+    async def main():
+        async with client(server, rate_limiter=limiter) as async_client:
+            assert async_client.transport.limiter is limiter
+            await asyncio.gather(*(async_client.sma(s) for s in symbols[:3]))
+
+    start = time.monotonic()
+    for symbol in symbols[3:]:
+        sync_client.sma(symbol)
+    asyncio.run(main())
+    # the six requests drew from one bucket of 20 tokens a second
+    assert time.monotonic() - start >= 5 / 20.0 - 0.01
+    assert limiter.calls == len(symbols)
+
+
+def test_stream_matches_whole_frame(server):
+    async def main():
+        async with client(server) as async_client:
+            whole = await async_client.ts_daily("IBM")
+            batches = [batch async for batch in
+                       async_client.ts_daily("IBM", stream=True,
+                                             batch_size=700)]
+            return whole, batches
+
+    whole, batches = asyncio.run(main())
+    assert [len(batch) for batch in batches[:-1]] == [700] * (len(batches) - 1)
+    pd.testing.assert_frame_equal(pd.concat(batches), whole)
+
+
+def test_failed_requests_are_timed():
+    metrics = Metrics()
+
+    async def main(server):
+        async with client(server, metrics=metrics) as async_client:
+            await async_client.sma("IBM")
+
+    with StubServer(fail_every=1, fail_status=404) as server:
+        with pytest.raises(aiohttp.ClientResponseError) as caught:
+            asyncio.run(main(server))
+        assert caught.value.status == 404
+    assert metrics.summary()["SMA"]["request"]["count"] == 1
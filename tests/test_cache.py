@@ -0,0 +1,96 @@
+import datetime
+import time
+
+import pandas as pd
+import pytest
+
+from cache import (DiskCache, MemoryCache, TieredCache, cache_key,
+                   market_tz, ttl_for)
+from client import Client
+
+
+def at(clock: str) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(clock).replace(tzinfo=market_tz)
+
+
+@pytest.mark.parametrize("interval, ttl", [("1min", 60), ("5min", 300),
+                                           ("60min", 3600)])
+def test_intraday_ttl_is_one_bar(interval, ttl):
+    assert ttl_for({"interval": interval}) == ttl
+
+
+@pytest.mark.parametrize("now, hours", [
+    # Wednesday morning, until 16:30 that day
+    ("2024-06-26 10:00", 6.5),
+    # Wednesday after the publish, until Thursday's
+    ("2024-06-26 17:00", 23.5),
+    # Friday after the publish, over the weekend until Monday's
+    ("2024-06-28 16:45", 71.75),
+    ("2024-06-29 12:00", 52.5)
+])
+def test_daily_ttl_runs_to_next_publish(now, hours):
+    for params in ({}, {"interval": "daily"}, {"interval": "weekly"}):
+        assert ttl_for(params, at(now)) == hours * 3600
+
+
+def test_cache_key_leaves_out_api_key():
+    assert cache_key({"function": "SMA", "apikey": "a", "symbol": "IBM"}) \
+        == cache_key({"symbol": "IBM", "apikey": "b", "function": "SMA"})
+
+
+def test_memory_entries_expire_and_evict():
+    cache = MemoryCache(max_entries=2)
+    cache.set("short", b"1", 0.05)
+    cache.set("long", b"2", 60)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    cache.set("other", b"3", 60)
+    cache.get("long")
+    cache.set("newest", b"4", 60)
+    # the least recently used entry is evicted
+    assert cache.get("other") is None
+    assert cache.get("long") == b"2"
+
+
+def test_disk_entries_expire(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"))
+    cache.set("short", b"1", 0.05)
+    cache.set("long", b"2", 60)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    cache.purge()
+    count = cache.db.execute("SELECT COUNT(*) FROM responses").fetchone()
+    assert count == (1,)
+
+
+def test_tiers_promote_with_disk_expiry(tmp_path):
+    disk = DiskCache(str(tmp_path / "cache.sqlite"))
+    disk.set("key", b"body", 60)
+    expires = disk.entry("key")[1]
+    cache = TieredCache(disk)
+    assert cache.memory.get("key") is None
+    assert cache.get("key") == b"body"
+    # later reads are served from memory, expiring with the disk entry
+    content, promoted = cache.memory.entry("key")
+    assert content == b"body"
+    assert promoted == pytest.approx(expires, abs=0.01)
+    disk.clear()
+    assert cache.get("key") == b"body"
+
+
+def test_disk_cache_persists_across_clients(server, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+
+    def client() -> Client:
+        instance = Client("key", calls_per_minute=None,
+                          cache=TieredCache(DiskCache(path)))
+        instance.base_url = server.url
+        return instance
+
+    first = client().sma("IBM", interval="daily")
+    assert server.requests == 1
+    second = client().sma("IBM", interval="daily")
+    assert server.requests == 1
+    pd.testing.assert_frame_equal(first, second)
+    client().sma("IBM", interval="weekly")
+    assert server.requests == 2
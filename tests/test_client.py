@@ -0,0 +1,68 @@
+import asyncio
+import warnings
+
+from async_client import AsyncClient
+from benchmarks.stub import StubServer
+from client import Client
+from ratelimit import TokenBucket
+from recording import Archive, RecordingTransport
+from transport import Transport
+
+
+def client(server, cls=Client, **kwargs) -> Client:
+    kwargs.setdefault("calls_per_minute", None)
+    instance = cls("key", coalesce=False, **kwargs)
+    instance.base_url = server.url
+    return instance
+
+
+def test_fetch_many_sends_identical_requests_once(server):
+    # time_period 15 is sma's default, so both names ask the same request
+    spec = {"default": "sma", "explicit": ("sma", {"time_period": 15}),
+            "other": ("sma", {"time_period": 30})}
+    panel, errors = client(server).fetch_many(["ibm", "msft"], spec)
+    assert errors == {}
+    assert server.requests == 4
+    assert set(panel.columns.get_level_values("indicator")) == set(spec)
+
+
+def test_async_fetch_many(server):
+    spec = {"default": "sma", "explicit": ("sma", {"time_period": 15}),
+            "rsi": "rsi"}
+
+    async def main():
+        async with client(server, AsyncClient) as async_client:
+            return await async_client.fetch_many(["IBM", "MSFT"], spec)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        panel, errors = asyncio.run(main())
+    assert errors == {}
+    assert server.requests == 4
+    expected, _ = client(server).fetch_many(["IBM", "MSFT"], spec)
+    assert panel.equals(expected)
+
+
+def test_given_transport_sends_through_client_limiter(tmp_path):
+    transport = RecordingTransport(Archive(str(tmp_path)))
+    recording = Client("key", calls_per_minute=5, max_attempts=7,
+                       transport=transport)
+    assert transport.limiter is recording.rate_limiter
+    assert transport.limiter is not None
+    # retries stay the transport's own, and the client says so
+    assert recording.max_attempts == transport.max_attempts == 3
+
+    limiter = TokenBucket(1.0)
+    transport = Transport(limiter=limiter)
+    Client("key", calls_per_minute=5, transport=transport)
+    assert transport.limiter is limiter
+
+
+def test_abandoned_iter_many_sends_no_more_requests():
+    symbols = ["S%02d" % i for i in range(40)]
+    with StubServer(latency=0.02) as server:
+        results = client(server).iter_many(symbols, ["sma"], max_workers=2)
+        next(results)
+        results.close()
+        # the requests already running when the iteration stopped finish
+        assert server.requests <= 2 + 2
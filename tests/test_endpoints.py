@@ -0,0 +1,137 @@
+import inspect
+
+import pytest
+
+from client import Client
+from endpoints import endpoints, options, registry
+
+
+required = inspect.Parameter.empty
+
+# The endpoint methods Client had before the registry, with their arguments
+# and defaults and the query their defaults send
+original = {
+    "ts_daily": ([("symbol", required), ("adjusted", True),
+                  ("output_size", "full"), ("data_format", "csv")],
+                 {"function": "TIME_SERIES_DAILY_ADJUSTED",
+                  "outputsize": "full"}),
+    "sma": ([("symbol", required), ("interval", "daily"),
+             ("time_period", 15), ("series_type", "close"),
+             ("data_format", "csv")],
+            {"function": "SMA", "interval": "daily", "time_period": "15",
+             "series_type": "close"}),
+    "ema": ([("symbol", required), ("interval", "daily"),
+             ("time_period", 15), ("series_type", "close"),
+             ("data_format", "csv")],
+            {"function": "EMA", "interval": "daily", "time_period": "15",
+             "series_type": "close"}),
+    "wma": ([("symbol", required), ("interval", "daily"),
+             ("time_period", 15), ("series_type", "close"),
+             ("data_format", "csv")],
+            {"function": "WMA", "interval": "daily", "time_period": "15",
+             "series_type": "close"}),
+    "macd": ([("symbol", required), ("interval", "daily"),
+              ("series_type", "close"), ("data_format", "csv"),
+              ("fast", 12), ("slow", 26), ("signal", 9)],
+             {"function": "MACD", "interval": "daily", "fastperiod": "12",
+              "slowperiod": "26", "signalperiod": "9",
+              "series_type": "close"}),
+    "stoch": ([("symbol", required), ("interval", "daily"),
+               ("data_format", "csv"), ("fastk", 5), ("slowk", 3),
+               ("slowd", 3)],
+              {"function": "STOCH", "interval": "daily",
+               "fastkperiod": "5", "slowkperiod": "3", "slowdperiod": "3"}),
+    "rsi": ([("symbol", required), ("interval", "daily"),
+             ("time_period", 14), ("series_type", "close"),
+             ("data_format", "csv")],
+            {"function": "RSI", "interval": "daily", "time_period": "14",
+             "series_type": "close"}),
+    "momentum": ([("symbol", required), ("interval", "daily"),
+                  ("time_period", 14), ("series_type", "close"),
+                  ("data_format", "csv")],
+                 {"function": "MOM", "interval": "daily",
+                  "time_period": "14", "series_type": "close"}),
+    "ppo": ([("symbol", required), ("interval", "daily"),
+             ("series_type", "close"), ("data_format", "csv"),
+             ("fast", 12), ("slow", 26)],
+            {"function": "PPO", "interval": "daily", "fastperiod": "12",
+             "slowperiod": "26", "series_type": "close"}),
+    "ad": ([("symbol", required), ("interval", "daily"),
+            ("data_format", "csv")],
+           {"function": "AD", "interval": "daily"}),
+    "adx": ([("symbol", required), ("interval", "daily"),
+             ("time_period", 14), ("data_format", "csv")],
+            {"function": "ADX", "interval": "daily", "time_period": "14"}),
+    "cci": ([("symbol", required), ("interval", "daily"),
+             ("time_period", 20), ("data_format", "csv")],
+            {"function": "CCI", "interval": "daily", "time_period": "20"}),
+    "aroon": ([("symbol", required), ("interval", "daily"),
+               ("time_period", 20), ("data_format", "csv")],
+              {"function": "AROON", "interval": "daily",
+               "time_period": "20"}),
+    "aroon_osc": ([("symbol", required), ("interval", "daily"),
+                   ("time_period", 20), ("data_format", "csv")],
+                  {"function": "AROONOSC", "interval": "daily",
+                   "time_period": "20"}),
+    "ultimate_osc": ([("symbol", required), ("interval", "daily"),
+                      ("time_period1", 7), ("time_period2", 14),
+                      ("time_period3", 28), ("data_format", "csv")],
+                     {"function": "ULTOSC", "interval": "daily",
+                      "timeperiod1": "7", "timeperiod2": "14",
+                      "timeperiod3": "28"}),
+    "hilbert_transform_sine": ([("symbol", required), ("interval", "daily"),
+                                ("series_type", "close"),
+                                ("data_format", "csv")],
+                               {"function": "HT_SINE", "interval": "daily",
+                                "series_type": "close"}),
+    "hilbert_transform_trendmode": ([("symbol", required),
+                                     ("interval", "daily"),
+                                     ("series_type", "close"),
+                                     ("data_format", "csv")],
+                                    {"function": "HT_TRENDMODE",
+                                     "interval": "daily",
+                                     "series_type": "close"}),
+    "hilbert_transform_dcperiod": ([("symbol", required),
+                                    ("interval", "daily"),
+                                    ("series_type", "close"),
+                                    ("data_format", "csv")],
+                                   {"function": "HT_DCPERIOD",
+                                    "interval": "daily",
+                                    "series_type": "close"})
+}
+
+
+@pytest.mark.parametrize("method", sorted(original))
+def test_original_signatures_are_kept(method):
+    arguments, _ = original[method]
+    parameters = list(inspect.signature(getattr(Client, method))
+                      .parameters.values())
+    assert parameters[0].name == "self"
+    assert [(p.name, p.default) for p in parameters[1:len(arguments) + 1]] \
+        == arguments
+    assert all(p.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD
+               for p in parameters[:len(arguments) + 1])
+    # anything added since is keyword only
+    assert [p.name for p in parameters[len(arguments) + 1:]] \
+        == [p.name for p in options]
+    assert all(p.kind == inspect.Parameter.KEYWORD_ONLY
+               for p in parameters[len(arguments) + 1:])
+
+
+@pytest.mark.parametrize("method", sorted(original))
+def test_original_queries_are_kept(method):
+    _, query = original[method]
+    expected = dict(query, symbol="IBM", datatype="csv", apikey="key")
+    params, data_format = endpoints[method].build("key", "ibm")
+    assert {k: str(v) for k, v in params.items()} == expected
+    assert data_format == "csv"
+
+
+def test_every_endpoint_has_a_method():
+    names = [endpoint.method for endpoint in registry]
+    assert len(names) == len(set(names))
+    assert set(original) <= set(names)
+    for name in names:
+        method = getattr(Client, name)
+        assert method.__name__ == name
+        assert method.__doc__
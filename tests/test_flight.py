@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import flight
+from flight import AsyncSingleFlight, SingleFlight
+
+
+class Slow(object):
+    def __init__(self, seconds: float=0.2):
+        self.seconds = seconds
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, value):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return value
+
+
+def test_follower_survives_cancelled_leader():
+    flights = AsyncSingleFlight()
+    slow = Slow()
+
+    async def main():
+        leader = asyncio.ensure_future(
+            asyncio.wait_for(flights.do("key", slow, "body"), 0.05))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("key", slow, "body"))
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        assert await follower == "body"
+
+    asyncio.run(main())
+    assert slow.calls == 1 and slow.cancelled == 0
+    assert flights.in_flight() == 0
+
+
+def test_call_cancelled_once_nobody_waits():
+    flights = AsyncSingleFlight()
+    slow = Slow()
+
+    async def main():
+        tasks = [asyncio.ensure_future(flights.do("key", slow, "body"))
+                 for _ in range(3)]
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert slow.calls == 1 and slow.cancelled == 1
+    assert flights.in_flight() == 0
+
+
+def test_async_error_reaches_every_caller():
+    flights = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad")
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", fail)
+                                      for _ in range(3)),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_threads_share_one_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait()
+        return "body"
+
+    results = []
+    threads = [threading.Thread(
+        target=lambda: results.append(flights.do("key", call)))
+        for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while flights.in_flight() == 0 or flights.flights["key"].followers < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["body"] * 4
+    assert calls == [1] and flights.in_flight() == 0
+
+
+def slow_share(monkeypatch):
+    # followers wake up and copy the result late
+    share = flight.share
+
+    def late(result):
+        time.sleep(0.2)
+        return share(result)
+
+    monkeypatch.setattr(flight, "share", late)
+
+
+def test_leader_edits_stay_its_own(monkeypatch):
+    slow_share(monkeypatch)
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def call():
+        release.wait()
+        return pd.DataFrame({"close": [1.0, 2.0]})
+
+    results = {}
+
+    def follow():
+        results["follower"] = flights.do("key", call)
+
+    follower = threading.Thread(target=follow)
+    leader = threading.Thread(target=lambda: results.update(
+        leader=flights.do("key", call)))
+    leader.start()
+    while flights.in_flight() == 0:
+        time.sleep(0.001)
+    follower.start()
+    while flights.flights["key"].followers < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    results["leader"].loc[0, "close"] = 999.0
+    follower.join()
+    assert results["follower"]["close"].tolist() == [1.0, 2.0]
+
+
+def test_async_leader_edits_stay_its_own():
+    flights = AsyncSingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        return pd.DataFrame({"close": [1.0, 2.0]})
+
+    async def lead():
+        data = await flights.do("key", call)
+        data.loc[0, "close"] = 999.0
+        return data
+
+    async def main():
+        return await asyncio.gather(lead(), flights.do("key", call))
+
+    leader, follower = asyncio.run(main())
+    assert leader["close"].tolist() == [999.0, 2.0]
+    assert follower["close"].tolist() == [1.0, 2.0]
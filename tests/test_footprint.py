@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from client import Client
+from footprint import DtypePolicy, footprint
+
+
+def prices(rows: int, volume_scale: int=1) -> pd.DataFrame:
+    index = pd.Index(["2024-01-%02d" % (day + 1) for day in range(rows)],
+                     name="timestamp")
+    close = np.linspace(712345.67, 712400.01, rows)
+    return pd.DataFrame({"open": close, "close": close,
+                         "volume": np.arange(rows, dtype=np.int64)
+                         * volume_scale,
+                         "Chaikin A/D": np.linspace(-3e7, 3e7, rows)},
+                        index=index)
+
+
+def test_apply_narrows_prices_and_volume():
+    data = DtypePolicy().apply(prices(5))
+    assert isinstance(data.index, pd.DatetimeIndex)
+    assert (data["open"].dtype, data["close"].dtype) \
+        == (np.float32, np.float32)
+    assert data["volume"].dtype == np.uint32
+    # indicator values keep full precision
+    assert data["Chaikin A/D"].dtype == np.float64
+    assert data["Chaikin A/D"].equals(prices(5)["Chaikin A/D"]
+                                      .set_axis(data.index))
+
+
+def test_batches_concatenate_to_the_same_dtypes():
+    policy = DtypePolicy()
+    # volumes of the first batch fit in a byte, the second's do not
+    batches = [policy.apply(prices(3)), policy.apply(prices(3, 1 << 20))]
+    assert batches[0].dtypes.equals(batches[1].dtypes)
+    assert pd.concat(batches).dtypes.equals(batches[0].dtypes)
+
+
+def test_integers_out_of_range_raise():
+    with pytest.raises(OverflowError):
+        DtypePolicy().apply(prices(3, 1 << 32))
+    data = DtypePolicy(integers=np.int64).apply(prices(3, 1 << 32))
+    assert data["volume"].dtype == np.int64
+
+
+def test_full_precision_is_opt_out():
+    data = DtypePolicy(floats=None, integers=None).apply(prices(3))
+    assert data.dtypes.equals(prices(3).dtypes)
+
+
+def test_report_counts_bytes_saved():
+    policy = DtypePolicy()
+    assert policy.report() == {"frames": 0, "bytes_before": 0,
+                               "bytes_after": 0, "bytes_saved": 0,
+                               "ratio": 1.0}
+    before = after = 0
+    for rows in (10, 20):
+        data = prices(rows)
+        before += footprint(data)
+        after += footprint(policy.apply(data))
+    report = policy.report()
+    assert (report["frames"], report["bytes_before"], report["bytes_after"]) \
+        == (2, before, after)
+    assert report["bytes_saved"] == before - after > 0
+    assert report["ratio"] == after / before
+
+
+def test_long_panel_labels_are_categories(server):
+    client = Client("key", calls_per_minute=None, coalesce=False,
+                    dtype_policy="compact")
+    client.base_url = server.url
+    panel, errors = client.fetch_many(["IBM", "MSFT"], ["sma", "rsi"],
+                                      layout="long")
+    assert errors == {}
+    for label in ("symbol", "indicator"):
+        assert isinstance(panel[label].dtype, pd.CategoricalDtype)
+    assert set(panel["symbol"].cat.categories) == {"IBM", "MSFT"}
+    assert set(panel["indicator"].cat.categories) == {"sma", "rsi"}
+
+    client.dtype_policy = DtypePolicy(categories=False)
+    panel, _ = client.fetch_many(["IBM"], ["sma"], layout="long")
+    assert not isinstance(panel["symbol"].dtype, pd.CategoricalDtype)
@@ -0,0 +1,65 @@
+import pandas as pd
+
+from benchmarks.stub import sizes, synthetic
+from client import Client
+from history import HistoryStore, merge_history
+
+
+def client(server, tmp_path) -> Client:
+    instance = Client("key", calls_per_minute=None, coalesce=False,
+                      history=HistoryStore(str(tmp_path)))
+    instance.base_url = server.url
+    return instance
+
+
+def outputsizes(server) -> list:
+    return sorted(dict(key).get("outputsize") for key in server.bodies)
+
+
+def test_compact_answer_is_newest_of_full():
+    params = {"function": "TIME_SERIES_DAILY_ADJUSTED", "symbol": "IBM"}
+    full = synthetic(dict(params, outputsize="full"))
+    compact = synthetic(dict(params, outputsize="compact"))
+    pd.testing.assert_frame_equal(compact, full.iloc[:sizes["compact"]])
+
+
+def test_second_sync_fetches_compact(server, tmp_path):
+    first = client(server, tmp_path).ts_daily("IBM",
+                                              output_size="incremental")
+    assert server.requests == 1
+    assert outputsizes(server) == ["full"]
+    assert len(first) == sizes["full"]
+
+    # a later process syncs from the stored history
+    second = client(server, tmp_path).ts_daily("IBM",
+                                               output_size="incremental")
+    assert server.requests == 2
+    assert outputsizes(server) == ["compact", "full"]
+    assert second.index.is_unique
+    assert second.index.is_monotonic_decreasing
+    pd.testing.assert_frame_equal(second, first)
+
+
+def test_merge_extends_and_replaces():
+    params = {"function": "TIME_SERIES_DAILY_ADJUSTED",
+              "outputsize": "full"}
+    full = synthetic(params)
+    # the history was fetched two bars ago, its latest bar since revised
+    history = full.iloc[2:].copy()
+    history.iloc[0, history.columns.get_loc("close")] += 1.0
+    merged = merge_history(history, full.iloc[:sizes["compact"]])
+    pd.testing.assert_frame_equal(merged, full)
+
+
+def test_merge_refuses_restatement_and_dividend():
+    full = synthetic({"function": "TIME_SERIES_DAILY_ADJUSTED",
+                      "outputsize": "full"})
+    restated = full.iloc[:sizes["compact"]].copy()
+    restated["adjusted_close"] *= 0.99
+    assert merge_history(full.iloc[1:], restated) is None
+
+    paid = full.iloc[:sizes["compact"]].copy()
+    paid.iloc[0, paid.columns.get_loc("dividend_amount")] = 0.5
+    assert merge_history(full.iloc[1:], paid) is None
+    # without an overlap nothing can be checked
+    assert merge_history(full.iloc[200:], full.iloc[:100]) is None
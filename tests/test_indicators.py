@@ -0,0 +1,210 @@
+"""Locally computed indicators against published values and golden files
+
+Published worked examples, StockCharts ChartSchool's tables for Wilder's
+RSI and the EMA, pin values computed elsewhere, and warm-up lengths are
+checked against TA-Lib's lookbacks. The golden files hold TA-Lib's output,
+the library Alpha Vantage's indicators follow, for every indicator of
+compute.local_functions over tests/golden/prices.csv. They were written
+with TA-Lib 0.6, which only regenerating them needs:
+
+    PYTHONPATH=. python tests/test_indicators.py
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import compute
+import indicators
+
+
+golden = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+# Parameters of every function and the bars TA-Lib leaves out before its
+# first value
+cases = {
+    "SMA": ({"time_period": 14}, 13),
+    "EMA": ({"time_period": 14}, 13),
+    "WMA": ({"time_period": 14}, 13),
+    "RSI": ({"time_period": 14}, 14),
+    "MOM": ({"time_period": 10}, 10),
+    "MACD": ({"fastperiod": 12, "slowperiod": 26, "signalperiod": 9}, 33),
+    "STOCH": ({"fastkperiod": 5, "slowkperiod": 3, "slowdperiod": 3}, 8),
+    "PPO": ({"fastperiod": 12, "slowperiod": 26}, 25),
+    "AD": ({}, 0),
+    "ADX": ({"time_period": 14}, 27),
+    "CCI": ({"time_period": 20}, 19),
+    "AROON": ({"time_period": 14}, 14),
+    "AROONOSC": ({"time_period": 14}, 14),
+    "ULTOSC": ({"timeperiod1": 7, "timeperiod2": 14, "timeperiod3": 28},
+               28),
+    "HT_SINE": ({}, 63),
+    "HT_TRENDMODE": ({}, 63),
+    "HT_DCPERIOD": ({}, 32)
+}
+
+# ChartSchool's RSI example: closes, oldest first, and 14-day RSI from the
+# 15th close on
+rsi_closes = [
+    44.3389, 44.0902, 44.1497, 43.6124, 44.3278, 44.8264, 45.0955, 45.4245,
+    45.8433, 46.0826, 45.8931, 46.0328, 45.6140, 46.2820, 46.2820, 46.0028,
+    46.0328, 46.4116, 46.2222, 45.6439, 46.2122, 46.2521, 45.7137, 46.4515,
+    45.7835, 45.3548, 44.0288, 44.1783, 44.2181, 44.5672, 43.4205, 42.6628,
+    43.1314
+]
+rsi_published = [
+    70.53, 66.32, 66.55, 69.41, 66.36, 57.97, 62.93, 63.26, 56.06, 62.38,
+    54.71, 50.42, 39.99, 41.46, 41.87, 45.46, 37.30, 33.08, 37.77
+]
+
+# ChartSchool's EMA example: closes, oldest first, and 10-day EMA from the
+# 10th close on, seeded with the SMA of the first 10
+ema_closes = [
+    22.27, 22.19, 22.08, 22.17, 22.18, 22.13, 22.23, 22.43, 22.24, 22.29,
+    22.15, 22.39, 22.38, 22.61, 23.36, 24.05, 23.75, 23.83, 23.95, 23.63,
+    23.82, 23.87, 23.65, 23.19, 23.10, 23.33, 22.68, 23.10, 22.40, 22.17
+]
+ema_published = [
+    22.22, 22.21, 22.24, 22.27, 22.33, 22.52, 22.80, 22.97, 23.13, 23.28,
+    23.34, 23.43, 23.51, 23.53, 23.47, 23.40, 23.39, 23.26, 23.23, 23.08,
+    22.92
+]
+
+
+def make_prices(n: int=300, seed: int=7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    opening = close * (1 + rng.normal(0, 0.003, n))
+    # bars span their open and close
+    data = {
+        "open": opening,
+        "high": np.maximum(opening, close) * (1 + rng.uniform(0, 0.01, n)),
+        "low": np.minimum(opening, close) * (1 - rng.uniform(0, 0.01, n)),
+        "close": close,
+        "volume": rng.integers(100000, 1000000, n)
+    }
+    index = pd.date_range("2020-01-01", periods=n, freq="B", name="time")
+    return pd.DataFrame(data, index=index).round(4).iloc[::-1]
+
+
+def read_prices() -> pd.DataFrame:
+    return pd.read_csv(os.path.join(golden, "prices.csv"),
+                       index_col="time", parse_dates=True)
+
+
+def evaluate(function: str, prices: pd.DataFrame) -> pd.DataFrame:
+    params = dict(cases[function][0], function=function, symbol="GOLD",
+                  interval="daily", series_type="close", apikey="")
+    return compute.evaluate(params, prices)
+
+
+def path(function: str) -> str:
+    return os.path.join(golden, "%s.csv" % function.lower())
+
+
+def test_rsi_matches_published():
+    rsi = indicators.rsi(np.array(rsi_closes), 14)
+    assert np.isnan(rsi[:14]).all()
+    np.testing.assert_allclose(rsi[14:], rsi_published, atol=0.005)
+
+
+def test_ema_matches_published():
+    ema = indicators.ema(np.array(ema_closes), 10)
+    assert np.isnan(ema[:9]).all()
+    np.testing.assert_allclose(ema[9:], ema_published, atol=0.005)
+
+
+def test_prices_are_consistent():
+    prices = read_prices()
+    assert (prices["high"] >= prices[["open", "close"]].max(axis=1)).all()
+    assert (prices["low"] <= prices[["open", "close"]].min(axis=1)).all()
+
+
+def test_cases_cover_local_functions():
+    assert set(cases) == set(compute.local_functions)
+
+
+@pytest.mark.parametrize("function", sorted(cases))
+def test_matches_golden(function):
+    prices = read_prices()
+    data = evaluate(function, prices)
+    expected = pd.read_csv(path(function), index_col="time",
+                           parse_dates=True)
+    assert list(data.columns) == list(expected.columns)
+    assert data.index.equals(expected.index)
+    np.testing.assert_allclose(data.to_numpy(dtype=np.float64),
+                               expected.to_numpy(dtype=np.float64),
+                               rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("function", sorted(cases))
+def test_warm_up(function):
+    prices = read_prices()
+    data = evaluate(function, prices)
+    assert len(prices) - len(data) == cases[function][1]
+    # newest bar first like the API's answers
+    assert data.index[0] == prices.index[0]
+
+
+def test_trend_mode_is_integer():
+    data = evaluate("HT_TRENDMODE", read_prices())
+    assert data["TRENDMODE"].dtype == np.int64
+    assert set(np.unique(data["TRENDMODE"])) <= {0, 1}
+
+
+def talib_outputs(function: str, prices: pd.DataFrame) -> list:
+    # TA-Lib's arrays for a function, oldest bar first, in the order of the
+    # API's columns
+    import talib
+
+    o, h, l, c, v = (prices[name].to_numpy(dtype=np.float64)
+                     for name in ("open", "high", "low", "close", "volume"))
+    params = cases[function][0]
+    if function in ("SMA", "EMA", "WMA", "RSI", "MOM"):
+        return [getattr(talib, function)(c, params["time_period"])]
+    if function == "MACD":
+        return list(talib.MACD(c, params["fastperiod"], params["slowperiod"],
+                               params["signalperiod"]))
+    if function == "STOCH":
+        return list(talib.STOCH(h, l, c, params["fastkperiod"],
+                                params["slowkperiod"], 0,
+                                params["slowdperiod"], 0))
+    if function == "PPO":
+        return [talib.PPO(c, params["fastperiod"], params["slowperiod"], 0)]
+    if function == "AD":
+        return [talib.AD(h, l, c, v)]
+    if function in ("ADX", "CCI"):
+        return [getattr(talib, function)(h, l, c, params["time_period"])]
+    if function == "AROON":
+        return list(talib.AROON(h, l, params["time_period"]))
+    if function == "AROONOSC":
+        return [talib.AROONOSC(h, l, params["time_period"])]
+    if function == "ULTOSC":
+        return [talib.ULTOSC(h, l, c, params["timeperiod1"],
+                             params["timeperiod2"], params["timeperiod3"])]
+    return list(np.atleast_2d(getattr(talib, function)(c)))
+
+
+def reference(function: str, prices: pd.DataFrame) -> pd.DataFrame:
+    oldest = prices.iloc[::-1]
+    columns = compute.local_functions[function][0]
+    data = pd.DataFrame(dict(zip(columns, talib_outputs(function, oldest))),
+                        index=oldest.index)
+    data = data.iloc[cases[function][1]:]
+    if function == "HT_TRENDMODE":
+        data = data.astype(np.int64)
+    return data.iloc[::-1]
+
+
+def write_golden():
+    prices = make_prices()
+    prices.to_csv(os.path.join(golden, "prices.csv"))
+    prices = read_prices()
+    for function in sorted(cases):
+        reference(function, prices).to_csv(path(function),
+                                           float_format="%.17g")
+
+
+if __name__ == "__main__":
+    write_golden()
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+from benchmarks.imports import heavy, lightweight
+
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_after(code: str) -> list:
+    # heavy modules in sys.modules after running code in a fresh interpreter
+    script = ("import sys\n%s\n"
+              "print(','.join(m for m in %r if m in sys.modules))"
+              % (code, heavy))
+    out = subprocess.run([sys.executable, "-c", script], cwd=root,
+                         capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def test_request_path_imports_no_heavy_modules():
+    assert loaded_after("import client, transport, ratelimit") == []
+    assert loaded_after("import %s" % ", ".join(lightweight)) == []
+    # nor does building a client
+    assert loaded_after("import client\n"
+                        "client.Client('key').close()") == []
+
+
+def test_heavy_modules_load_on_first_use():
+    loaded = loaded_after("import client\n"
+                          "client.Client('key').process_csv("
+                          "b'timestamp,close\\r\\n2024-01-02,1.0\\r\\n')")
+    assert {"numpy", "pandas"} <= set(loaded)
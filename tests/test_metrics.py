@@ -0,0 +1,53 @@
+from urllib.request import urlopen
+
+from metrics import Metrics, counters, stages
+
+
+def test_render_exposition_format():
+    metrics = Metrics(buckets=(0.01, 0.1, 1.0))
+    probe = metrics.probe('SMA "x"\\\n')
+    for seconds in (0.005, 0.05, 0.5, 5.0):
+        probe.observe("parse", seconds)
+    probe.count("requests")
+    probe.count("bytes", 1024)
+    lines = metrics.render().splitlines()
+
+    assert lines[:2] == [
+        "# HELP alphavantage_stage_seconds Seconds spent in each request "
+        "stage",
+        "# TYPE alphavantage_stage_seconds histogram"]
+    labels = 'stage="parse",function="SMA \\"x\\"\\\\\\n"'
+    assert lines[2:8] == [
+        'alphavantage_stage_seconds_bucket{%s,le="0.01"} 1' % labels,
+        'alphavantage_stage_seconds_bucket{%s,le="0.1"} 2' % labels,
+        'alphavantage_stage_seconds_bucket{%s,le="1.0"} 3' % labels,
+        'alphavantage_stage_seconds_bucket{%s,le="+Inf"} 4' % labels,
+        "alphavantage_stage_seconds_sum{%s} 5.555" % labels,
+        "alphavantage_stage_seconds_count{%s} 4" % labels]
+    for name in counters:
+        help_line = lines.index("# TYPE alphavantage_%s_total counter"
+                                % name) - 1
+        assert lines[help_line].startswith("# HELP alphavantage_%s_total "
+                                           % name)
+    function = 'function="SMA \\"x\\"\\\\\\n"'
+    assert 'alphavantage_requests_total{%s} 1' % function in lines
+    assert 'alphavantage_bytes_total{%s} 1024' % function in lines
+    # every sample sits on a line of its own
+    assert all(line.startswith(("# ", "alphavantage_")) for line in lines)
+
+
+def test_serve_exposes_render():
+    metrics = Metrics()
+    metrics.probe("RSI").observe(stages[0], 0.2)
+    server = metrics.serve(port=0)
+    try:
+        host, port = server.server_address[:2]
+        with urlopen("http://%s:%d/metrics" % (host, port), timeout=5) as r:
+            assert r.status == 200
+            assert r.headers["Content-Type"].startswith("text/plain")
+            body = r.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert body == metrics.render()
+    assert 'stage="throttle",function="RSI"' in body
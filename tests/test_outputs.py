@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import outputs
+import parsers
+from benchmarks.stub import render_csv, render_json, synthetic
+from client import Client
+
+
+params = {"function": "TIME_SERIES_DAILY_ADJUSTED", "symbol": "IBM",
+          "outputsize": "compact"}
+
+
+def bodies() -> tuple:
+    frame = synthetic(params)
+    return render_csv(frame, params), render_json(frame, params)
+
+
+def formats() -> list:
+    # the formats whose library is installed here
+    installed = ["numpy"]
+    if outputs.pa is not None:
+        installed.append("arrow")
+        if outputs.pl is not None:
+            installed.append("polars")
+    return installed
+
+
+@pytest.mark.parametrize("output", formats())
+def test_parsed_formats_round_trip(output):
+    csv, body = bodies()
+    expected = parsers.read_csv(csv)
+    for data in (parsers.read_csv(csv, output),
+                 parsers.read_json(body, output)):
+        assert not isinstance(data, pd.DataFrame)
+        pd.testing.assert_frame_equal(outputs.to_frame(data), expected)
+
+
+@pytest.mark.parametrize("output", formats())
+def test_frames_round_trip(output):
+    frame = parsers.read_csv(bodies()[0])
+    pd.testing.assert_frame_equal(
+        outputs.to_frame(outputs.from_frame(frame, output)), frame)
+
+
+def test_numpy_arrays_are_read_only():
+    data = parsers.read_csv(bodies()[0], "numpy")
+    assert list(data)[0] == outputs.time_column
+    assert data["volume"].dtype == np.int64
+    for array in data.values():
+        assert not array.flags.writeable
+        with pytest.raises(ValueError):
+            array[0] = array[1]
+
+
+def test_arrow_table_leads_with_time():
+    pa = pytest.importorskip("pyarrow")
+    table = parsers.read_csv(bodies()[0], "arrow")
+    assert isinstance(table, pa.Table)
+    assert table.column_names[0] == outputs.time_column
+    assert table.column("volume").type == pa.int64()
+
+
+def test_client_output(server):
+    client = Client("key", calls_per_minute=None, output="numpy")
+    client.base_url = server.url
+    data = client.ts_daily("IBM", output_size="compact")
+    pandas = Client("key", calls_per_minute=None)
+    pandas.base_url = server.url
+    pd.testing.assert_frame_equal(
+        outputs.to_frame(data),
+        pandas.ts_daily("IBM", output_size="compact"))
@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import parsers
+from benchmarks.stub import render_csv, render_json, synthetic
+
+
+shapes = {
+    "time series": {"function": "TIME_SERIES_DAILY", "symbol": "IBM",
+                    "outputsize": "compact"},
+    "adjusted": {"function": "TIME_SERIES_DAILY_ADJUSTED", "symbol": "IBM",
+                 "outputsize": "compact"},
+    "indicator": {"function": "SMA", "symbol": "IBM", "interval": "daily",
+                  "time_period": "10", "series_type": "close"},
+    "several columns": {"function": "MACD", "symbol": "IBM",
+                        "interval": "daily", "series_type": "close"}
+}
+
+
+def bodies(params: dict, rows: slice=slice(None)) -> tuple:
+    frame = synthetic(params).iloc[rows]
+    return render_csv(frame, params), render_json(frame, params)
+
+
+@pytest.mark.parametrize("shape", sorted(shapes))
+def test_json_matches_csv(shape):
+    csv, body = bodies(shapes[shape])
+    pd.testing.assert_frame_equal(parsers.read_json(body),
+                                  parsers.read_csv(csv))
+
+
+def test_empty_json_series():
+    csv, body = bodies(shapes["indicator"], slice(0))
+    data, expected = parsers.read_json(body), parsers.read_csv(csv)
+    assert len(data) == len(expected) == 0
+    assert data.index.name == expected.index.name
+    assert data.index.dtype == np.dtype("datetime64[ns]")
+
+
+@pytest.mark.parametrize("rows", [slice(None), slice(0)])
+@pytest.mark.parametrize("shape", sorted(shapes))
+def test_pandas_reader_matches_pyarrow(monkeypatch, shape, rows):
+    if parsers.pa is None:
+        pytest.skip("pyarrow is not installed")
+    csv, _ = bodies(shapes[shape], rows)
+    expected = parsers.read_csv(csv)
+    monkeypatch.setattr(parsers, "pa", None)
+    pd.testing.assert_frame_equal(parsers.read_csv(csv), expected)
+
+
+def test_json_without_series():
+    body = json.dumps({"Meta Data": {"1: Symbol": "IBM"}}).encode()
+    with pytest.raises(ValueError):
+        parsers.read_json(body)
+
+    # raised as itself from a generator instead of a RuntimeError
+    def frames():
+        yield parsers.read_json(body)
+
+    with pytest.raises(ValueError):
+        next(frames())
+
+
+def chunked(body: bytes, size: int) -> list:
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n"])
+@pytest.mark.parametrize("batch_size, chunk_size", [(7, 5), (30, 1000),
+                                                    (100, 64), (1000, 333)])
+def test_csv_batches_concatenate_to_whole(newline, batch_size, chunk_size):
+    csv, _ = bodies(shapes["adjusted"])
+    csv = csv.replace(b"\n", newline)
+    whole = parsers.read_csv(csv)
+    # 100 rows: batch sizes leaving a remainder, and one beyond the body
+    reader = parsers.CsvBatches(batch_size)
+    batches = []
+    for chunk in chunked(csv, chunk_size):
+        batches.extend(reader.feed(chunk))
+    batches.extend(reader.close())
+    assert [len(batch) for batch in batches[:-1]] \
+        == [batch_size] * (len(batches) - 1)
+    assert 0 < len(batches[-1]) <= batch_size
+    pd.testing.assert_frame_equal(pd.concat(batches), whole)
+
+
+def test_csv_batches_without_final_newline():
+    csv, _ = bodies(shapes["indicator"], slice(100))
+    csv = csv.replace(b"\n", b"\r\n").rstrip()
+    reader = parsers.CsvBatches(30)
+    batches = reader.feed(csv[:10]) + reader.feed(csv[10:]) + reader.close()
+    assert [len(batch) for batch in batches] == [30, 30, 30, 10]
+    pd.testing.assert_frame_equal(pd.concat(batches), parsers.read_csv(csv))
@@ -0,0 +1,87 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from ratelimit import FileTokenBucket, TokenBucket, shared_bucket
+
+
+def test_reservations_queue_in_arrival_order():
+    bucket = TokenBucket(rate=10.0, capacity=2)
+    delays = [bucket.reserve() for _ in range(5)]
+    # a burst of capacity, then one token every tenth of a second
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[2:] == pytest.approx([0.1, 0.2, 0.3], abs=0.01)
+    stats = bucket.stats()
+    assert (stats["calls"], stats["waits"]) == (5, 3)
+    assert stats["max_wait"] == pytest.approx(0.3, abs=0.01)
+
+
+def test_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=50.0, capacity=2)
+    bucket.reserve(2)
+    time.sleep(0.2)
+    # ten tokens' time passed, but only two are held
+    assert bucket.reserve(2) == 0.0
+    assert bucket.reserve() == pytest.approx(0.02, abs=0.01)
+
+
+def test_acquire_paces_threads():
+    bucket = TokenBucket(rate=40.0)
+    times = []
+
+    def take():
+        for _ in range(5):
+            bucket.acquire()
+            times.append(time.monotonic())
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 20 tokens, the first free: 19 / 40 seconds at least
+    assert max(times) - started >= 19 / 40.0 - 0.01
+
+
+def _take(path: str, count: int, queue):
+    bucket = FileTokenBucket(path, rate=40.0)
+    for _ in range(count):
+        bucket.acquire()
+        queue.put(time.time())
+    bucket.close()
+
+
+def test_processes_share_file_bucket(tmp_path):
+    path = str(tmp_path / "key.bucket")
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    started = time.time()
+    processes = [context.Process(target=_take, args=(path, 10, queue))
+                 for _ in range(2)]
+    for process in processes:
+        process.start()
+    times = sorted(queue.get(timeout=10) for _ in range(20))
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    # one budget for both: 20 tokens at 40 per second, the first free,
+    # where separate budgets would take 9 / 40 seconds
+    assert times[-1] - started >= 19 / 40.0 - 0.01
+    # and no two tokens closer than the rate allows, beyond clock jitter
+    for earlier, later in zip(times, times[5:]):
+        assert later - earlier >= 5 / 40.0 - 0.02
+
+
+def test_shared_bucket_is_per_key(tmp_path):
+    first = shared_bucket("key", 1.0, directory=str(tmp_path))
+    again = shared_bucket("key", 1.0, directory=str(tmp_path))
+    other = shared_bucket("other", 1.0, directory=str(tmp_path))
+    assert first.path == again.path != other.path
+    assert first.reserve() == 0.0
+    assert again.reserve() == pytest.approx(1.0, abs=0.05)
+    assert other.reserve() == 0.0
+    for bucket in (first, again, other):
+        bucket.close()
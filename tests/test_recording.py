@@ -0,0 +1,25 @@
+import zlib
+
+import recording
+from recording import Archive
+
+
+def test_stored_body_is_not_compressed_again(tmp_path, monkeypatch):
+    calls = []
+    original = zlib.compress
+
+    def compress(content: bytes, level: int) -> bytes:
+        calls.append(content)
+        return original(content, level)
+
+    monkeypatch.setattr(recording, "zstandard", None)
+    monkeypatch.setattr(recording.zlib, "compress", compress)
+    archive = Archive(str(tmp_path))
+    body = b"timestamp,SMA\r\n2024-06-28,50.0\r\n"
+    first = archive.put({"function": "SMA", "symbol": "IBM"}, body)
+    # a replayed request and another request answered alike
+    assert archive.put({"function": "SMA", "symbol": "IBM"}, body) == first
+    assert archive.put({"function": "SMA", "symbol": "MSFT"}, body) == first
+    assert calls == [body]
+    assert len(archive) == 2
+    assert archive.read(first) == body
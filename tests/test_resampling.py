@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from resampling import derivable, resample
+from test_indicators import make_prices
+
+
+spec = {"open": "first", "high": "max", "low": "min", "close": "last",
+        "volume": "sum"}
+
+
+def minutes(days: int=3, seed: int=4) -> pd.DataFrame:
+    # extended hours bars with gaps, the last day cut short mid-bucket
+    rng = np.random.default_rng(seed)
+    times = pd.DatetimeIndex([
+        stamp
+        for date in pd.bdate_range("2024-03-06", periods=days)
+        for stamp in pd.date_range(date + pd.Timedelta("04:00:00"),
+                                   date + pd.Timedelta("19:59:00"),
+                                   freq="min")
+    ], name="time")
+    times = times[rng.random(len(times)) < 0.7]
+    times = times[times <= times[-1].normalize() + pd.Timedelta("10:07:00")]
+    n = len(times)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    opening = close * (1 + rng.normal(0, 0.0005, n))
+    data = {
+        "open": opening,
+        "high": np.maximum(opening, close) * (1 + rng.uniform(0, 0.001, n)),
+        "low": np.minimum(opening, close) * (1 - rng.uniform(0, 0.001, n)),
+        "close": close,
+        "volume": rng.integers(100, 10000, n)
+    }
+    return pd.DataFrame(data, index=times).iloc[::-1]
+
+
+def reference(prices: pd.DataFrame, rule: str, **kwargs) -> pd.DataFrame:
+    # oldest first, without the buckets holding no bar
+    expected = prices.sort_index().resample(rule, **kwargs).agg(spec)
+    expected = expected.dropna(subset=["close"])
+    expected.index = expected.index.as_unit("ns")
+    return expected
+
+
+def periods(prices: pd.DataFrame, rule: str) -> pd.DataFrame:
+    # weekly and monthly bars are labelled by their last trading day
+    expected = reference(prices, rule)
+    last = prices.index.to_series().sort_index().resample(rule).max()
+    expected.index = pd.DatetimeIndex(last.dropna().to_numpy(),
+                                      name=prices.index.name).as_unit("ns")
+    return expected
+
+
+@pytest.mark.parametrize("interval, rule", [("weekly", "W-SUN"),
+                                            ("monthly", "MS")])
+def test_periods_match_pandas(interval, rule):
+    prices = make_prices()
+    # the series ends on a Tuesday, in the middle of a week and a month
+    assert prices.index[0].dayofweek == 1
+    data = resample(prices, interval)
+    expected = periods(prices, rule)
+    pd.testing.assert_frame_equal(data, expected.iloc[::-1],
+                                  check_freq=False)
+
+
+@pytest.mark.parametrize("interval, anchor, offset", [
+    ("5min", "00:00", None),
+    ("15min", "00:00", None),
+    ("60min", "00:00", None),
+    ("60min", "09:30", "30min"),
+    ("30min", "09:30", None)
+])
+def test_intraday_matches_pandas(interval, anchor, offset):
+    prices = minutes()
+    data = resample(prices, interval, anchor=anchor)
+    expected = reference(prices, interval, offset=offset)
+    pd.testing.assert_frame_equal(data, expected.iloc[::-1],
+                                  check_freq=False)
+    # the trailing bucket holds the bars up to 10:07 only
+    trailing = prices[prices.index >= data.index[0]]
+    assert data["close"].iloc[0] == prices["close"].iloc[0]
+    assert data["volume"].iloc[0] == trailing["volume"].sum()
+
+
+def test_daily_from_intraday_keeps_session():
+    prices = minutes()
+    data = resample(prices, "daily")
+    clock = prices.index - prices.index.normalize()
+    session = prices[(clock >= pd.Timedelta("09:30:00"))
+                     & (clock < pd.Timedelta("16:00:00"))]
+    expected = reference(session, "D")
+    pd.testing.assert_frame_equal(data, expected.iloc[::-1],
+                                  check_freq=False)
+
+    extended = reference(prices, "D")
+    pd.testing.assert_frame_equal(resample(prices, "daily", session=None),
+                                  extended.iloc[::-1], check_freq=False)
+
+
+@pytest.mark.parametrize("source, target, expected", [
+    ("5min", "15min", True), ("15min", "5min", False),
+    ("15min", "60min", True), ("1min", "daily", True),
+    ("60min", "monthly", True), ("daily", "weekly", True),
+    ("daily", "monthly", True), ("weekly", "weekly", True),
+    ("weekly", "monthly", False), ("monthly", "weekly", False),
+    ("daily", "60min", False)])
+def test_derivable(source, target, expected):
+    assert derivable(source, target) is expected
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from client import Client
+from scheduler import Scheduler, priorities, priority
+
+
+def drained(calls_per_minute: float=600) -> Scheduler:
+    scheduler = Scheduler(calls_per_minute=calls_per_minute)
+    scheduler.acquire()
+    return scheduler
+
+
+def test_cancelled_async_waiter_leaves_queue():
+    scheduler = drained()
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.acquire_async(), 0.01)
+        assert scheduler.depths() == {}
+        # the next waiter is served instead of queueing behind the
+        # cancelled one forever
+        await asyncio.wait_for(scheduler.acquire_async(), 1.0)
+
+    asyncio.run(main())
+    assert scheduler.depths() == {}
+
+
+def test_cancelled_gather_leaves_queue():
+    scheduler = drained()
+
+    async def main():
+        tasks = [asyncio.ensure_future(scheduler.acquire_async())
+                 for _ in range(3)]
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert scheduler.depths() == {}
+        await asyncio.wait_for(scheduler.acquire_async(), 1.0)
+
+    asyncio.run(main())
+
+
+def test_interrupted_sync_waiter_leaves_queue():
+    scheduler = drained()
+    wait = scheduler.cond.wait
+
+    def interrupted(timeout=None):
+        scheduler.cond.wait = wait
+        raise KeyboardInterrupt
+
+    scheduler.cond.wait = interrupted
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.acquire()
+    assert scheduler.depths() == {}
+
+    # a waiter blocked without a timeout behind a lower priority is woken
+    # and served
+    served = threading.Event()
+
+    def backfill():
+        with priority("backfill"):
+            scheduler.acquire()
+        served.set()
+
+    thread = threading.Thread(target=backfill)
+    thread.start()
+    assert served.wait(1.0)
+    thread.join()
+
+
+def test_priority_order():
+    scheduler = drained(calls_per_minute=1200)
+    order = []
+
+    def request(level):
+        with priority(level):
+            scheduler.acquire()
+        order.append(level)
+
+    threads = [threading.Thread(target=request, args=(level,))
+               for level in ("backfill", "normal", "interactive")]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+    assert order == ["interactive", "normal", "backfill"]
+
+
+def test_priority_follows_fetch_many(server):
+    scheduler = Scheduler(calls_per_minute=6000, capacity=10)
+    client = Client("key", rate_limiter=scheduler)
+    client.base_url = server.url
+    with priority("backfill"):
+        _, errors = client.fetch_many(["IBM", "MSFT"], ["sma", "rsi"])
+    assert errors == {}
+    assert scheduler.served == {priorities["backfill"]: 4}
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+from endpoints import endpoints
+from screening import ScreenIndex
+from store import ColumnStore
+
+
+fields = {
+    "rsi": ("rsi", {"interval": "daily", "time_period": 14,
+                    "series_type": "close"}),
+    "hist": ("macd", {"interval": "daily", "series_type": "close"},
+             "MACD_Hist")
+}
+
+
+def params(field: str, symbol: str) -> dict:
+    method, kwargs = fields[field][:2]
+    return endpoints[method].build("", symbol, **kwargs)[0]
+
+
+def bars(field: str, value: float, day: int) -> pd.DataFrame:
+    # the latest bar last, after an older one that must not count
+    index = pd.DatetimeIndex(pd.to_datetime(["2024-01-01", "2024-01-01"])
+                             + pd.to_timedelta([day - 1, day], "D"),
+                             name="time")
+    if field == "rsi":
+        return pd.DataFrame({"RSI": [-1.0, value]}, index=index)
+    return pd.DataFrame({"MACD": [0.0, 0.0], "MACD_Hist": [-1.0, value],
+                         "MACD_Signal": [0.0, 0.0]}, index=index)
+
+
+def values(rng, symbols: list) -> pd.DataFrame:
+    # few distinct values, so ties are common, and a few NaN
+    data = rng.integers(0, 20, (len(symbols), len(fields))).astype(float)
+    data[rng.random(data.shape) < 0.1] = np.nan
+    return pd.DataFrame(data, index=symbols, columns=list(fields))
+
+
+def observed(seed: int=5, symbols: int=60, rounds: int=3) -> tuple:
+    rng = np.random.default_rng(seed)
+    universe = ["S%02d" % i for i in range(symbols)]
+    index = ScreenIndex(fields, capacity=8)
+    for day in range(1, rounds + 1):
+        latest = values(rng, universe)
+        for symbol in rng.permutation(universe):
+            for field in fields:
+                index.observe(params(field, symbol),
+                              bars(field, latest.loc[symbol, field], day))
+    return index, latest
+
+
+def brute_between(latest: pd.DataFrame, field: str, low,
+                  high) -> pd.Series:
+    column = latest[field].dropna()
+    if low is not None:
+        column = column[column >= low]
+    if high is not None:
+        column = column[column < high]
+    return column
+
+
+def test_between_and_top_match_brute_force():
+    index, latest = observed()
+    assert len(index) == len(latest)
+    for field in fields:
+        for low, high in [(None, None), (5, 12), (None, 7), (13, None),
+                          (7, 7), (4.5, 9.5)]:
+            found = index.between(field, low, high)
+            expected = brute_between(latest, field, low, high)
+            assert sorted(found) == sorted(expected.index)
+            assert [latest.loc[s, field] for s in found] == \
+                sorted(expected)
+        ranked = latest[field].dropna().sort_values()
+        for k in (1, 7, len(latest) + 5):
+            top = index.top(field, k)
+            assert [latest.loc[s, field] for s in top] == \
+                ranked.iloc[::-1][:k].tolist()
+            bottom = index.top(field, k, largest=False)
+            assert [latest.loc[s, field] for s in bottom] == \
+                ranked[:k].tolist()
+
+
+def test_screen_matches_brute_force():
+    index, latest = observed()
+    conditions = {"rsi": (3, 15), "hist": (None, 10)}
+    expected = latest[(latest["rsi"] >= 3) & (latest["rsi"] < 15)
+                      & (latest["hist"] < 10)]
+    assert sorted(index.screen(conditions)) == sorted(expected.index)
+    # every bar observed is from the last round
+    assert index.screen(conditions, since="2024-01-05") == []
+    assert sorted(index.screen(conditions, since="2024-01-04")) == \
+        sorted(expected.index)
+
+
+def test_observe_keeps_fields_sorted():
+    index, latest = observed(seed=11, rounds=4)
+    frame = index.frame()
+    pd.testing.assert_frame_equal(
+        frame, latest.loc[frame.index].rename_axis("symbol"))
+    for position in range(len(fields)):
+        incremental = (index.sorted[position], index.order[position])
+        index._sort(position)
+        np.testing.assert_array_equal(incremental[0], index.sorted[position])
+        np.testing.assert_array_equal(
+            index.values[incremental[1], position], incremental[0])
+        assert sorted(incremental[1]) == sorted(index.order[position])
+
+
+def test_older_bar_never_replaces_newer():
+    index = ScreenIndex(fields)
+    index.observe(params("rsi", "IBM"), bars("rsi", 40.0, 5))
+    index.observe(params("rsi", "IBM"), bars("rsi", 10.0, 2))
+    assert index.between("rsi", None, 30) == []
+    assert index.between("rsi", 30, None) == ["IBM"]
+
+
+def test_load_from_store(tmp_path):
+    rng = np.random.default_rng(2)
+    universe = ["S%02d" % i for i in range(20)]
+    latest = values(rng, universe)
+    store = ColumnStore(str(tmp_path))
+    for symbol in universe[:-1]:
+        for field in fields:
+            store.save(params(field, symbol),
+                       bars(field, latest.loc[symbol, field], 3))
+
+    index = ScreenIndex(fields)
+    index.load(store, universe)
+    frame = index.frame()
+    assert list(frame.index) == universe
+    # the last symbol was never stored
+    assert frame.loc[universe[-1]].isna().all()
+    pd.testing.assert_frame_equal(frame.iloc[:-1],
+                                  latest.iloc[:-1].rename_axis("symbol"))
+
+    incremental = ScreenIndex(fields)
+    for symbol in universe[:-1]:
+        for field in fields:
+            incremental.observe(params(field, symbol),
+                                bars(field, latest.loc[symbol, field], 3))
+    for field in fields:
+        for low, high in [(None, None), (2, 11)]:
+            assert index.between(field, low, high) == \
+                incremental.between(field, low, high)
+    conditions = {"rsi": (5, None), "hist": (None, 15)}
+    assert index.screen(conditions) == sorted(
+        incremental.screen(conditions), key=universe.index)
@@ -0,0 +1,129 @@
+import json
+import multiprocessing
+import threading
+
+import numpy as np
+import pandas as pd
+
+from client import Client
+from store import ColumnStore
+
+
+params = {"function": "SMA", "symbol": "IBM", "interval": "daily",
+          "time_period": 15, "series_type": "close", "apikey": "key"}
+
+
+def bars(start: int, count: int) -> pd.DataFrame:
+    index = pd.DatetimeIndex(
+        pd.Timestamp("2020-01-01") + pd.to_timedelta(
+            np.arange(start, start + count), "D"), name="time").as_unit("ns")
+    return pd.DataFrame({"SMA": np.arange(start, start + count, dtype=float)},
+                        index=index)
+
+
+def version(tmp_path) -> str:
+    meta = next((tmp_path / "SMA").glob("*/meta.json"))
+    return json.loads(meta.read_text())["version"]
+
+
+def test_load_slices_a_date_range(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    assert store.load(params) is None
+    store.save(params, bars(0, 30).iloc[::-1])
+    whole = store.load(params)
+    pd.testing.assert_frame_equal(whole, bars(0, 30).iloc[::-1])
+
+    data = store.load(params, "2020-01-05", "2020-01-10")
+    # both ends included, newest bar first
+    assert data["SMA"].tolist() == [9.0, 8.0, 7.0, 6.0, 5.0, 4.0]
+    pd.testing.assert_frame_equal(data, whole.iloc[20:26])
+    assert store.load(params, start="2020-01-28")["SMA"].tolist() \
+        == [29.0, 28.0, 27.0]
+    assert store.load(params, end="2020-01-02")["SMA"].tolist() == [1.0, 0.0]
+    # bounds between bars and ranges outside the series
+    assert store.load(params, "2020-01-04 12:00", "2020-01-06 12:00")[
+        "SMA"].tolist() == [5.0, 4.0]
+    assert len(store.load(params, "2021-01-01")) == 0
+    assert len(store.load(params, "2020-01-10", "2020-01-05")) == 0
+
+
+def test_save_merges_overlapping_dates(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    store.save(params, bars(0, 10))
+    restated = bars(5, 10)
+    restated["SMA"] += 100
+    store.save(params, restated)
+    data = store.load(params).iloc[::-1]
+    assert len(data) == 15
+    # fetched rows replace stored ones at the same time
+    assert data["SMA"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0] + [
+        float(i) for i in range(105, 115)]
+
+    # a frame adding nothing writes nothing
+    written = version(tmp_path)
+    store.save(params, restated.iloc[2:5])
+    assert version(tmp_path) == written
+
+    # a frame with other columns replaces the series
+    store.save(params, bars(20, 3).rename(columns={"SMA": "other"}))
+    data = store.load(params)
+    assert list(data.columns) == ["other"] and len(data) == 3
+
+
+def test_client_reads_stored_range(server, tmp_path):
+    client = Client("key", calls_per_minute=None, coalesce=False,
+                    store=ColumnStore(str(tmp_path)))
+    client.base_url = server.url
+    assert client.stored("sma", "IBM", time_period=10) is None
+    fetched = client.sma("IBM", time_period=10)
+    start, end = fetched.index[40], fetched.index[20]
+    data = client.stored("sma", "ibm", time_period=10, start=start, end=end)
+    pd.testing.assert_frame_equal(data, fetched.iloc[20:41],
+                                  check_freq=False)
+    # other parameters are another series
+    assert client.stored("sma", "IBM", time_period=20) is None
+
+
+def test_readers_never_miss_files_during_writes(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    store.save(params, bars(0, 10))
+    errors = []
+    done = threading.Event()
+
+    def read():
+        reader = ColumnStore(str(tmp_path))
+        while not done.is_set():
+            try:
+                assert len(reader.load(params)) >= 10
+            except Exception as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    for i in range(400):
+        store.save(params, bars(i, 10 + i % 3))
+    done.set()
+    thread.join()
+    assert errors == []
+    # only the current and the replaced version stay on disk
+    files = list((tmp_path / "SMA").glob("*/*.npy"))
+    assert len({f.name.split("-")[0] for f in files}) == 2
+
+
+def _write(directory: str, start: int):
+    store = ColumnStore(directory)
+    for i in range(start, start + 40):
+        store.save(params, bars(i, 1))
+
+
+def test_processes_share_a_series(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_write, args=(str(tmp_path), start))
+                 for start in (0, 1000, 2000)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    # no merge lost another process's rows
+    assert len(ColumnStore(str(tmp_path)).load(params)) == 120
@@ -0,0 +1,75 @@
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+import indicators
+import streaming
+from test_indicators import make_prices
+
+
+# a new streaming indicator, and the matching batch function
+cases = {
+    "SMA": (lambda: streaming.SMA(14), lambda x: indicators.sma(x, 14)),
+    "EMA": (lambda: streaming.EMA(14), lambda x: indicators.ema(x, 14)),
+    "RSI": (lambda: streaming.RSI(14), lambda x: indicators.rsi(x, 14)),
+    "MACD": (lambda: streaming.MACD(12, 26, 9),
+             lambda x: indicators.macd(x, 12, 26, 9)),
+    "STOCH": (lambda: streaming.STOCH(5, 3, 3),
+              lambda high, low, close: indicators.stoch(high, low, close,
+                                                        5, 3, 3))
+}
+
+
+def prices():
+    # oldest bar first, like a live feed
+    return make_prices().sort_index()
+
+
+def batch(name: str, data) -> np.ndarray:
+    indicator, function = cases[name]
+    inputs = [data[column].to_numpy(dtype=np.float64)
+              for column in indicator().inputs]
+    result = function(*inputs)
+    if isinstance(result, tuple):
+        return np.column_stack(result)
+    return result[:, None]
+
+
+def stream(indicator, data) -> np.ndarray:
+    rows = [indicator.add(bar) for _, bar in data.iterrows()]
+    return np.array([row if isinstance(row, tuple) else (row,)
+                     for row in rows])
+
+
+@pytest.mark.parametrize("name", sorted(cases))
+def test_updates_match_batch(name):
+    data = prices()
+    np.testing.assert_allclose(stream(cases[name][0](), data),
+                               batch(name, data),
+                               rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("name", sorted(cases))
+def test_seed_then_update_matches_batch(name):
+    data = prices()
+    indicator = cases[name][0]().seed(data.iloc[:200])
+    np.testing.assert_allclose(stream(indicator, data.iloc[200:]),
+                               batch(name, data)[200:],
+                               rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("name", sorted(cases))
+@pytest.mark.parametrize("at", [3, 40, 150])
+def test_restored_checkpoint_carries_on(name, at):
+    data = prices()
+    original = cases[name][0]().seed(data.iloc[:at])
+    # a checkpoint survives JSON, as it would in a file
+    state = json.loads(json.dumps(original.checkpoint()))
+    restored = type(original).restore(state)
+    unpickled = pickle.loads(pickle.dumps(original))
+    rest = data.iloc[at:]
+    expected = stream(original, rest)
+    np.testing.assert_array_equal(stream(restored, rest), expected)
+    np.testing.assert_array_equal(stream(unpickled, rest), expected)
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+import indicators
+import sweep
+
+
+periods = [1, 2, 5, 14]
+
+
+def panel(seed: int=3) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    x = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (4, 80)), axis=1))
+    # symbols listed later than the first, and a gap in the last
+    x[1, :10] = np.nan
+    x[2, :45] = np.nan
+    x[3, 30] = np.nan
+    return x
+
+
+def extreme(reduce):
+    def function(row: np.ndarray, period: int) -> np.ndarray:
+        # NaN wherever the window holds one, like the other kernels
+        out = np.full(len(row), np.nan)
+        if period <= len(row):
+            out[period - 1:] = reduce(sliding_window_view(row, period),
+                                      axis=1)
+        return out
+    return function
+
+
+references = {name: getattr(indicators, name)
+              for name in ("sma", "wma", "ema", "rsi", "mom")}
+references["rolling_max"] = extreme(np.max)
+references["rolling_min"] = extreme(np.min)
+
+
+def expected(function, row: np.ndarray, period: int) -> np.ndarray:
+    # the indicators module applied from the row's first price
+    start = int(np.argmax(~np.isnan(row)))
+    out = np.full(len(row), np.nan)
+    out[start:] = function(row[start:], period)
+    return out
+
+
+@pytest.mark.parametrize("name", sorted(references))
+def test_matches_indicators_on_padded_rows(name):
+    x = panel()
+    result = getattr(sweep, name)(x, periods)
+    for row in range(x.shape[0]):
+        for i, period in enumerate(periods):
+            np.testing.assert_allclose(
+                result[row, i],
+                expected(references[name], x[row], period),
+                rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_windows_recover_after_a_gap():
+    x = panel()
+    result = sweep.sma(x, [5])[3, 0]
+    assert np.isnan(result[30:35]).all()
+    assert not np.isnan(result[35:]).any()
+
+
+def test_extremes_skip_windows_with_holes():
+    x = [[np.nan, np.nan, 1, 2, 3]]
+    np.testing.assert_array_equal(sweep.rolling_max(x, [3])[0, 0],
+                                  [np.nan, np.nan, np.nan, np.nan, 3])
+    np.testing.assert_array_equal(sweep.rolling_min(x, [3])[0, 0],
+                                  [np.nan, np.nan, np.nan, np.nan, 1])
+
+
+@pytest.mark.parametrize("name", ["sma", "rsi", "rolling_max"])
+def test_parallel_matches_serial(name):
+    kernel = getattr(sweep, name)
+    x = np.concatenate([panel(seed) for seed in range(3)])
+    # uneven chunks, the last holding a single symbol
+    result = sweep.parallel(kernel, x, periods, processes=2, chunk_size=5)
+    np.testing.assert_array_equal(result, kernel(x, periods))
+    # a single chunk runs in process
+    np.testing.assert_array_equal(
+        sweep.parallel(kernel, x[:2], periods, processes=2, chunk_size=2),
+        kernel(x[:2], periods))
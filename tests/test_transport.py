@@ -0,0 +1,192 @@
+import asyncio
+import json
+import time
+
+import pytest
+import requests
+
+from async_client import AsyncTransport
+from benchmarks.stub import StubServer
+from client import Client
+from metrics import Metrics
+from transport import APIError, ThrottleError, Transport, check_notice
+
+
+params = {"function": "SMA", "symbol": "IBM", "interval": "daily",
+          "time_period": "10", "series_type": "close", "apikey": "key"}
+
+
+class BrokenServer(StubServer):
+    """StubServer breaking the body of its first answer
+
+    "split" sends a throttle note in two chunks of a chunked body, apart
+    in time; "truncated" closes the connection before the promised
+    Content-Length.
+    """
+
+    def __init__(self, breakage: str, note: bytes=None, **kwargs):
+        self.breakage = breakage
+        self.note = note or json.dumps({"Note": "Thank you for using "
+                                                "Alpha Vantage!"}).encode()
+        self.broken = 0
+        super(BrokenServer, self).__init__(**kwargs)
+
+    def _handler(self):
+        stub = self
+        Handler = super(BrokenServer, self)._handler()
+
+        class BrokenHandler(Handler):
+            def do_GET(self):
+                with stub.lock:
+                    stub.broken += 1
+                    first = stub.broken == 1
+                if not first:
+                    return super(BrokenHandler, self).do_GET()
+                self.send_response(200)
+                if stub.breakage == "split":
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for piece in (stub.note[:20], stub.note[20:]):
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+                        self.wfile.flush()
+                        time.sleep(0.05)
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    body = b"timestamp,open,high,low,close,volume\r\n"
+                    self.send_header("Content-Length", str(len(body) + 100))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    self.close_connection = True
+
+        return BrokenHandler
+
+
+def transport(**kwargs) -> Transport:
+    kwargs.setdefault("backoff", 0.001)
+    return Transport(**kwargs)
+
+
+def test_server_errors_are_retried():
+    metrics = Metrics()
+    with StubServer(fail_every=2) as server:
+        get = transport().get
+        first = get(server.url, params, metrics.probe("SMA"))
+        # the second request fails with 503 and is sent again
+        assert get(server.url, params, metrics.probe("SMA")) == first
+        assert (server.requests, server.failed) == (3, 1)
+    counts = metrics.summary()["SMA"]
+    assert (counts["requests"], counts["attempts"], counts["retries"]) \
+        == (2, 3, 1)
+
+
+def test_client_errors_are_not_retried():
+    with StubServer(fail_every=1, fail_status=404) as server:
+        with pytest.raises(requests.HTTPError) as caught:
+            transport().get(server.url, params)
+        assert caught.value.response.status_code == 404
+        assert server.requests == 1
+
+
+def test_throttle_notes_are_retried():
+    with StubServer(throttle_every=2) as server:
+        client = Client("key", calls_per_minute=None, coalesce=False,
+                        transport=transport())
+        client.base_url = server.url
+        for symbol in ("IBM", "MSFT", "AAPL"):
+            assert len(client.sma(symbol)) > 0
+        assert (server.requests, server.throttled) == (5, 2)
+
+
+def test_attempts_run_out():
+    with StubServer(throttle_every=1) as server:
+        with pytest.raises(ThrottleError):
+            transport(max_attempts=3).get(server.url, params)
+        assert server.requests == 3
+    with StubServer(fail_every=1) as server:
+        with pytest.raises(requests.HTTPError):
+            transport(max_attempts=2).get(server.url, params)
+        assert server.requests == 2
+
+
+def test_streamed_requests_are_retried():
+    with StubServer(throttle_every=2, fail_every=3) as server:
+        get = transport().get
+        whole = get(server.url, params)
+        # throttle notes and a 503 before the body
+        chunks = transport(max_attempts=4).chunks(server.url, params,
+                                                  chunk_size=1 << 12)
+        assert b"".join(chunks) == whole
+        assert (server.requests, server.throttled, server.failed) \
+            == (5, 2, 1)
+
+
+def test_truncated_bodies_are_retried():
+    with StubServer() as server:
+        whole = transport().get(server.url, params)
+    with BrokenServer("truncated") as server:
+        assert transport(max_attempts=3).get(server.url, params) == whole
+        assert server.broken == 2
+
+
+def test_truncated_bodies_are_retried_async():
+    with StubServer() as server:
+        whole = transport().get(server.url, params)
+
+    async def main(url):
+        retrying = AsyncTransport(max_attempts=3, backoff=0.001)
+        try:
+            return await retrying.get(url, params)
+        finally:
+            await retrying.close()
+
+    with BrokenServer("truncated") as server:
+        assert asyncio.run(main(server.url)) == whole
+        assert server.broken == 2
+
+
+@pytest.mark.parametrize("note", [
+    json.dumps({"Note": "Thank you for using Alpha Vantage!"}),
+    json.dumps({"Information": "Thank you for using Alpha Vantage!"},
+               indent=4)])
+def test_split_notices_are_retried_when_streamed(note):
+    with StubServer() as server:
+        whole = transport().get(server.url, params)
+    with BrokenServer("split", note.encode()) as server:
+        chunks = transport().chunks(server.url, params, chunk_size=1 << 12)
+        assert b"".join(chunks) == whole
+        assert server.broken == 2
+
+    async def main(url):
+        streaming = AsyncTransport(backoff=0.001)
+        try:
+            chunks = streaming.chunks(url, params, chunk_size=1 << 12)
+            return b"".join([chunk async for chunk in chunks])
+        finally:
+            await streaming.close()
+
+    with BrokenServer("split", note.encode()) as server:
+        assert asyncio.run(main(server.url)) == whole
+        assert server.broken == 2
+
+
+def test_notices():
+    with pytest.raises(ThrottleError):
+        check_notice(b'{"Note": "Thank you for using Alpha Vantage!"}')
+    with pytest.raises(ThrottleError):
+        check_notice(b' {"Information": "premium endpoint"}')
+    with pytest.raises(APIError):
+        check_notice(b'{"Error Message": "Invalid API call."}')
+    check_notice(b"timestamp,open\r\n")
+    check_notice(b'{"Meta Data": {}}')
+    # real payloads are not inspected
+    check_notice(b'{"Note": "%s"}' % (b"x" * 5000))
+
+
+def test_backoff_is_capped_with_full_jitter():
+    instance = Transport(backoff=1.0, max_backoff=5.0)
+    for attempt, ceiling in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0),
+                             (10, 5.0)]:
+        delays = [instance.delay(attempt) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= ceiling
+        assert max(delays) > ceiling / 2
@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+
+from client import Client
+from store import ColumnStore
+from workers import JobQueue, KeyBudget, QuotaExhausted, Worker
+
+
+def worker(server, queue, tmp_path, **kwargs) -> Worker:
+    client = Client("key", calls_per_minute=None, coalesce=False,
+                    store=ColumnStore(str(tmp_path / "series")), **kwargs)
+    client.base_url = server.url
+    return Worker(queue, client)
+
+
+def state(queue, job) -> tuple:
+    return queue.db.execute("SELECT state, worker, attempts, not_before "
+                            "FROM jobs WHERE id = ?", (job.id,)).fetchone()
+
+
+def test_late_outcome_of_expired_lease_is_dropped(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"), lease=0.05)
+    queue.submit("sma", "IBM")
+    late = queue.claim("a")
+    time.sleep(0.1)
+    owner = queue.claim("b")
+    assert owner.id == late.id
+
+    assert not queue.complete(late)
+    assert not queue.fail(late, RuntimeError("late"), retry=False)
+    assert state(queue, owner)[:2] == ("running", "b")
+    assert queue.complete(owner)
+    assert state(queue, owner)[0] == "done"
+
+
+def test_worker_counts_lost_jobs(server, tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    queue.submit("sma", "IBM")
+    instance = worker(server, queue, tmp_path)
+    call = instance.client.call
+
+    def slow(*args, **kwargs):
+        # another worker takes the job over while the call runs
+        queue.db.execute("UPDATE jobs SET worker = 'other'")
+        return call(*args, **kwargs)
+
+    instance.client.call = slow
+    assert instance.step()
+    assert (instance.done, instance.lost) == (0, 1)
+    assert queue.db.execute("SELECT state, worker FROM jobs").fetchone() \
+        == ("running", "other")
+
+
+def test_spent_daily_quota_releases_job(server, tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    queue.submit("sma", "IBM")
+    queue.submit("sma", "MSFT")
+    budget = KeyBudget(queue, "key", 6000, calls_per_day=1, capacity=5)
+    instance = worker(server, queue, tmp_path, rate_limiter=budget)
+
+    assert instance.step()
+    assert instance.done == 1
+    started = time.time()
+    assert instance.step()
+    assert time.time() - started < 1.0
+    assert server.requests == 1
+
+    reset = time.time() - time.time() % 86400 + 86400
+    assert instance.paused_until == pytest.approx(reset, abs=1.0)
+    released = queue.db.execute("SELECT state, attempts, not_before, error "
+                                "FROM jobs WHERE state != 'done'").fetchone()
+    assert released[:2] == ("pending", 0)
+    assert released[2] == instance.paused_until
+    assert "QuotaExhausted" in released[3]
+    assert queue.claim("other") is None
+
+    # the worker stops instead of sleeping until the quota is renewed
+    assert instance.run(idle_timeout=1.0)["done"] == 1
+    with pytest.raises(QuotaExhausted):
+        budget.acquire()
+
+
+def test_run_completes_jobs(server, tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    assert queue.plan(["IBM", "MSFT"], ["sma", "rsi"]) == 4
+    stats = worker(server, queue, tmp_path).run(idle_timeout=1.0)
+    assert (stats["done"], stats["failed"], stats["lost"]) == (4, 0, 0)
+    assert server.requests == 4
+    assert os.path.exists(str(tmp_path / "series"))
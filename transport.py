@@ -0,0 +1,298 @@
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from metrics import null_probe
+
+
+# Alpha Vantage answers quota violations with HTTP 200 and a small JSON body
+# carrying one of these keys instead of the requested data.
+throttle_keys = {"Note", "Information"}
+error_keys = {"Error Message"}
+retry_statuses = {429, 500, 502, 503, 504}
+
+# Largest body inspected for a throttle or error notice. Notices are a few
+# hundred bytes, so real payloads are never decoded twice.
+notice_max_size = 4096
+
+
+class ThrottleError(requests.RequestException):
+    """Alpha Vantage rejected the request because of its quota
+    """
+
+
+class APIError(requests.RequestException):
+    """Alpha Vantage rejected the request as invalid
+    """
+
+
+def check_notice(content: bytes):
+    """Raises if the response body is an Alpha Vantage notice
+
+    Args:
+        content: Bytes, body of the response returned by the API
+    """
+    if len(content) > notice_max_size or not content.lstrip().startswith(b"{"):
+        return
+    try:
+        body = json.loads(content)
+    except ValueError:
+        return
+    if not isinstance(body, dict):
+        return
+    for key in throttle_keys & body.keys():
+        raise ThrottleError(body[key])
+    for key in error_keys & body.keys():
+        raise APIError(body[key])
+
+
+# Seconds the current thread spent opening connections during its request
+_connects = threading.local()
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super(TimedHTTPConnection, self).connect()
+        _connects.seconds = (getattr(_connects, "seconds", 0.0)
+                             + time.perf_counter() - start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super(TimedHTTPSConnection, self).connect()
+        _connects.seconds = (getattr(_connects, "seconds", 0.0)
+                             + time.perf_counter() - start)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """Adapter whose connections time how long they took to open
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimedAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool
+        }
+
+
+class Transport(object):
+    """Pooled HTTP transport with retries for the Alpha Vantage API
+    """
+
+    def __init__(self,
+                 max_attempts: int=3,
+                 pool_size: int=10,
+                 timeout: tuple=(3.05, 30),
+                 backoff: float=1.0,
+                 max_backoff: float=60.0,
+                 limiter=None):
+        """Initializes the transport
+
+        Args:
+            max_attempts: Integer, maximum number of requests made to API in
+                in case of failure.
+            pool_size: Integer, maximum number of keep-alive connections
+                kept open to the API.
+            timeout: Tuple, connect and read timeouts in seconds.
+            backoff: Float, base delay in seconds between attempts, doubled
+                after every failure.
+            max_backoff: Float, upper bound on the delay between attempts.
+            limiter: TokenBucket, rate limiter every attempt passes through,
+                or None to send requests unthrottled.
+        """
+        assert(max_attempts >= 1)
+        self.max_attempts = max_attempts
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = limiter
+        self.session = self.open_session()
+
+    def open_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = TimedAdapter(pool_connections=1,
+                               pool_maxsize=self.pool_size,
+                               max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter
+
+        Args:
+            attempt: Integer, number of attempts that already failed
+        """
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def send(self, url: str, params: dict, probe=null_probe) -> bytes:
+        """Makes a single request without retrying
+
+        Args:
+            url: String, endpoint of the API
+            params: Dictionary, query parameters
+            probe: metrics.Probe, records the connect, ttfb and download
+                stages and the bytes received
+        """
+        _connects.seconds = 0.0
+        start = time.perf_counter()
+        r = self.session.get(url,
+                             params=params,
+                             timeout=self.timeout,
+                             stream=True)
+        headers = time.perf_counter()
+        content = r.content
+        connect = _connects.seconds
+        if connect > 0:
+            probe.observe("connect", connect)
+        probe.observe("ttfb", headers - start - connect)
+        probe.observe("download", time.perf_counter() - headers)
+        probe.count("bytes", len(content))
+        r.raise_for_status()
+        check_notice(content)
+        return content
+
+    def feedback(self, throttled: bool):
+        """Tells a limiter that learns the quota how a request went
+        """
+        feedback = getattr(self.limiter, "feedback", None)
+        if feedback is not None:
+            feedback(throttled)
+
+    def get(self, url: str, params: dict, probe=null_probe) -> bytes:
+        """Makes a request, retrying transient failures
+
+        Connection errors, timeouts, 429 and 5xx statuses and throttle
+        notices are retried up to max_attempts times.
+
+        Args:
+            url: String, endpoint of the API
+            params: Dictionary, query parameters
+            probe: metrics.Probe, records the stages of every attempt, the
+                time waited on the rate limiter and the retries
+        """
+        return self._attempts(self.send, url, params, probe)
+
+    def _attempts(self, request, url: str, params: dict, probe, *args):
+        # calls request(url, params, probe, *args) until it succeeds
+        attempt = 1
+        probe.count("requests")
+        while True:
+            if self.limiter is not None:
+                probe.observe("throttle", self.limiter.acquire())
+            probe.count("attempts")
+            try:
+                result = request(url, params, probe, *args)
+                self.feedback(False)
+                return result
+            except ThrottleError:
+                self.feedback(True)
+                if attempt >= self.max_attempts:
+                    raise
+            except (requests.ConnectionError,
+                    requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.ContentDecodingError):
+                if attempt >= self.max_attempts:
+                    raise
+            except requests.HTTPError as e:
+                status = e.response.status_code
+                if (status not in retry_statuses
+                        or attempt >= self.max_attempts):
+                    raise
+            probe.count("retries")
+            time.sleep(self.delay(attempt))
+            attempt += 1
+
+    def _open(self, url: str, params: dict, probe, chunk_size: int):
+        # sends a streaming request and gathers its first notice_max_size
+        # bytes, or the whole body if shorter, into the first chunk
+        _connects.seconds = 0.0
+        start = time.perf_counter()
+        r = self.session.get(url,
+                             params=params,
+                             timeout=self.timeout,
+                             stream=True)
+        connect = _connects.seconds
+        if connect > 0:
+            probe.observe("connect", connect)
+        probe.observe("ttfb", time.perf_counter() - start - connect)
+        try:
+            r.raise_for_status()
+            chunks = r.iter_content(chunk_size)
+            first = []
+            received = 0
+            while received < notice_max_size:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                first.append(chunk)
+                received += len(chunk)
+            first = b"".join(first)
+            check_notice(first)
+        except BaseException:
+            r.close()
+            raise
+        return r, chunks, first
+
+    def chunks(self,
+               url: str,
+               params: dict,
+               probe=null_probe,
+               chunk_size: int=1 << 16):
+        """Makes a request and yields its body in chunks as they arrive
+
+        The first chunk gathers at least notice_max_size bytes, or the
+        whole body if shorter, so a notice is checked whole however the
+        server splits it. Failures are retried as by get() until the first
+        chunk has arrived; a connection lost after it raises from the
+        iteration.
+
+        Args:
+            url: String, endpoint of the API
+            params: Dictionary, query parameters
+            probe: metrics.Probe, records the stages of every attempt and
+                the bytes received
+            chunk_size: Integer, most bytes read from the connection at a
+                time
+        """
+        r, chunks, first = self._attempts(self._open, url, params, probe,
+                                          chunk_size)
+        received = len(first)
+        downloading = 0.0
+        try:
+            yield first
+            while True:
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                downloading += time.perf_counter() - start
+                if chunk is None:
+                    break
+                received += len(chunk)
+                yield chunk
+        finally:
+            r.close()
+            probe.observe("download", downloading)
+            probe.count("bytes", received)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,565 @@
+"""Fetch workers sharing a durable queue of endpoint calls
+
+A coordinator fills a JobQueue, one SQLite file, with the calls to make;
+any number of worker processes, each holding a Client bound to one API
+key, claim calls from it and land the results in the client's store:
+
+    queue = JobQueue("refresh.sqlite")
+    queue.plan(universe, ["ts_daily", ("rsi", {"interval": "weekly"})])
+
+    # in every worker process
+    queue = JobQueue("refresh.sqlite")
+    client = Client(key, calls_per_minute=None,
+                    rate_limiter=KeyBudget(queue, key, 75),
+                    store=ColumnStore("series"))
+    Worker(queue, client).run()
+
+Claims are leases: a job whose worker died is claimed again once its lease
+expires, so a crashed run resumes by starting the workers again. Every
+key's budget lives in the same file, so all workers using a key share its
+quota wherever they run. Workers on several hosts need the file on a
+filesystem whose locks SQLite can rely on.
+"""
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import cache_key
+from endpoints import endpoints
+from ratelimit import TokenBucket
+from transport import APIError
+
+
+states = ("pending", "running", "done", "failed")
+
+# Errors a job fails with at once instead of being retried: the API
+# rejected the call, or the call itself is malformed
+permanent_errors = (APIError, AssertionError, TypeError)
+
+
+class QuotaExhausted(Exception):
+    """The daily quota of an API key is spent
+
+    Attributes:
+        reset: Float, epoch time the quota is renewed at
+    """
+
+    def __init__(self, reset: float):
+        super(QuotaExhausted, self).__init__(
+            "daily quota spent until %s"
+            % time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime(reset)))
+        self.reset = reset
+
+
+class Job(object):
+    """Endpoint call claimed from the queue
+    """
+
+    __slots__ = ("id", "method", "args", "kwargs", "attempts", "worker")
+
+    def __init__(self, id: int, method: str, args: list, kwargs: dict,
+                 attempts: int, worker: str):
+        self.id = id
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.attempts = attempts
+        self.worker = worker
+
+    def __repr__(self) -> str:
+        return "Job(%d, %s, %r, %r)" % (self.id, self.method, self.args,
+                                        self.kwargs)
+
+
+class JobQueue(object):
+    """Durable queue of endpoint calls in a SQLite database
+    """
+
+    def __init__(self,
+                 path: str,
+                 lease: float=300.0,
+                 max_attempts: int=5,
+                 backoff: float=30.0,
+                 max_backoff: float=3600.0):
+        """Initializes the queue
+
+        Args:
+            path: String, database file, created if needed
+            lease: Float, seconds a claimed job stays with its worker before
+                another may claim it
+            max_attempts: Integer, claims of a job before it is failed
+            backoff: Float, seconds before a failed job is retried, doubled
+                after every failure
+            max_backoff: Float, upper bound on the delay before a retry
+        """
+        assert(max_attempts >= 1)
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        # transactions are begun explicitly, so that claims are atomic
+        self.db = sqlite3.connect(path, timeout=60.0, isolation_level=None,
+                                  check_same_thread=False)
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                            "id INTEGER PRIMARY KEY, "
+                            "key TEXT UNIQUE NOT NULL, "
+                            "method TEXT NOT NULL, "
+                            "call TEXT NOT NULL, "
+                            "state TEXT NOT NULL, "
+                            "attempts INTEGER NOT NULL, "
+                            "not_before REAL NOT NULL, "
+                            "lease_until REAL, "
+                            "worker TEXT, "
+                            "error TEXT, "
+                            "updated REAL NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS jobs_state "
+                            "ON jobs (state, not_before)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS budgets ("
+                            "key TEXT PRIMARY KEY, "
+                            "balance REAL NOT NULL, "
+                            "updated REAL NOT NULL, "
+                            "day TEXT NOT NULL, "
+                            "used REAL NOT NULL)")
+
+    def _transaction(self, function, *args):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(*args)
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+        return result
+
+    def _insert(self, calls: list) -> int:
+        now = time.time()
+        added = 0
+        for key, method, call in calls:
+            cursor = self.db.execute("INSERT OR IGNORE INTO jobs (key, "
+                                     "method, call, state, attempts, "
+                                     "not_before, updated) "
+                                     "VALUES (?, ?, ?, 'pending', 0, 0, ?)",
+                                     (key, method, call, now))
+            added += cursor.rowcount
+        return added
+
+    def submit(self, method: str, *args, **kwargs) -> bool:
+        """Adds an endpoint call unless the same request is queued already
+
+        Args:
+            method: String, name of the endpoint method, e.g. "sma"
+            args: Positional arguments of the endpoint method
+            kwargs: Keyword arguments of the endpoint method
+
+        Returns:
+            bool, whether the call was added
+        """
+        return self.submit_many([(method, args, kwargs)]) == 1
+
+    def submit_many(self, calls) -> int:
+        """Adds endpoint calls in one transaction, skipping queued requests
+
+        Calls are identified by the request they make, so submitting a
+        plan again after a crash adds nothing twice.
+
+        Args:
+            calls: Iterable, (method, args, kwargs) tuples
+
+        Returns:
+            Integer, number of calls added
+        """
+        rows = []
+        for method, args, kwargs in calls:
+            # validates the arguments before any worker sees them
+            params, _ = endpoints[method].build("", *args, **kwargs)
+            rows.append((cache_key(params), method,
+                         json.dumps([list(args), kwargs], sort_keys=True)))
+        return self._transaction(self._insert, rows)
+
+    def plan(self, symbols, requests_spec) -> int:
+        """Adds every endpoint call of symbols times requests
+
+        Args:
+            symbols: Iterable, symbols specifying equities
+            requests_spec: Iterable of method names or (method name,
+                keyword arguments) pairs, or a dictionary whose values are
+                either
+
+        Returns:
+            Integer, number of calls added
+        """
+        if isinstance(requests_spec, dict):
+            requests_spec = requests_spec.values()
+        specs = [(spec, {}) if isinstance(spec, str) else spec
+                 for spec in requests_spec]
+        return self.submit_many((method, [symbol.upper()], kwargs)
+                                for symbol in symbols
+                                for method, kwargs in specs)
+
+    def _claim(self, worker: str):
+        now = time.time()
+        # jobs whose worker kept dying with them are given up on
+        self.db.execute("UPDATE jobs SET state = 'failed', "
+                        "error = 'lease expired', updated = ? "
+                        "WHERE state = 'running' AND lease_until < ? "
+                        "AND attempts >= ?",
+                        (now, now, self.max_attempts))
+        row = self.db.execute("SELECT id, method, call, attempts FROM jobs "
+                              "WHERE (state = 'pending' AND not_before <= ?) "
+                              "OR (state = 'running' AND lease_until < ?) "
+                              "ORDER BY id LIMIT 1", (now, now)).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE jobs SET state = 'running', "
+                        "attempts = attempts + 1, lease_until = ?, "
+                        "worker = ?, updated = ? WHERE id = ?",
+                        (now + self.lease, worker, now, row[0]))
+        args, kwargs = json.loads(row[2])
+        return Job(row[0], row[1], args, kwargs, row[3] + 1, worker)
+
+    def claim(self, worker: str):
+        """Leases the oldest job that is ready to a worker
+
+        Args:
+            worker: String, name of the claiming worker
+
+        Returns:
+            Job, or None if no job is ready
+        """
+        return self._transaction(self._claim, worker)
+
+    def complete(self, job: Job) -> bool:
+        """Marks a claimed job done
+
+        Returns:
+            bool, whether the job was still leased to its worker; a job
+            claimed by another worker after its lease expired is left to it
+        """
+        with self.lock:
+            cursor = self.db.execute("UPDATE jobs SET state = 'done', "
+                                     "error = NULL, lease_until = NULL, "
+                                     "updated = ? WHERE id = ? "
+                                     "AND worker = ? AND state = 'running'",
+                                     (time.time(), job.id, job.worker))
+        return cursor.rowcount == 1
+
+    def fail(self, job: Job, error: Exception, retry: bool=True,
+             not_before: float=None) -> bool:
+        """Returns a claimed job to the queue, or fails it for good
+
+        Args:
+            job: Job, claimed job
+            error: Exception, what the call raised
+            retry: bool, whether the job may be tried again, which it is
+                after a backoff until max_attempts claims were made
+            not_before: Float, epoch time before which the job is not
+                claimed again, for a call that was never made, e.g. because
+                the daily quota of its key is spent; the claim costs no
+                attempt
+
+        Returns:
+            bool, whether the job was still leased to its worker
+        """
+        now = time.time()
+        attempts = job.attempts
+        if not_before is not None:
+            state, attempts = "pending", attempts - 1
+        elif retry and job.attempts < self.max_attempts:
+            delay = min(self.max_backoff,
+                        self.backoff * 2 ** (job.attempts - 1))
+            state, not_before = "pending", now + delay
+        else:
+            state, not_before = "failed", now
+        with self.lock:
+            cursor = self.db.execute("UPDATE jobs SET state = ?, "
+                                     "attempts = ?, not_before = ?, "
+                                     "lease_until = NULL, error = ?, "
+                                     "updated = ? WHERE id = ? "
+                                     "AND worker = ? AND state = 'running'",
+                                     (state, attempts, not_before,
+                                      repr(error), now, job.id, job.worker))
+        return cursor.rowcount == 1
+
+    def counts(self) -> dict:
+        """Number of jobs in each state
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT state, COUNT(*) FROM jobs "
+                                   "GROUP BY state").fetchall()
+        counts = dict.fromkeys(states, 0)
+        counts.update(rows)
+        return counts
+
+    def remaining(self) -> int:
+        """Number of jobs pending or running
+        """
+        counts = self.counts()
+        return counts["pending"] + counts["running"]
+
+    def failures(self) -> list:
+        """Jobs failed for good
+
+        Returns:
+            List of dictionaries with the method, args, kwargs, attempts
+            and last error of every failed job
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT method, call, attempts, error "
+                                   "FROM jobs WHERE state = 'failed' "
+                                   "ORDER BY id").fetchall()
+        failures = []
+        for method, call, attempts, error in rows:
+            args, kwargs = json.loads(call)
+            failures.append({"method": method, "args": args,
+                             "kwargs": kwargs, "attempts": attempts,
+                             "error": error})
+        return failures
+
+    def retry_failed(self) -> int:
+        """Queues every failed job again with a fresh count of attempts
+
+        Returns:
+            Integer, number of jobs queued again
+        """
+        with self.lock:
+            cursor = self.db.execute("UPDATE jobs SET state = 'pending', "
+                                     "attempts = 0, not_before = 0, "
+                                     "updated = ? WHERE state = 'failed'",
+                                     (time.time(),))
+        return cursor.rowcount
+
+    def _take(self, key: str, tokens: float, rate: float, capacity: float,
+              calls_per_day: float) -> float:
+        now = time.time()
+        day = time.strftime("%Y-%m-%d", time.gmtime(now))
+        row = self.db.execute("SELECT balance, updated, day, used "
+                              "FROM budgets WHERE key = ?",
+                              (key,)).fetchone()
+        balance, updated, used = capacity, now, 0.0
+        if row is not None:
+            balance, updated = row[0], row[1]
+            used = row[3] if row[2] == day else 0.0
+        if calls_per_day is not None and used + tokens > calls_per_day:
+            # nothing is taken; the quota is renewed with the next UTC day
+            raise QuotaExhausted(now - now % 86400 + 86400)
+        balance = min(capacity, balance + max(0.0, now - updated) * rate)
+        balance -= tokens
+        used += tokens
+        self.db.execute("INSERT OR REPLACE INTO budgets "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, balance, now, day, used))
+        return max(0.0, -balance / rate)
+
+    def take(self, key: str, tokens: float, rate: float, capacity: float,
+             calls_per_day: float=None) -> float:
+        """Draws tokens from the budget of an API key
+
+        Returns:
+            Float, seconds the caller must wait before using the tokens
+
+        Raises:
+            QuotaExhausted: The daily quota of the key is spent
+        """
+        return self._transaction(self._take, key, tokens, rate, capacity,
+                                 calls_per_day)
+
+    def close(self):
+        self.db.close()
+
+
+class KeyBudget(TokenBucket):
+    """Token bucket of an API key kept in a queue's database
+
+    Every worker drawing from the budget of the same key, in any process,
+    shares its quota, as with ratelimit.FileTokenBucket. Metrics are
+    recorded per process.
+    """
+
+    def __init__(self,
+                 queue: JobQueue,
+                 apikey: str,
+                 calls_per_minute: float,
+                 calls_per_day: float=None,
+                 capacity: float=1.0):
+        """Initializes the budget
+
+        Args:
+            queue: JobQueue, whose database holds the balance
+            apikey: String, API key whose quota the budget enforces
+            calls_per_minute: Float, request quota of the key
+            calls_per_day: Float, daily request quota of the key, counted
+                per UTC day, or None. A call beyond it raises
+                QuotaExhausted instead of waiting for the next day.
+            capacity: Float, largest burst of requests after an idle period
+        """
+        super(KeyBudget, self).__init__(calls_per_minute / 60.0, capacity)
+        self.queue = queue
+        self.key = hashlib.sha1(apikey.encode("utf-8")).hexdigest()[:16]
+        self.calls_per_day = calls_per_day
+
+    def _take(self, tokens: float) -> float:
+        return self.queue.take(self.key, tokens, self.rate, self.capacity,
+                               self.calls_per_day)
+
+
+class Worker(object):
+    """Claims jobs from a queue and makes their calls through a client
+    """
+
+    def __init__(self, queue: JobQueue, client, name: str=None):
+        """Initializes the worker
+
+        Args:
+            queue: JobQueue, where jobs are claimed
+            client: Client, bound to the worker's API key, whose store
+                receives the result of every call
+            name: String, name recorded with claimed jobs, defaults to the
+                host, process and a random suffix
+        """
+        assert(client.store is not None)
+        self.queue = queue
+        self.client = client
+        self.name = name or "%s-%d-%s" % (socket.gethostname(), os.getpid(),
+                                          uuid.uuid4().hex[:6])
+        self.done = 0
+        self.retried = 0
+        self.failed = 0
+        self.lost = 0
+        self.paused_until = 0.0
+
+    def step(self) -> bool:
+        """Claims one job and makes its call
+
+        A job whose lease expired while its call ran belongs to the worker
+        that claimed it next, and its outcome here is dropped. A job whose
+        key has spent its daily quota goes back to the queue until the
+        quota is renewed, and the worker claims nothing until then.
+
+        Returns:
+            bool, whether a job was ready
+        """
+        job = self.queue.claim(self.name)
+        if job is None:
+            return False
+        try:
+            self.client.call(job.method, *job.args, **job.kwargs)
+        except QuotaExhausted as e:
+            self.paused_until = e.reset
+            self.queue.fail(job, e, not_before=e.reset)
+        except permanent_errors as e:
+            self._count(self.queue.fail(job, e, retry=False), "failed")
+        except Exception as e:
+            retried = job.attempts < self.queue.max_attempts
+            self._count(self.queue.fail(job, e),
+                        "retried" if retried else "failed")
+        else:
+            self._count(self.queue.complete(job), "done")
+        return True
+
+    def _count(self, owned: bool, outcome: str):
+        if not owned:
+            outcome = "lost"
+        setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def run(self,
+            max_jobs: int=None,
+            idle_timeout: float=None,
+            poll_interval: float=1.0) -> dict:
+        """Works through the queue until no job is left
+
+        Jobs waiting for a retry or held by other workers keep the worker
+        polling, since they may come back to the queue. A worker whose key
+        spent its daily quota sleeps until it is renewed.
+
+        Args:
+            max_jobs: Integer, most jobs to claim, or None
+            idle_timeout: Float, seconds without a ready job, or to wait
+                for a daily quota, after which the worker stops, or None to
+                wait for every job to finish
+            poll_interval: Float, seconds between checks for ready jobs
+
+        Returns:
+            Dictionary with the jobs done, retried and failed by the worker,
+            and those lost to another worker after their lease expired
+        """
+        claimed = 0
+        idle_since = None
+        while max_jobs is None or claimed < max_jobs:
+            pause = self.paused_until - time.time()
+            if pause > 0:
+                if idle_timeout is not None and pause > idle_timeout:
+                    break
+                time.sleep(pause)
+            if self.step():
+                claimed += 1
+                idle_since = None
+                continue
+            if self.queue.remaining() == 0:
+                break
+            now = time.monotonic()
+            idle_since = idle_since or now
+            if idle_timeout is not None and now - idle_since >= idle_timeout:
+                break
+            time.sleep(poll_interval)
+        return {"worker": self.name, "done": self.done,
+                "retried": self.retried, "failed": self.failed,
+                "lost": self.lost}
+
+
+def _work(args) -> dict:
+    from client import Client
+    from store import ColumnStore
+
+    path, apikey, directory, calls_per_minute, calls_per_day, kwargs = args
+    queue = JobQueue(path)
+    budget = KeyBudget(queue, apikey, calls_per_minute, calls_per_day)
+    client = Client(apikey,
+                    calls_per_minute=None,
+                    rate_limiter=budget,
+                    store=ColumnStore(directory),
+                    **kwargs)
+    try:
+        return Worker(queue, client).run()
+    finally:
+        client.close()
+        queue.close()
+
+
+def run_workers(path: str,
+                apikeys: list,
+                directory: str,
+                workers_per_key: int=1,
+                calls_per_minute: float=5,
+                calls_per_day: float=None,
+                **kwargs) -> list:
+    """Works through a queue with worker processes on this host
+
+    Args:
+        path: String, database file of the queue
+        apikeys: List, API keys, each used by workers_per_key processes
+        directory: String, directory of the ColumnStore results land in
+        workers_per_key: Integer, worker processes per key
+        calls_per_minute: Float, request quota of every key
+        calls_per_day: Float, daily request quota of every key, or None
+        kwargs: Keyword arguments of every worker's Client
+
+    Returns:
+        List of the dictionaries returned by every worker's run()
+    """
+    tasks = [(path, apikey, directory, calls_per_minute, calls_per_day,
+              kwargs)
+             for apikey in apikeys
+             for _ in range(workers_per_key)]
+    with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+        return list(pool.map(_work, tasks))